@@ -1,5 +1,7 @@
 import streamlit as st
 
+from utils.ui import load_css
+
 # Page setup
 st.set_page_config(page_title="Sanad Analytics", layout="centered")
 
@@ -11,11 +13,6 @@ with col2:
 st.markdown("<h1 style='text-align: center; margin-bottom: 0;'>Sanad Analytics Toolkit</h1>", unsafe_allow_html=True)
 st.markdown("<h4 style='text-align: center; color: gray;'>Welcome! Choose a tool from the sidebar to get started.</h4>", unsafe_allow_html=True)
 st.markdown("---")
-# Function to load and inject CSS
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
 # Call it at the start of your app
 load_css("style.css")
 
@@ -0,0 +1,250 @@
+"""Golden-question benchmark for the BI Chatbot.
+
+Drives pages/BI_Chatbot.py through Streamlit's AppTest with the golden
+questions in benchmarks/golden_questions.json (Arabic and English), so every
+turn runs the real pipeline: prompt build, the model, SQL safety check and
+rewrite, execution against the local stand-in from tools/synthetic_data.py.
+The model is the deterministic stub, answering each question with its golden
+SQL, or with recorded responses (``--responses``, question -> SQL JSON) to
+score what a real model wrote.
+
+Reports per-stage latency (from the page's own turn telemetry), prompt sizes,
+question/result cache hit rates and correctness: each result is compared
+with the golden SQL's result run directly on the stand-in, and with the
+expected columns/row counts. ``--passes 2`` asks everything again in fresh
+sessions, so the second pass shows warm-cache behaviour.
+
+    python -m tools.synthetic_data --out data/synthetic
+    python -m benchmarks.bench_chatbot --secrets data/synthetic/secrets.toml --passes 2
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tomllib
+from collections import defaultdict
+
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from benchmarks.common import compare, print_table, summarize, write_results  # noqa: E402
+from utils import db, local_followup, telemetry  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_questions.json")
+PAGE = "pages/BI_Chatbot.py"
+
+
+def load_conversations(path):
+    """Golden cases grouped into conversations: a case with ``follows`` is asked after that case, in its session."""
+    with open(path, encoding="utf-8") as f:
+        cases = json.load(f)
+    conversations, by_id = [], {}
+    for case in cases:
+        parent = case.get("follows")
+        if parent:
+            by_id[parent].append(case)
+            by_id[case["id"]] = by_id[parent]
+        else:
+            conversation = by_id[case["id"]] = [case]
+            conversations.append(conversation)
+    return cases, conversations
+
+
+def reference_frames(cases, conn):
+    """Golden SQL results straight from the stand-in (follow-ups over their parent's result)."""
+    frames = {}
+    for case in cases:
+        if case.get("local"):
+            parent = frames.get(case["follows"])
+            frames[case["id"]] = local_followup.run(case["sql"], parent) if parent is not None else None
+        else:
+            frames[case["id"]] = db.read_sql(case["sql"], conn)
+    return frames
+
+
+def _sorted_values(df):
+    frame = df.copy()
+    frame.columns = range(len(frame.columns))
+    return frame.sort_values(list(frame.columns), key=lambda s: s.astype(str), kind="stable").reset_index(drop=True)
+
+
+def check_result(df, expected, expect):
+    """``None`` when ``df`` matches the golden result and shape, else the reason it does not."""
+    if df is None:
+        return "no result"
+    columns = [str(c) for c in df.columns]
+    if expect.get("columns") and [c.lower() for c in columns] != [c.lower() for c in expect["columns"]]:
+        return f"columns {columns}"
+    if "rows" in expect and len(df) != expect["rows"]:
+        return f"{len(df)} rows, expected {expect['rows']}"
+    if len(df) < expect.get("min_rows", 0):
+        return f"{len(df)} rows, expected at least {expect['min_rows']}"
+    if expected is None:
+        return None
+    if df.attrs.get("truncated"):
+        return None if len(expected) > len(df) and len(df.columns) == len(expected.columns) else "truncated"
+    if df.shape != expected.shape:
+        return f"shape {df.shape}, golden {expected.shape}"
+    got, want = _sorted_values(df), _sorted_values(expected)
+    for i in got.columns:
+        a, b = got[i], want[i]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            same = np.allclose(a.to_numpy(dtype=float), b.to_numpy(dtype=float), rtol=1e-6, equal_nan=True)
+        else:
+            same = a.astype(str).equals(b.astype(str))
+        if not same:
+            return f"values differ in column {columns[i]!r}"
+    return None
+
+
+def ask(at, question):
+    """One chat turn; returns ``(ms, last assistant message, result DataFrame or None)``."""
+    started = time.perf_counter()
+    at.chat_input[0].set_value(question).run()
+    ms = (time.perf_counter() - started) * 1000
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    message = at.session_state.chat_history[-1]
+    df = None
+    if message.get("result"):
+        df = at.session_state.result_store.get(message["result"]["id"], keep=False)
+    return ms, message, df
+
+
+def run_conversation(conversation, secrets, references, pass_no, timeout):
+    at = AppTest.from_file(os.path.join(REPO_ROOT, PAGE), default_timeout=timeout)
+    for key, value in secrets.items():
+        at.secrets[key] = value
+    at.run()
+    at.text_input[0].input(secrets["auth"]["BI_PASSWORD"])
+    at.button[0].click()
+    at.run()
+    rows = []
+    for case in conversation:
+        ms, message, df = ask(at, case["question"])
+        error = message["content"] if message["content"].startswith("❌") else None
+        rows.append({
+            "id": case["id"], "lang": case.get("lang"), "pass": pass_no, "rerun_ms": round(ms, 1),
+            "rows": len(df) if df is not None else 0,
+            "error": error or check_result(df, references.get(case["id"]), case.get("expect", {})),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--secrets", default="data/synthetic/secrets.toml",
+                        help="secrets.toml written by tools/synthetic_data.py")
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--responses", default=None,
+                        help="recorded model answers (question -> SQL JSON); default: the golden SQL")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub model delay per call (s)")
+    parser.add_argument("--passes", type=int, default=2, help="later passes reuse the warm caches")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-rerun timeout (s)")
+    parser.add_argument("--output", default=None, help="results JSON path")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare stage p50s with")
+    args = parser.parse_args()
+
+    with open(args.secrets, "rb") as f:
+        secrets = tomllib.load(f)
+    cases, conversations = load_conversations(args.golden)
+    workdir = tempfile.mkdtemp(prefix="sanad_bench_chatbot_")
+
+    # Stub model answering from the golden SQL (or the recorded responses)
+    responses = args.responses
+    if responses is None:
+        responses = os.path.join(workdir, "golden_answers.json")
+        with open(responses, "w", encoding="utf-8") as f:
+            json.dump({c["question"]: c["sql"] for c in cases}, f, ensure_ascii=False)
+    os.environ["SANAD_LLM_BACKEND"] = "stub"
+    os.environ["SANAD_LLM_STUB_FILE"] = responses
+    os.environ["SANAD_LLM_STUB_LATENCY"] = str(args.llm_latency)
+
+    # Fresh telemetry, few-shot, session and result files for this run
+    metrics_path = os.path.join(workdir, "metrics.sqlite")
+    secrets["chatbot"] = {
+        **secrets.get("chatbot", {}),
+        "metrics_path": metrics_path,
+        "few_shot_path": os.path.join(workdir, "few_shot.jsonl"),
+        "sessions_path": os.path.join(workdir, "chats.sqlite"),
+        "result_dir": os.path.join(workdir, "results"),
+    }
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    references = reference_frames(cases, db.connect(secrets["database"]))
+    case_rows = []
+    started = time.perf_counter()
+    for pass_no in range(1, args.passes + 1):
+        for conversation in conversations:
+            try:
+                case_rows += run_conversation(conversation, secrets, references, pass_no, args.timeout)
+            except Exception as e:  # keep going; the failure is reported per case
+                case_rows += [{"id": c["id"], "lang": c.get("lang"), "pass": pass_no, "error": f"{type(e).__name__}: {e}"}
+                              for c in conversation]
+    wall = time.perf_counter() - started
+
+    # The page records one telemetry turn per question, in order
+    turns, stages = telemetry.MetricsStore(metrics_path).recent(limit=len(case_rows))
+    turns = turns.sort_values("id").reset_index(drop=True)
+    if len(turns) == len(case_rows):
+        for row, turn in zip(case_rows, turns.itertuples()):
+            row.update(total_ms=round(turn.total_ms, 1), prompt_tokens=turn.prompt_tokens,
+                       question_cache=turn.question_cache, result_cache=turn.result_cache,
+                       answered_locally=bool(turn.answered_locally))
+        turn_pass = dict(zip(turns["id"], (r["pass"] for r in case_rows)))
+        stages["pass"] = stages["turn_id"].map(turn_pass)
+
+    results = []
+    for (pass_no, stage), group in stages.groupby(["pass", "stage"], sort=False) if "pass" in stages else []:
+        results.append(summarize(f"{stage} (pass {pass_no})", group["ms"], stage=stage, **{"pass": pass_no}))
+    results.sort(key=lambda r: (r["pass"], telemetry.STAGES.index(r["stage"]) if r["stage"] in telemetry.STAGES
+                                else len(telemetry.STAGES)))
+    by_pass = defaultdict(list)
+    for row in case_rows:
+        by_pass[row["pass"]].append(row)
+    for pass_no, rows in by_pass.items():
+        results.append(summarize(f"total (pass {pass_no})", [r["total_ms"] for r in rows if "total_ms" in r],
+                                 stage="total", **{"pass": pass_no}))
+
+    scores = {}
+    for pass_no, rows in by_pass.items():
+        for lang in sorted({r["lang"] for r in rows}) + ["all"]:
+            subset = [r for r in rows if lang in ("all", r["lang"])]
+            standalone = [r for r in subset if r.get("question_cache") in ("hit", "miss")]
+            executed = [r for r in subset if r.get("result_cache") in ("hit", "miss")]
+            tokens = [r["prompt_tokens"] for r in subset if pd.notna(r.get("prompt_tokens")) and r["prompt_tokens"]]
+            scores[f"pass {pass_no} {lang}"] = {
+                "questions": len(subset),
+                "correct": round(sum(r["error"] is None for r in subset) / len(subset), 3),
+                "question_cache_hit": round(sum(r["question_cache"] == "hit" for r in standalone) / len(standalone), 3)
+                if standalone else None,
+                "result_cache_hit": round(sum(r["result_cache"] == "hit" for r in executed) / len(executed), 3)
+                if executed else None,
+                "mean_prompt_tokens": round(float(np.mean(tokens))) if tokens else 0,
+                "max_prompt_tokens": int(max(tokens)) if tokens else 0,
+            }
+
+    path = write_results("chatbot-golden", results, args.output, passes=args.passes, golden=args.golden,
+                         responses=args.responses or "golden SQL", llm_latency=args.llm_latency,
+                         wall_s=round(wall, 3), scores=scores, cases=case_rows)
+    print_table(results, ["name", "n", "p50_ms", "p90_ms", "max_ms"])
+    print()
+    print_table([{"name": k, **v} for k, v in scores.items()],
+                ["name", "questions", "correct", "question_cache_hit", "result_cache_hit", "mean_prompt_tokens"])
+    for row in case_rows:
+        if row["error"]:
+            print(f"  FAIL pass {row['pass']} {row['id']}: {row['error']}")
+    if args.baseline:
+        compare(results, args.baseline, ["name"])
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
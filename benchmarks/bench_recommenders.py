@@ -0,0 +1,149 @@
+"""Benchmark the recommenders and the Co-Products query builders on synthetic data.
+
+Each ``ITEMSxCUSTOMERS`` size gets its own synthetic warehouse and model
+artifacts (tools/synthetic_data.py). Latency percentiles and peak memory are
+written to benchmarks/results/ as JSON; pass ``--compare`` with an earlier
+results file to flag regressions.
+
+    python -m benchmarks.bench_recommenders --sizes 500x2000,2000x10000
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from benchmarks.common import compare, peak_memory_mb, print_table, summarize, time_calls, write_results
+from tools.synthetic_data import generate
+from utils import coproducts_queries, local_db, recommenders
+
+COMPARE_KEYS = ("name", "catalog_items", "customers")
+
+
+def _load(models_dir, name, loader=pickle.load):
+    with open(os.path.join(models_dir, name), "rb") as f:
+        return loader(f)
+
+
+def _run(name, fn, calls, labels, with_memory=True):
+    samples = time_calls(fn, calls)
+    row = summarize(name, samples, **labels)
+    if with_memory:
+        row["peak_mem_mb"] = round(peak_memory_mb(fn, calls[: max(1, len(calls) // 10)]), 3)
+    print(f"  {name:<40} p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms")
+    return row
+
+
+def bench_size(n_items, n_customers, samples, workdir, sales_per_customer, seed):
+    out_dir = os.path.join(workdir, f"{n_items}x{n_customers}")
+    env = generate(
+        out_dir, sales_lines=n_customers * sales_per_customer, n_items=n_items,
+        n_customers=n_customers, n_brands=max(10, n_items // 20), seed=seed,
+        model_customers=min(n_customers, 5_000), log=lambda *_: None,
+    )
+    models_dir = env["models_dir"]
+    labels = {"catalog_items": n_items, "customers": n_customers}
+    rng = np.random.default_rng(seed)
+    results = []
+
+    # --- Content-based (salesman_dashboard) ---
+    model_data = _load(models_dir, "content_model.pkl")
+    codes = model_data["items_df"]["ITEM_CODE"].to_numpy()
+    item_calls = [(model_data, c, 5) for c in rng.choice(codes, size=samples)]
+    results.append(_run("recommend_similar_items", recommenders.recommend_similar_items, item_calls, labels))
+
+    user_item = _load(models_dir, "user_item.pkl")
+    customer_ids = rng.choice(user_item.index.to_numpy(), size=min(samples, len(user_item)), replace=False)
+    purchases = [user_item.columns[user_item.loc[c].to_numpy() > 0] for c in customer_ids]
+    content_calls = [(model_data, p, 5) for p in purchases]
+    results.append(_run(
+        "recommend_for_customer_content", recommenders.recommend_for_customer_content, content_calls, labels
+    ))
+
+    # --- Item-item similarity (2_Product_Recommendation) ---
+    sim_df = _load(models_dir, "item_similarity.pkl", joblib.load)
+    name_map = _load(models_dir, "item_name_map.pkl", joblib.load)
+    results.append(_run(
+        "get_recommendations", recommenders.get_recommendations,
+        [(c, sim_df, name_map, 5) for c in rng.choice(codes, size=samples)], labels,
+    ))
+    del sim_df
+
+    # --- Collaborative filtering (user_recommendation) ---
+    item_sim_df = _load(models_dir, "item_sim_df.pkl")
+    df_items = _load(models_dir, "df_items.pkl")
+    cf_calls = [(c, user_item, item_sim_df, 5, df_items) for c in customer_ids[: max(1, samples // 5)]]
+    results.append(_run("recommend_for_customer", recommenders.recommend_for_customer, cf_calls, labels))
+    del item_sim_df, user_item
+
+    # --- Co-Products page query builders ---
+    engine = local_db.create_engine(env["db_path"])
+    with engine.connect() as conn:
+        brands = pd.read_sql(text(
+            "SELECT DISTINCT RIGHT(MASTER_BRAND, LEN(MASTER_BRAND) - CHARINDEX('|', MASTER_BRAND)) AS Brand "
+            "FROM MP_Items"
+        ), conn)["Brand"].tolist()
+        governorates = pd.read_sql(text("SELECT DISTINCT GOVERNER_NAME FROM MP_Customers"), conn)["GOVERNER_NAME"].tolist()
+    start, end = env["start_date"].isoformat(), env["end_date"].isoformat()
+
+    def build(brand, governorate):
+        filters = coproducts_queries.build_filters(governorate, [], [], "")
+        orders_sql = coproducts_queries.brand_orders_query(brand, start, end, 0, 10**9, filters)
+        return (
+            coproducts_queries.max_order_query(brand, start, end, filters),
+            orders_sql,
+            coproducts_queries.main_query(orders_sql, brand, start, end, 20, filters),
+        )
+
+    query_calls = [(rng.choice(brands), rng.choice(governorates + [""])) for _ in range(samples)]
+    results.append(_run("coproducts.build_queries", build, query_calls, labels, with_memory=False))
+
+    built = [build(*args) for args in query_calls[: max(1, samples // 10)]]
+
+    def execute(sql):
+        with engine.connect() as conn:
+            return pd.read_sql(text(sql), conn)
+
+    for k, name in enumerate(["max_order_query", "brand_orders_query", "main_query"]):
+        results.append(_run(f"coproducts.{name}", execute, [(b[k],) for b in built], labels))
+
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default="500x2000,2000x10000",
+                        help="comma-separated ITEMSxCUSTOMERS catalog/customer sizes")
+    parser.add_argument("--samples", type=int, default=100, help="calls per function and size")
+    parser.add_argument("--sales-per-customer", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", default=None, help="where synthetic data is generated (default: temp dir)")
+    parser.add_argument("--output", default=None, help="results JSON path")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p50 ratio flagged as a regression")
+    args = parser.parse_args()
+
+    sizes = [tuple(int(v) for v in s.split("x")) for s in args.sizes.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        results = []
+        for n_items, n_customers in sizes:
+            print(f"== {n_items} items x {n_customers} customers")
+            results += bench_size(n_items, n_customers, args.samples, workdir, args.sales_per_customer, args.seed)
+
+    path = write_results("recommenders", results, args.output, sizes=args.sizes, samples=args.samples)
+    print_table(results, ["name", "catalog_items", "customers", "p50_ms", "p99_ms", "peak_mem_mb"])
+    print(f"Results written to {path}")
+
+    if args.compare and compare(results, args.compare, COMPARE_KEYS, threshold=args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Schema-prompt size and retrieval benchmark for the BI Chatbot.
+
+Builds questions from the brand/category/subcategory lists in
+``Schema_description()`` (exact and misspelled names in English and Arabic
+templates, plus questions that name nothing) and reports, per question kind: retrieval
+latency, estimated prompt tokens against the full schema prompt, and recall
+of the expected code.
+
+    python -m benchmarks.bench_schema_prompt
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import print_table, summarize, write_results
+from utils.chatbot import Schema_description
+from utils.schema_index import SchemaIndex, estimate_tokens
+
+TEMPLATES = {
+    "brands": ["Total sales of {} by governorate this month", "مبيعات {} الشهر الماضي"],
+    "categories": ["عدد العملاء اللي اشتروا {} الشهر ده", "sales of {} last month by area"],
+    "subcategories": ["مبيعات {} بالكراتين في القاهرة", "top 10 items in {} this year"],
+}
+GENERIC = [
+    "Sales by governorate this month",
+    "عدد العملاء النشطين في الاسكندرية الشهر الماضي",
+    "net active customers per area in 2025",
+    "top 20 customers by sales value last month",
+]
+
+
+def misspell(name, rng):
+    """Drop or swap one character of a longer name."""
+    if len(name) < 7:
+        return name
+    i = rng.randrange(1, len(name) - 2)
+    if rng.random() < 0.5:
+        return name[:i] + name[i + 1:]
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def build_questions(index, per_section, rng):
+    questions = []  # (kind, question, expected code or None)
+    for section, templates in TEMPLATES.items():
+        entries = index.lists.get(section, [])
+        for code, name in rng.sample(entries, min(per_section, len(entries))):
+            template = rng.choice(templates)
+            questions.append((f"{section}_exact", template.format(name), code))
+            questions.append((f"{section}_misspelled", template.format(misspell(name, rng)), code))
+    questions += [("generic", q, None) for q in GENERIC]
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--per-section", type=int, default=40, help="names sampled from each list")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="results JSON path")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    full_prompt = Schema_description()
+    started = time.perf_counter()
+    index = SchemaIndex(full_prompt)
+    build_ms = (time.perf_counter() - started) * 1000
+    full_tokens = estimate_tokens(full_prompt)
+
+    by_kind = {}
+    for kind, question, expected in build_questions(index, args.per_section, rng):
+        started = time.perf_counter()
+        prompt = index.prompt_for(question)
+        ms = (time.perf_counter() - started) * 1000
+        matched = index.match(question)
+        stats = by_kind.setdefault(kind, {"ms": [], "tokens": [], "found": 0, "extra": 0})
+        stats["ms"].append(ms)
+        stats["tokens"].append(estimate_tokens(prompt))
+        codes = {code for entries in matched.values() for code, _ in entries}
+        stats["found"] += expected in codes if expected else not codes
+        stats["extra"] += len(codes - {expected})
+
+    results = []
+    for kind, stats in by_kind.items():
+        n = len(stats["ms"])
+        mean_tokens = sum(stats["tokens"]) / n
+        results.append(summarize(
+            kind, stats["ms"], prompt_tokens=round(mean_tokens), full_tokens=full_tokens,
+            saved_pct=round(100 * (1 - mean_tokens / full_tokens), 1),
+            recall=round(stats["found"] / n, 3), extra_codes=round(stats["extra"] / n, 2),
+        ))
+
+    path = write_results("schema-prompt", results, args.output, index_build_ms=round(build_ms, 1),
+                         list_sizes={k: len(v) for k, v in index.lists.items()})
+    print_table(results, ["name", "n", "p50_ms", "p99_ms", "prompt_tokens", "full_tokens", "saved_pct", "recall", "extra_codes"])
+    print(f"Index built in {build_ms:.1f} ms. Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Timing, memory and result-file helpers shared by the benchmark scripts."""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def time_calls(fn, calls):
+    """Run ``fn(*args)`` for every args tuple; return latencies in milliseconds."""
+    samples = []
+    for args in calls:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def peak_memory_mb(fn, calls):
+    """Peak Python allocation (MB) while running the calls under tracemalloc."""
+    tracemalloc.start()
+    try:
+        for args in calls:
+            fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def summarize(name, samples_ms, **labels):
+    samples = np.asarray(samples_ms, dtype=float)
+    row = {"name": name, **labels, "n": int(samples.size)}
+    if samples.size:
+        row.update({
+            "p50_ms": round(float(np.percentile(samples, 50)), 3),
+            "p90_ms": round(float(np.percentile(samples, 90)), 3),
+            "p99_ms": round(float(np.percentile(samples, 99)), 3),
+            "mean_ms": round(float(samples.mean()), 3),
+            "max_ms": round(float(samples.max()), 3),
+        })
+    return row
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(suite, results, path=None, **meta):
+    """Store results as JSON (default: benchmarks/results/<suite>-<timestamp>.json)."""
+    now = datetime.datetime.now()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{suite}-{now:%Y%m%d-%H%M%S}.json")
+    payload = {
+        "suite": suite,
+        "meta": {
+            "timestamp": now.isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **meta,
+        },
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False, default=str)
+    return path
+
+
+def compare(results, baseline_path, keys, metric="p50_ms", threshold=1.2):
+    """Print ``metric`` ratios against a baseline file; return the regressed rows."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {tuple(r.get(k) for k in keys): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for row in results:
+        old = baseline.get(tuple(row.get(k) for k in keys))
+        if not old or not old.get(metric) or metric not in row:
+            continue
+        ratio = row[metric] / old[metric]
+        flag = "REGRESSION" if ratio > threshold else ""
+        label = " ".join(str(row.get(k)) for k in keys)
+        print(f"{label:<60} {old[metric]:>10.2f} -> {row[metric]:>10.2f} ms  x{ratio:.2f} {flag}")
+        if flag:
+            regressions.append(row)
+    return regressions
+
+
+def print_table(results, columns):
+    print(" | ".join(f"{c:>14}" for c in columns))
+    for row in results:
+        print(" | ".join(f"{str(row.get(c, '')):>14}" for c in columns))
@@ -0,0 +1,183 @@
+"""Concurrent-session load harness for the Streamlit pages.
+
+Simulates the morning spike: N sessions, ``--concurrency`` at a time, each
+driving a page through Streamlit's AppTest (login, customer selection,
+monthly details, recommendations) against the local stand-in from
+tools/synthetic_data.py. Every session shares the process-wide
+``st.cache_data`` / ``st.cache_resource`` state and cached connections, just
+as sessions do on one server.
+
+    python -m tools.synthetic_data --out data/synthetic
+    python -m benchmarks.load_sessions --secrets data/synthetic/secrets.toml --sessions 60 --concurrency 30
+"""
+import argparse
+import os
+import random
+import threading
+import time
+import tomllib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from benchmarks.common import print_table, summarize, write_results  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Session:
+    """One simulated user; times every rerun it triggers."""
+
+    def __init__(self, page, secrets, timeout, think_time):
+        self.at = AppTest.from_file(os.path.join(REPO_ROOT, page), default_timeout=timeout)
+        for key, value in secrets.items():
+            self.at.secrets[key] = value
+        self.think_time = think_time
+        self.timings = []  # (step, ms)
+
+    def run(self, step):
+        if self.think_time:
+            time.sleep(random.uniform(0, self.think_time))
+        started = time.perf_counter()
+        self.at.run()
+        self.timings.append((step, (time.perf_counter() - started) * 1000))
+        if self.at.exception:
+            raise RuntimeError(f"{step}: {self.at.exception[0].value}")
+        return self.at
+
+
+# =========================
+# Flows
+# =========================
+def salesman_flow(session, secrets, rng):
+    at = session.run("open")
+    username = rng.choice(sorted(secrets["SALES_CREDENTIALS"]))
+    at.sidebar.text_input[0].input(username)
+    at.sidebar.text_input[1].input(secrets["SALES_CREDENTIALS"][username]["password"])
+    at.sidebar.button[0].click()
+    at = session.run("login")
+
+    customers = at.selectbox(key="selected_sanad").options[1:]
+    if not customers:
+        return
+    at.selectbox(key="selected_sanad").set_value(rng.choice(customers))
+    at = session.run("select_customer")
+
+    at.button(key=rng.choice(["current_month_btn", "last_month_btn", "two_months_ago_btn"])).click()
+    at = session.run("monthly_details")
+
+    next(b for b in at.button if "توصيات" in b.label).click()
+    session.run("recommendations")
+
+
+def coproducts_flow(session, secrets, rng):
+    at = session.run("open")
+    at.text_input[0].input(secrets["auth"]["BI_PASSWORD"])
+    at.button[0].click()
+    at = session.run("login")
+
+    brands = at.selectbox[0].options
+    at.selectbox[0].set_value(rng.choice(brands))
+    at = session.run("select_brand")
+
+    next(b for b in at.button if b.label == "Show Co-Purchased Items").click()
+    at = session.run("co_purchases")
+
+    order_buttons = [b for b in at.button if "Show Order Details" in b.label]
+    if order_buttons:
+        order_buttons[0].click()
+        session.run("order_details")
+
+
+FLOWS = {
+    "salesman": ("pages/salesman_dashboard.py", salesman_flow),
+    "coproducts": ("pages/Co-Products By item Level.py", coproducts_flow),
+}
+
+
+def run_session(flow, page, secrets, timeout, think_time, seed):
+    rng = random.Random(seed)
+    session = Session(page, secrets, timeout, think_time)
+    error = None
+    try:
+        flow(session, secrets, rng)
+    except Exception as e:  # keep the load going; errors are reported
+        error = f"{type(e).__name__}: {e}"
+    return session.timings, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--secrets", default="data/synthetic/secrets.toml",
+                        help="secrets.toml written by tools/synthetic_data.py")
+    parser.add_argument("--flow", choices=sorted(FLOWS), default="salesman")
+    parser.add_argument("--sessions", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=30, help="sessions running at the same time")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause (s) before each step")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-rerun timeout (s)")
+    parser.add_argument("--cold", action="store_true", help="clear Streamlit caches before the run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="results JSON path")
+    args = parser.parse_args()
+
+    with open(args.secrets, "rb") as f:
+        secrets = tomllib.load(f)
+    page, flow = FLOWS[args.flow]
+    if args.cold:
+        st.cache_data.clear()
+        st.cache_resource.clear()
+
+    by_step, errors, active, peak_active = defaultdict(list), [], 0, 0
+    lock = threading.Lock()
+
+    def tracked(seed):
+        nonlocal active, peak_active
+        with lock:
+            active += 1
+            peak_active = max(peak_active, active)
+        try:
+            return run_session(flow, page, secrets, args.timeout, args.think_time, seed)
+        finally:
+            with lock:
+                active -= 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(tracked, args.seed + k) for k in range(args.sessions)]
+        for future in as_completed(futures):
+            timings, error = future.result()
+            for step, ms in timings:
+                by_step[step].append(ms)
+            if error:
+                errors.append(error)
+    wall = time.perf_counter() - started
+
+    all_reruns = [ms for samples in by_step.values() for ms in samples]
+    results = [summarize(step, samples) for step, samples in by_step.items()]
+    results.append(summarize("all_reruns", all_reruns))
+    throughput = {
+        "wall_s": round(wall, 3),
+        "reruns_per_s": round(len(all_reruns) / wall, 3) if wall else None,
+        "sessions_per_s": round((args.sessions - len(errors)) / wall, 3) if wall else None,
+        "peak_concurrent_sessions": peak_active,
+        "errors": len(errors),
+    }
+
+    path = write_results(
+        f"load-{args.flow}", results, args.output, sessions=args.sessions,
+        concurrency=args.concurrency, think_time=args.think_time, cold=args.cold,
+        throughput=throughput, error_samples=errors[:10],
+    )
+    print_table(results, ["name", "n", "p50_ms", "p90_ms", "p99_ms", "max_ms"])
+    print(" ".join(f"{k}={v}" for k, v in throughput.items()))
+    for error in errors[:5]:
+        print(f"  error: {error}")
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Startup profile: import cost and first-render time of every page.
+
+Each page runs in a fresh interpreter (``python -X importtime``) through
+Streamlit's AppTest, so the numbers are what the first session after a
+deploy pays: the modules the page's first rerun imports on top of Streamlit
+itself, and the wall time of that first rerun. Pages stop at their login
+screen on a fresh session, which is exactly the path that must stay light.
+
+    python -m tools.synthetic_data --out data/synthetic
+    python -m benchmarks.profile_startup --secrets data/synthetic/secrets.toml
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks.common import compare, print_table, summarize, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports that should only happen on the rerun that needs them.
+HEAVY_MODULES = [
+    "google.generativeai", "gspread", "google.oauth2", "huggingface_hub",
+    "sklearn", "joblib", "xlsxwriter", "pyodbc", "pyarrow",
+]
+
+MARKER = "--- first render ---"
+
+CHILD = f"""
+import json, os, sys, time, tomllib
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+from streamlit.testing.v1 import AppTest
+page, secrets_path, timeout = sys.argv[1], sys.argv[2], float(sys.argv[3])
+at = AppTest.from_file(page, default_timeout=timeout)
+if secrets_path:
+    with open(secrets_path, "rb") as f:
+        for key, value in tomllib.load(f).items():
+            at.secrets[key] = value
+print({MARKER!r}, file=sys.stderr, flush=True)
+started = time.perf_counter()
+at.run()
+elapsed = (time.perf_counter() - started) * 1000
+error = str(at.exception[0].value) if at.exception else None
+print(json.dumps([elapsed, error]))
+"""
+
+
+def parse_importtime(stderr):
+    """``{top_level_package: self_us}`` and module names imported after the marker line."""
+    per_package = defaultdict(int)
+    modules = []
+    seen_marker = False
+    for line in stderr.splitlines():
+        if line.strip() == MARKER:
+            seen_marker = True
+            continue
+        if not seen_marker or not line.startswith("import time:"):
+            continue
+        try:
+            self_us, _, name = line[len("import time:"):].split("|")
+            self_us = int(self_us)
+        except ValueError:
+            continue  # header line
+        name = name.strip()
+        modules.append(name)
+        per_package[name.split(".")[0]] += self_us
+    return per_package, modules
+
+
+def profile_page(page, secrets_path, timeout):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, os.path.join(REPO_ROOT, page), secrets_path or "", str(timeout)],
+        capture_output=True, text=True, cwd=REPO_ROOT,
+    )
+    per_package, modules = parse_importtime(proc.stderr)
+    try:
+        render_ms, error = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        render_ms, error = None, proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output"
+    heavy = sorted({h for h in HEAVY_MODULES for m in modules if m == h or m.startswith(h + ".")})
+    return {
+        "render_ms": render_ms,
+        "import_ms": sum(per_package.values()) / 1000,
+        "modules": len(modules),
+        "top_packages": sorted(((k, round(v / 1000, 1)) for k, v in per_package.items()), key=lambda kv: -kv[1])[:8],
+        "heavy_imports": heavy,
+        "error": error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--secrets", default="data/synthetic/secrets.toml",
+                        help="secrets.toml written by tools/synthetic_data.py")
+    parser.add_argument("--pages", nargs="*", default=None, help="scripts to profile (default: app.py and pages/*.py)")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per page")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", default=None, help="results JSON path")
+    parser.add_argument("--compare", default=None, help="baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    pages = args.pages or ["app.py"] + sorted(
+        os.path.relpath(p, REPO_ROOT) for p in glob.glob(os.path.join(REPO_ROOT, "pages", "*.py"))
+    )
+    secrets_path = os.path.abspath(args.secrets) if args.secrets and os.path.exists(args.secrets) else None
+
+    results, details = [], {}
+    for page in pages:
+        runs = [profile_page(page, secrets_path, args.timeout) for _ in range(args.repeat)]
+        last = runs[-1]
+        details[page] = last
+        results.append(summarize(
+            "first_render", [r["render_ms"] for r in runs if r["render_ms"] is not None], page=page,
+            import_ms=round(sum(r["import_ms"] for r in runs) / len(runs), 1),
+            heavy_imports=",".join(last["heavy_imports"]), error=last["error"],
+        ))
+
+    path = write_results("startup", results, args.output, repeat=args.repeat, details=details)
+    print_table(results, ["page", "p50_ms", "import_ms", "heavy_imports", "error"])
+    for page, detail in details.items():
+        print(f"{page}: " + ", ".join(f"{k} {v}ms" for k, v in detail["top_packages"]))
+    print(f"Results written to {path}")
+    if args.compare:
+        compare(results, args.compare, ["page"], threshold=args.threshold)
+        compare(results, args.compare, ["page"], metric="import_ms", threshold=args.threshold)
+
+
+if __name__ == "__main__":
+    main()
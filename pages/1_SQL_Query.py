@@ -1,12 +1,13 @@
-import streamlit as st
+import time
+
 import pandas as pd
-import pyodbc
+import streamlit as st
 
+from utils import db, export, query_jobs, result_cache, sql_paging
+from utils.sql_rewrite import UnsafeSQL
+from utils.ui import load_css
 
 
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
 # Call it at the start of your app
 load_css("style.css")
@@ -31,32 +32,181 @@ if not st.session_state[BI_KEY] :
 st.title("💬 You Can Query here for Sanad Warehouse")
 
 
+MAX_LISTED_JOBS = 10
+
+
 # Display a welcome message
-# SQL Server connection
+# SQL Server connections: a few pooled ones, each lent to one query at a time
 @st.cache_resource
-def connect_db():
-    db_config = st.secrets["database"]
-    connection_string = (
-        f"DRIVER={{{db_config['driver']}}};"
-        f"SERVER={db_config['server']};"
-        f"DATABASE={db_config['database']};"
-        f"UID={db_config['username']};"
-        f"PWD={db_config['password']}"
-    )
-    return pyodbc.connect(connection_string)
+def get_query_pool():
+    return db.ConnectionPool(st.secrets["database"])
+
+
+@st.cache_resource
+def get_job_runner():
+    # One runner per process: jobs keep running, and their results stay, when a session leaves the page
+    return query_jobs.JobRunner(get_query_pool())
+
+
+pool = get_query_pool()
+runner = get_job_runner()
+
+
+def job_query(conn, job, sql):
+    """``sql`` through the shared result cache, executed as part of ``job`` (cancellable)."""
+    df, job.info["from_cache"] = result_cache.run_cached(conn, sql, lambda: job.read(conn, sql))
+    return df
+
+
+def open_job(job):
+    st.session_state.sql_job = job.id
+    st.query_params["job"] = job.id
+    # One entry per query: paging through it replaces the earlier page's job
+    recent = [j for j in st.session_state.get("sql_jobs", [])
+              if j != job.id and getattr(runner.get(j), "label", None) != job.label]
+    st.session_state.sql_jobs = [job.id] + recent[:MAX_LISTED_JOBS - 1]
+
+
+def submit_page(paged, page, size, total=None):
+    """Queue one page (and the row estimate, when ``total`` is not known yet) as a background job."""
+
+    def work(conn, job):
+        if total is None:
+            job.info["total"] = sql_paging.estimate_rows(conn, paged, db.driver_errors())
+        sql = paged.page_sql(page, size)
+        if sql is None:
+            # Past the query's own TOP limit: nothing to fetch
+            return pd.DataFrame()
+        return job_query(conn, job, sql)
+
+    open_job(runner.submit(work, label=paged.original, paged=paged, page=page, size=size, total=total))
 
-# Usage
-conn = connect_db()
+
+def submit_whole(sql):
+    open_job(runner.submit(lambda conn, job: job_query(conn, job, sql), label=sql, paged=None))
+
+
+def go_to_page(page):
+    job = runner.get(st.session_state.get("sql_job"))
+    if job is not None and job.meta.get("paged") is not None:
+        submit_page(job.meta["paged"], page, st.session_state.sql_page_size, job.info.get("total", job.meta["total"]))
+        # Only the current page is kept: the page it replaces is dropped (or cancelled, if still loading)
+        runner.discard(job.id)
+
+
+def export_full(sql):
+    # Runs when the download is clicked, outside the script run
+    with pool.connection() as conn:
+        return export.query_csv_bytes(conn, sql)
+
+
+@st.fragment(run_every=query_jobs.POLL_SECONDS)
+def show_job_progress(job_id):
+    """Polls the running job; reruns the page once it is done."""
+    job = runner.get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    if job.status == query_jobs.QUEUED:
+        st.info(f"⏳ Waiting for a free connection ({time.time() - job.submitted:,.0f}s)…")
+    else:
+        st.info(f"⏳ Running for {job.elapsed:,.0f}s · {job.rows:,} rows fetched")
+    st.button("⏹️ Cancel query", on_click=runner.cancel, args=(job_id,))
+
+
+def show_page(job):
+    """The finished page job: rows, position and navigation."""
+    paged, page, size = job.meta["paged"], job.meta["page"], job.meta["size"]
+    df = job.result
+    total, exact = job.info.get("total", job.meta["total"]) or (None, False)
+    first_row = page * size
+    if len(df) < size:
+        # A short page means the end of the result: the total is now exact
+        total, exact = first_row + len(df), True
+        job.info["total"] = (total, exact)
+    # The query's own TOP ends the pages even when the total is only an estimate
+    last_page = (exact and first_row + size >= total) or (paged.limit is not None and first_row + size >= paged.limit)
+
+    if df.empty:
+        st.info("No rows on this page.")
+    else:
+        st.dataframe(df)
+    about = "" if exact else "≈"
+    if total is None:
+        summary = f"Page {page + 1}"
+    else:
+        pages = max(1, -(-total // size))
+        summary = f"Page {page + 1:,} of {about}{pages:,} · {about}{total:,} rows"
+    if not df.empty:
+        summary += f" · showing rows {first_row + 1:,}–{first_row + len(df):,}"
+    summary += f" · {job.elapsed:,.1f}s"
+    if job.info.get("from_cache"):
+        summary += " · ⚡ served from the shared result cache"
+    st.caption(summary)
+    if not paged.stable:
+        st.caption("⚠️ No ORDER BY: pages of a SELECT * are ordered by its first column only, so rows that "
+                    "share a value there can move between pages. Add an ORDER BY for a stable order.")
+
+    previous_col, next_col, export_col = st.columns([1, 1, 3])
+    previous_col.button("⬅️ Previous", disabled=page == 0, on_click=go_to_page, args=(page - 1,))
+    next_col.button("Next ➡️", disabled=last_page, on_click=go_to_page, args=(page + 1,))
+    # The full result streams from the cursor into the CSV only when the download is clicked
+    export_limit = f"up to {export.QUERY_EXPORT_ROWS:,} rows, {export.QUERY_EXPORT_SECONDS // 60} minutes"
+    export_col.download_button(f"⬇️ Download full result (CSV, {export_limit})",
+                               data=lambda: export_full(paged.original), file_name="query_result.csv",
+                               mime="text/csv", on_click="ignore")
+    if total is not None and paged.clamp(total) > export.QUERY_EXPORT_ROWS:
+        export_col.caption(f"The download stops at the first {export.QUERY_EXPORT_ROWS:,} rows; "
+                           "filter or aggregate the query to export everything.")
+
+
+def show_job_list():
+    jobs = [j for j in (runner.get(job_id) for job_id in st.session_state.get("sql_jobs", [])) if j is not None]
+    if len(jobs) < 2:
+        return
+    with st.expander("🗂️ Your recent queries"):
+        for job in jobs:
+            text_col, open_col = st.columns([5, 1])
+            text_col.caption(f"**{job.status}** · {job.elapsed:,.0f}s · {job.rows:,} rows — "
+                             f"{' '.join(job.label.split())[:100]}")
+            open_col.button("Open", key=f"open_{job.id}", on_click=open_job, args=(job,),
+                            disabled=job.id == st.session_state.get("sql_job"))
 
 
 query = st.text_area("Enter your SQL query:", height=150)
+st.selectbox("Rows per page", sql_paging.PAGE_SIZES, key="sql_page_size",
+             index=sql_paging.PAGE_SIZES.index(sql_paging.PAGE_SIZE), on_change=go_to_page, args=(0,))
 
 if st.button("Run Query"):
-    if not query.strip().lower().startswith("select"):
-        st.warning("❗ Only SELECT queries are allowed.")
+    try:
+        submit_page(sql_paging.PagedQuery(query), 0, st.session_state.sql_page_size)
+    except UnsafeSQL as e:
+        st.warning(f"❗ {e}")
+    except sql_paging.PagingUnsupported as e:
+        # Not pageable: run it whole (up to the row cap), as before
+        st.info(f"{e} Running it without paging.")
+        submit_whole(query)
+
+# A reload (or a shared link) comes back to its job through the URL
+if "sql_job" not in st.session_state and st.query_params.get("job"):
+    st.session_state.sql_job = st.query_params["job"]
+
+job_id = st.session_state.get("sql_job")
+job = runner.get(job_id) if job_id else None
+if job_id and job is None:
+    st.info("This query's results have expired; run it again.")
+elif job is not None:
+    if not job.done:
+        show_job_progress(job.id)
+    elif job.status == query_jobs.FAILED:
+        st.error(f"Query failed: {job.error}")
+    elif job.status == query_jobs.CANCELLED:
+        st.warning("⏹️ Query cancelled.")
+    elif job.meta["paged"] is not None:
+        show_page(job)
     else:
-        try:
-            df = pd.read_sql(query, conn)
-            st.dataframe(df)
-        except Exception as e:
-            st.error(f"Query failed: {e}")
+        st.dataframe(job.result)
+        if job.result.attrs.get("truncated"):
+            st.caption(f"Showing the first {job.result.attrs['row_cap']:,} rows.")
+        if job.info.get("from_cache"):
+            st.caption("⚡ Served from the shared result cache.")
+show_job_list()
@@ -1,13 +1,14 @@
 import streamlit as st
-import joblib
 import os
 import requests
 
-st.title("🛒 Product Recommender")
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+from utils.lazy import lazy_import
+from utils.recommenders import get_recommendations
+from utils.ui import load_css
+
+joblib = lazy_import("joblib")
 
+st.title("🛒 Product Recommender")
 # Call it at the start of your app
 load_css("style.css")
 
@@ -48,8 +49,9 @@ def load_models():
     name_map_url = "https://github.com/mahmoud35634/Sanad-ML/releases/download/v1.0/item_name_map.pkl"
 
     # Save files in a models/ folder to keep organized
-    sim_path = "models/item_similarity.pkl"
-    name_map_path = "models/item_name_map.pkl"
+    models_dir = st.secrets.get("models", {}).get("local_dir", "models")
+    sim_path = os.path.join(models_dir, "item_similarity.pkl")
+    name_map_path = os.path.join(models_dir, "item_name_map.pkl")
 
     download_file(sim_url, sim_path)
     download_file(name_map_url, name_map_path)
@@ -59,12 +61,6 @@ def load_models():
 
     return sim_df, name_map
 
-def get_recommendations(item_id, sim_df, name_map, top_n=5):
-    if item_id not in sim_df.columns:
-        return []
-    similar_items = sim_df[item_id].sort_values(ascending=False).drop(item_id, errors='ignore')
-    return [(i, name_map.get(i, "Unknown Name")) for i in similar_items.head(top_n).index]
-
 # Load model and mappings
 similarity_df, item_name_map = load_models()
 
@@ -1,24 +1,20 @@
 
 # --- Libraries ---
 import streamlit as st
-import google.generativeai as genai
-import pyodbc
 import pandas as pd
 from dotenv import load_dotenv
-import os
-import io
-import re
 from time import sleep
 
+from utils import auto_chart, chat_context, chat_sessions, db, export, few_shot, llm_gateway, local_followup, query_plan, query_stream, result_cache, result_store, sql_rewrite, telemetry
+from utils.chatbot import Schema_description, is_safe_select, sanitize_and_extract_sql_from_gemini, schema_version
+from utils.question_cache import QuestionCache
+from utils.schema_index import SchemaIndex, estimate_tokens
+from utils.ui import load_css
+
 # =========================
 # App Config
 # =========================
 
-# Function to load and inject CSS
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
 # Call it at the start of your app
 load_css("style.css")
 
@@ -27,7 +23,59 @@ st.set_page_config(page_title="Sanad BI Chatbot", page_icon="💬", layout="wide
 
 # --- Load API Key ---
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+def get_llm():
+    """Process-wide gateway over Gemini (or the SANAD_LLM_BACKEND stand-in), created on first use.
+
+    Shared by all sessions: identical prompts in flight share one request and
+    concurrency toward the provider is bounded.
+    """
+    return llm_gateway.shared(
+        max_concurrency=CHAT_SETTINGS.get("llm_concurrency", llm_gateway.MAX_CONCURRENCY),
+        max_queue=CHAT_SETTINGS.get("llm_max_queue", llm_gateway.MAX_QUEUE),
+        timeout=CHAT_SETTINGS.get("llm_timeout", llm_gateway.TIMEOUT_SECONDS),
+        hedge_after=CHAT_SETTINGS.get("llm_hedge_after", llm_gateway.HEDGE_AFTER_SECONDS),
+    )
+
+
+@st.cache_resource
+def get_schema_index():
+    """Brand/category/subcategory name index over the schema prompt."""
+    return SchemaIndex(Schema_description())
+
+
+# Prompt budgets, overridable under [chatbot] in secrets
+CHAT_SETTINGS = st.secrets.get("chatbot", {})
+
+
+@st.cache_resource
+def get_question_cache():
+    """Validated question -> SQL pairs shared by all sessions."""
+    return QuestionCache()
+
+
+@st.cache_resource
+def get_few_shot_index(access_level):
+    """Past question/SQL pairs that ran and returned rows, persisted on disk; one index per access level."""
+    return few_shot.FewShotIndex(few_shot.level_path(CHAT_SETTINGS.get("few_shot_path", few_shot.DEFAULT_PATH), access_level))
+
+
+@st.cache_resource
+def get_metrics_store():
+    """Per-stage turn timings, kept in a local SQLite file."""
+    return telemetry.MetricsStore(CHAT_SETTINGS.get("metrics_path", telemetry.DEFAULT_PATH))
+
+
+@st.cache_resource
+def get_chat_store():
+    """Persisted chat sessions; point both paths at shared storage to reopen chats on any replica."""
+    store = chat_sessions.ChatSessionStore(
+        CHAT_SETTINGS.get("sessions_path", chat_sessions.DEFAULT_PATH),
+        CHAT_SETTINGS.get("result_dir", chat_sessions.DEFAULT_RESULTS),
+    )
+    store.prune(CHAT_SETTINGS.get("sessions_max_age_days", chat_sessions.MAX_AGE_DAYS))
+    return store
 
 # =========================
 # Authentication
@@ -76,17 +124,8 @@ with col2:
 
 @st.cache_resource
 def connect_db():
-    db_config = st.secrets["database"]
     try:
-        return pyodbc.connect(
-            f"DRIVER={{{db_config['driver']}}};"
-            f"SERVER={db_config['server']};"
-            f"DATABASE={db_config['database']};"
-            f"UID={db_config['username']};"
-            f"PWD={db_config['password']};"
-
-        )
-    
+        return db.connect(st.secrets["database"])
     except Exception:
         st.error("❌ Could not connect to database.")
         return None
@@ -95,104 +134,159 @@ conn = connect_db()
 if conn is None:
     st.stop()
 
+def drop_connection():
+    """Close the shared connection (a statement that would not stop still holds it); the next call opens a new one."""
+    try:
+        conn.close()
+    except Exception:
+        pass
+    connect_db.clear()
+
+
+def cancel_running_query():
+    """Cancel button callback: stop the running statement and note it in the chat.
+
+    Runs at the start of the rerun the click caused; the interrupted run left ``running_query`` set.
+    """
+    stream = st.session_state.pop("running_query", None)
+    if stream is not None:
+        stream.cancel()
+        if getattr(stream, "busy", False):
+            # Still executing on the session's connection after the interrupted run waited for it
+            drop_connection()
+        add_message({
+            "role": "assistant", "content": "⏹️ Query cancelled.", "sql": None, "result": None, "query_id": None,
+        })
+
+
+def stream_query(conn, sql):
+    """Fetch SQL in chunks up to the row cap; the first chunk shows while the rest stream in."""
+    stream = query_stream.QueryStream(
+        conn, sql,
+        row_cap=CHAT_SETTINGS.get("row_cap", sql_rewrite.ROW_CAP),
+        chunk_rows=CHAT_SETTINGS.get("chunk_rows", query_stream.CHUNK_ROWS),
+        timeout=CHAT_SETTINGS.get("query_timeout", query_stream.TIMEOUT_SECONDS),
+    )
+    st.session_state.running_query = stream
+    status, cancel_slot, first_rows = st.empty(), st.empty(), st.empty()
+    cancel_slot.button("⏹️ Cancel query", key="cancel_query", on_click=cancel_running_query)
+
+    def on_chunk(chunk, s):
+        if s.rows == len(chunk):
+            first_rows.dataframe(chunk)
+        status.caption(f"⏳ {s.rows:,} rows loaded…")
+
+    def on_wait(s):
+        status.caption(f"⏳ Running query… {s.elapsed:.0f}s, {s.rows:,} rows loaded")
+
+    finished = False
+    try:
+        df = stream.read(on_chunk, on_wait)
+        finished = True
+        return df
+    except Exception:
+        finished = True
+        raise
+    finally:
+        # A rerun interrupts this run before the Cancel callback runs (at the start of the next one),
+        # so an interrupted run leaves the stream for cancel_running_query to find
+        if finished:
+            st.session_state.pop("running_query", None)
+        status.empty()
+        cancel_slot.empty()
+        first_rows.empty()
+
+
+@st.cache_resource
+def get_query_pool():
+    """Extra warehouse connections for planned sub-queries, which run at the same time."""
+    return db.ConnectionPool(st.secrets["database"], CHAT_SETTINGS.get("plan_connections", db.POOL_SIZE))
+
+
+def run_plan(plan):
+    """Run a plan's sub-queries concurrently on pooled connections and join them; ``(df, [(df, ms), ...])``."""
+    pool = get_query_pool()
+    group = query_stream.StreamGroup()
+    st.session_state.running_query = group
+    status, cancel_slot = st.empty(), st.empty()
+    cancel_slot.button("⏹️ Cancel query", key="cancel_query", on_click=cancel_running_query)
+
+    def run_part(sql):
+        with pool.connection() as part_conn:
+            stream = group.add(query_stream.QueryStream(
+                part_conn, sql,
+                row_cap=CHAT_SETTINGS.get("row_cap", sql_rewrite.ROW_CAP),
+                chunk_rows=CHAT_SETTINGS.get("chunk_rows", query_stream.CHUNK_ROWS),
+                timeout=CHAT_SETTINGS.get("query_timeout", query_stream.TIMEOUT_SECONDS),
+            ))
+            df, _ = result_cache.run_cached(part_conn, sql, stream.read)
+            return df
+
+    def on_wait(done, total):
+        status.caption(f"⏳ Running {total} sub-queries in parallel… {done}/{total} done")
+
+    finished = False
+    try:
+        parts = query_plan.execute(plan["parts"], run_part, pool.size, on_wait, group.cancel)
+        finished = True
+    except Exception:
+        finished = True
+        raise
+    finally:
+        # As in stream_query: left for cancel_running_query when a rerun interrupts the run
+        if finished:
+            st.session_state.pop("running_query", None)
+        status.empty()
+        cancel_slot.empty()
+    return query_plan.combine(plan["keys"], plan["parts"], [df for df, _ in parts]), parts
+
+
+def truncation_note(row_cap):
+    st.warning(f"✂️ Results truncated at {row_cap:,} rows. Add filters or aggregate to see everything.")
+
+
 def execute_query_safe(conn, sql, retries=3, delay=1):
     """Run SQL with basic retry for deadlocks; return DataFrame or empty DF."""
     for attempt in range(retries):
         try:
-            return pd.read_sql(sql, conn)
-        except pyodbc.Error as e:
+            return stream_query(conn, sql)
+        except query_stream.QueryCancelled:
+            st.stop()
+        except query_stream.ConnectionBusy as e:
+            drop_connection()
+            st.error(f"❌ {e} Please try again.")
+            return pd.DataFrame()
+        except query_stream.QueryTimeout as e:
+            st.error(f"⏱️ {e} Try narrowing the question (dates, brand, region).")
+            return pd.DataFrame()
+        except db.driver_errors() as e:
             # Deadlock or retryable error (40001). Args may vary by driver/version.
             if len(e.args) > 0 and ("40001" in str(e.args[0]) or "deadlock" in str(e).lower()):
                 if attempt < retries - 1:
                     sleep(delay)
                     continue
-            st.error(f"❌ Database error occurred.")
+            st.error("❌ Database error occurred.")
             return pd.DataFrame()
         except Exception:
             st.error("❌ Unexpected error occurred.")
             return pd.DataFrame()
     return pd.DataFrame()
 
-def is_safe_select(sql: str) -> bool:
-    """Allow only a single SELECT statement; block DDL/DML and dangerous keywords."""
-    text = sql.strip().rstrip(";")
-    # Must start with SELECT (allow WITH CTE too)
-    if not re.match(r"(?is)^\s*(with\s+[\s\S]+?\)\s*select|select)\b", text):
-        return False
-    forbidden = r"(?is)\b(insert|update|delete|merge|alter|drop|create|truncate|grant|revoke|exec|execute|sp_|xp_|bulk\s+insert)\b"
-    if re.search(forbidden, text):
-        return False
-    # crude multi-statement block: additional semicolons followed by non-space text
-    # (allow semicolons inside strings/formatting is hard; we keep it strict)
-    if re.search(r";\s*\S", sql.strip()):
-        return False
-    return True
-
-def sanitize_and_extract_sql_from_gemini(response) -> str:
-    """
-    Robustly extract SQL text from Gemini response across formats.
-    """
-    raw = ""
-
-    # --- Case 1: response.text exists ---
-    if getattr(response, "text", None):
-        raw = response.text
 
-    # --- Case 2: fallback to candidates.parts ---
-    elif hasattr(response, "candidates") and response.candidates:
-        try:
-            parts = response.candidates[0].content.parts
-            raw = "".join(getattr(p, "text", "") for p in parts if getattr(p, "text", None))
-        except Exception:
-            raw = ""
-
-    # --- Case 3: ultimate fallback ---
-    if not raw:
-        raw = str(response)
-
-    # --- Clean fences like ```sql ... ``` ---
-    raw = raw.strip()
-    match = re.search(r"```sql\s*([\s\S]+?)```", raw, flags=re.IGNORECASE)
-    if not match:
-        match = re.search(r"```\s*([\s\S]+?)```", raw, flags=re.IGNORECASE)
-
-    sql = (match.group(1) if match else raw).strip()
-    return sql
+@st.cache_resource(ttl=3600, show_spinner=False)
+def get_item_dimension():
+    """code|name values of brands and categories for the SQL rewrite; None if MP_Items can't be read."""
+    try:
+        return sql_rewrite.ItemDimension.from_frame(
+            db.read_sql("SELECT DISTINCT MASTER_BRAND, MG2, MG3 FROM MP_Items", connect_db()))
+    except Exception:
+        return None
 
 def get_previous_results_summary():
-    """Generate a summary of previous results available for reference."""
-    if not st.session_state.chat_history:
-        return ""
-    
-    summary = "\n=== PREVIOUS QUERY RESULTS AVAILABLE FOR REFERENCE ===\n"
-    result_count = 0
-    
-    for i, msg in enumerate(st.session_state.chat_history):
-        if msg.get("role") == "assistant" and isinstance(msg.get("df"), pd.DataFrame) and not msg["df"].empty:
-            result_count += 1
-            df = msg["df"]
-            
-            # Get the previous user question for context
-            user_question = ""
-            if i > 0 and st.session_state.chat_history[i-1].get("role") == "user":
-                user_question = st.session_state.chat_history[i-1]["content"]
-            
-            summary += f"\nResult #{result_count}:\n"
-            summary += f"- User Question: {user_question}\n"
-            summary += f"- Columns: {', '.join(df.columns.tolist())}\n"
-            summary += f"- Row Count: {len(df)}\n"
-            summary += f"- Sample Data (first 2 rows):\n{df.head(2).to_string()}\n"
-            
-            if msg.get("sql"):
-                summary += f"- SQL Used: {msg['sql']}\n"
-    
-    if result_count == 0:
-        return ""
-    
-    summary += f"\n=== END PREVIOUS RESULTS (Total: {result_count} datasets available) ===\n"
-    summary += "\nIMPORTANT: If the user asks to analyze, filter, or work with 'previous results', 'last results', or 'the data above', you should reference the most recent result dataset. You can perform operations like filtering, grouping, calculations on the previous results by understanding their structure from the summary above.\n"
-    
-    return summary
+    """Generate a summary of previous results available for reference (within the token budget)."""
+    return chat_context.previous_results_summary(
+        st.session_state.chat_history, CHAT_SETTINGS.get("results_tokens", chat_context.RESULTS_TOKENS)
+    )
 
 def create_analysis_query_from_previous_results(user_request, previous_df, previous_sql, previous_question):
     """
@@ -223,512 +317,137 @@ Generate a NEW SQL query that would produce similar results to what the user is
     
     return analysis_prompt
 
-# =========================
-# Schema Prompt
-# =========================
-def Schema_description():
-    # >>> Paste your full schema/business-rules prompt here <<<
-    return """
-You are a SQL expert... Your job is to generate valid SQL Server SELECT queries.
-
-## Database Schema Overview
-
-### MP_Sales (Sales Transactions)
-- **Joins**: `MP_Sales.CustomerID = MP_Customers.SITE_NUMBER` and `MP_Sales.ItemId = MP_Items.ITEM_CODE`
-- **Important Columns**: `Date`, `Netsalesvalue`, `SalesQtyInPieces`, `ItemId`, `CustomerID` ,  `SalesQtyInCases`. `Order_Number`
-- **Rules**:
-  1. Do not use the `month` column; extract month from `Date` if needed (e.g., `MONTH(Date)`).
-  2. Always format sales values using `ROUND(s.Netsalesvalue, 0)`.
-  3. For brand information, always join with the `MP_Items` table; do not use `Master_brand` from `mp_sales`.
-  4. use SalesQtyInCases if i asked on cases or asked in arabic علي كراتين
-
-### MP_Customers (Customer Master)
-- **Joins**: `MP_Sales.CustomerID = MP_Customers.SITE_NUMBER`
-- **Important Columns**: `GOVERNER_NAME`, `CUSTOMER_B2B_ID`, `CUSTOMER_NAME`.
-- **Rules**:
-  1. For "active customers", count customers with purchases.
-  2. For "net active customers", count customers with `Netsalesvalue > 1`.
-  3. When filtering by an attribute, format the count like this: `FORMAT(COUNT(DISTINCT CUSTOMER_B2B_ID), 'N0')`.
-
-
-Rules:
-
-Valid governorate filter: use GOVERNER_NAME.
-
-### MP_Items (Product Master)
-
-Joins: MP_Sales.ItemId = MP_Items.ITEM_CODE
-
-Important Columns:
-ITEM_CODE, DESCRIPTION, MASTER_BRAND, MG2, MG3, GCOMPANY, GFORM, GSIZE, MSU, CONVERSION_RATE , Supplier
-
-Rules:
-
-MASTER_BRAND format: code|brandname.
-
-Brand name: RIGHT(MASTER_BRAND, LEN(MASTER_BRAND) - CHARINDEX('|', MASTER_BRAND))
-
-Brand code: LEFT(MASTER_BRAND, CHARINDEX('|', MASTER_BRAND) - 1)
-
-MG2 format: code|category. Extract only category name.
-
-To filter by company:
-
-WHERE LEFT(MASTER_BRAND, CHARINDEX('|', MASTER_BRAND) - 1) = '<first 6 digits>'
-
-
-General Query Requirements:
-
-Always use MP_Sales.Date for date filtering.
-
-Always join to CUSTOMER_B2B_ID when query is about customers.
-
-If a company filter is requested, match on the MASTER_BRAND code.
-
-Extract readable brand/category names when returning them.
-
-and this the lsited companies or MASTER_BRAND
-
-Use LEFT(MASTER_BRAND, CHARINDEX('|', MASTER_BRAND) - 1) to extract brand code
-
-        724046|موندليز
-        853046|Zewoo
-        692399|abo dawod
-        692425|Queen Packaging
-        849054|ILOU
-        876045|RC
-        692376|Coca Cola
-        812044|Rehana
-        692471|GLLOPAL
-        921140|Al Raheeq Al Makhtum
-        694044|MP_P&G
-        811044|El Sohagy
-        692383|EL Masrayia oils
-        874044|Mazaq
-        827044|Fay
-        692381|Mansour
-        692561|Sun Bites
-        928166|Blu
-        945045|ONa
-        750045|Soudanco
-        692786|Relax
-        730044|Haboba
-        692405|add me
-        892070|Crunchy
-        883050|Razz
-        692803|Ragon
-        897044|Bonz
-        787044|lipton
-        805046|Maram
-        818044|Afandy
-        883051|Star Bar
-        693045|Halwani Brothers
-        707045|Edafco
-        892069|Chipsy
-        693047|ELMALEKA
-        751044|Abo Taleb
-        692366|EL Gayar
-        969044|Safe
-        883046|Halwani Brothers Maamoal
-        716045|Boshrt kheir
-        790047|Classique coffee
-        956044|Sparx
-        692652|Pantene
-        692428|Ayman Afandy
-        731050|Go Mix
-        692385|Indomie
-        692378|Lamar
-        692689|kingo
-        799044|Kelloggs Noodels
-        921138|Chefy Mix
-        692455|Vatika
-        692414|Elshamadan
-        782044|Soft Rose
-        692765|Bebeto
-        772044|Mondelez
-        752045|Roll Plast
-        692446|Pyrosol
-        804044|Class A
-        731054|Mimco
-        692353|TTC
-        693049|Shaheen Coffee
-        692373|Zeina
-        692454|Ahmed El Sheikh Coffee
-        692441|Fine
-        692469|S2
-        692431|Vacakis Cafe
-        928165|Clean way
-        692612|Hayat
-        692704|Haribo
-        693053|Sima
-        692705|Saula
-        951044|Drova
-        692559|Rhodes
-        747044|Nawara foods
-        731047|Coffee break
-        692457|Kamara
-        796044|Arma soap
-        692486|Sun shine
-        957045|Hmto
-        692359|HABIBCO
-        693058|Johnson
-        970044|Yes
-        692388|Sun Top
-        968044|kaline
-        692380|Arma
-        692375|IFFCO
-        692427|Mass Foods
-        785044|Al ahlam
-        961045|Sparkel
-        711376|سيما
-        573349|Silo
-        847044|Double Dare
-        692356|Al Mufaddal
-        881044|Larch
-        850045|Twevel
-        856046|Twist
-        692411|Bill Egypt
-        722048|Cairo group
-        752044|Elshanawany
-        692466|alfnar
-        844044|4M
-        731056|Qutuf
-        742044|Xera_FreeGoods
-        722047|Elhana
-        NULL
-        876044|Snaps
-        822044|AL Tahhan
-        692460|4A Nutrition
-        878044|Dilmah
-        692461|arfa
-        794044|Weals
-        888046|Signal
-        791044|Aje Group
-        849051|Astra
-        945044|Carlito
-        876046|Double Break
-        783046|Reckitt
-        6171|Head & Shoulders
-        692397|AM Group
-        849052|Milka
-        842044|Tiba Trade
-        692410|Rosso
-        875044|Rich Bake
-        692416|Edco
-        180829|Domty
-        693044|Dream
-        692456|Al-Shahin
-        792044|Milano
-        849050|Mousi
-        928167|Bashayer
-        692569|Bravo
-        692394|Obour Land
-        692409|Flamenco co
-        692386|Regina
-        692467|Elasi
-        949044|Al Sultan 
-        692451|LaRose
-        693056|EL Marai
-        802044|AL Arabia Oil
-        1875|Default
-        692370|PEPSICO
-        929046|Blanco
-        836044|Albader
-        724045|إيفرجو
-        937044|Yoodles
-        966045|Alex
-        692354|Green plant
-        693051|White
-        692587|Karate
-        692391|Savola
-        722046|Coolest Bottle
-        692392|AL SHARQ
-        692355|Edita
-        745044|Valley Water
-        692730|Energizer
-        937057|Best
-        722051|Green land
-        954044|EL Abd
-        847045|Magic
-        692437|Ulker
-        778044|Zeyada
-        692418|Hero/Vitrac
-        748044|Lana Tex
-        951048|Maxi
-        736044|United oils
-        728047|Elzaeem
-        692572|Clorox
-        722044|Cairo Oil
-        692695|Pringles
-        692694|Mentos
-        818045|Daima
-        731051|Hawaa
-        692432|Crush
-        728045|ELkhatab
-        692384|El Anany
-        692412|United Distributors
-        692377|El-Zomoroda
-        692408|Senyorita
-        692439|Evyap
-        731048|Emad Effendi
-        693054|Aljawhara
-        692406|El Bawadi
-        711224|الريحان
-        820044|AL Kbous Tea
-        692660|Tolido
-        731055|Pafitos
-        692358|Al-Buraq
-        711399|غندور
-        711332|دامور
-        893044|Close Up
-        850044|Hatlou
-        692413|Egypt Foods
-        692458|Ekhnaton
-        883045|Fitness
-        692401|Al Yemeni Cafe
-        718045|Inactive
-        824044|Rhone Tech
-        692369|Juhayna
-        692721|Pretzels
-        692372|Nestle
-        692423|R.M Trade
-        722050|Alporsaideya
-        737044|Elkholy
-        847046|Magical
-        894045|Kit Kat
-        692363|Lametna
-        808044|Tag Elmelouk
-        883049|L'usin
-        810044|Mansour Eltiti
-        692435|Corona
-        711417|قطوف
-        692387|El Doha
-        795044|Egy Bella
-        692393|wapco
-        821044|Rabea Tea
-        711223|الرشيدى الميزان
-        790044|El Ahram
-        722045|Gefco
-        692422|IMTENAN
-        929045|Good Clean
-        809044|EL omda
-        711420|ايزيس
-        883044|Coco Bobs
-        692379|Unilever
-        731049|Everyday
-        692554|Doritos
-        692453|Ferrero
-        230202|Easy Care
-        853095|Varex
-        693048|El Marai
-        692434|Galaxy
-        394351|Queen
-        953044|Twitch
-        711322|حبة حبة
-        692516|Cheetos
-        692424|Holw EL-SHAM
-        731058|Rose Tea
-        752049|Aslan
-        692402|Abu Auf
-        848044|Cetris
-        927059|kyds
-        883047|Lambada
-        717046|Freezen
-        692438|Hyat
-        888044|El kamar
-        711305|جانو
-        254343|Heinz
-        731059|Savana
-        692407|El Walely
-        692509|Bonjorno
-        731045|Americana
-        849053|Funday
-        819044|haroun coffee
-        934047|Sesic
-        731044|Alearusa Tea
-        711398|غصون
-        883048|Lotus
-        692567|Raw
-        711396|عماد افندى
-        858044|EAU
-        724050|أصالة
-        896046|Spuds
-        779046|Al karm
-        693050|Alkhair
-        962044|Tresemme
-        929044|Speed
-        693052|Sharshar
-        733044|Zadna
-        693046|iSiS
-        923044|River Foods
-        829044|Merano
-        925051|Haj Arafa
-        692429|Wadi Food
-        731057|Redbull
-        825044|V7
-        692436|Egypt Treat
-        692371|Rani
-        896047|Ponky
-        692465|fodo
-        805045|Donlopz
-        861044|Teeka fun
-        879044|Al Moalem
-        722052|Labanita
-        752048|Puvana
-        724044|العميد
-        151081|Bisco Misr
-        692468|UGO
-
-This is all companies name in [MASTER_BRAND]
-
-MG2 (Category) — Use textual part only: 
-
-720046|البسكويت والحلويات
-841044|بقوليات و توابل
-720048|منتجات العناية الشخصية
-720050|المنتجات التموينية (البقالة)
-NULL
-718047|المياه
-1875|Default
-720044|المشروبات الباردة
-720049|الشييسي و المقرمشات
-711054|منتجات البان
-720047|المعلبات و المأكولات
-934046|الورقيات و الحفاضات
-718049|المنظفات و أدوات المنزل
-720045|المشروبات الساخنة
-
-this is listed MG3
-
-
-786044|مزيل بقع
-719050|شوكولاتة
-719056|مشروبات سريعة الذوبان
-719067|خل وماء ورد
-719044|حليب خالي الدسم
-851045|عسل و طحينة
-711146|مسحوق غسيل
-719061|فول ومعلبات
-826045|بادى سبلاش
-719075|معطر جو
-859044|العناية بالجسم
-719062|مخللات
-711121|قهوة
-846045|مرقات و خلطات
-711067|بطاريات
-711066|بسكويت
-719068|زيت وسمن
-719080|جل معقم
-711073|تونة
-719086|مستحضرات تجميل
-711094|سحلب
-846047|كاكاو و فرابيه
-820045|صوص طعام
-711178|دقيق
-719049|مشروب زبادي
-711101|شاي
-711173|نسكافية
-948044|قهوه مثلجه
-719083|فوط صحية
-719074|مطهر
-719048|لبن بودر
-NULL
-718047|المياه
-719077|منظف اطباق
-711165|ملمع
-711151|مشروبات غازية
-719054|مخبوزات مقرمشة
-711102|شرائح بطاطس
-1875|Default
-719071|فويل المونيوم
-719076|منظف
-851044|مستلزمات حلويات
-804045|وافل
-719073|مستلزمات المطبخ
-711084|رايب
-711090|زيت
-711164|ملح
-711097|سكر
-711064|اكياس
-711079|حلاوة
-846048|اسبرسو
-711150|مشروبات طاقة
-719053|مصاصة
-711176|نودلز
-711141|مربي
-711163|مكرونة
-719078|حفاضات
-711108|صلصة
-875045|حبوب و مخبوزات
-719051|لبان و بونبون
-711057|اجبان
-711124|كرواسون
-711107|صابون
-719052|جيلي مارشيملو
-711112|عصائر
-888045|العنايه بالاسنان
-711058|ارز
-719079|العناية بالشعر
-936045|مناديل مبلله
-936046|الحفاضات
-846046|صوص حلو
-719084|كريم مرطب
-711162|مقرمشات
-711098|سمن
-719082|غسول للايدي
-846044|توابل
-719072|مبيد حشري
-711062|اعشاب
-719047|حليب نكهات
-711087|زبادي
-820046|كاتشب ومايونيز
-711159|معمول
-719045|حليب كامل الدسم
-845044|البقوليات
-719085|ماسك للوجه
-852047|تمور
-719070|جل منظف
-936044|المناديل
-711132|كيك
-719057|مشروبات شعير
-719060|سبريد
-719046|حليب نصف دسم
-719055|شربات
-
-use it if i asked in arabic on one of them 
-and use N before in arabic filter
-
-
-AND USE MASTER_BRAND in items for compaines
-...
-"""
+def chat_session_id():
+    """This conversation's persisted session, created with its first message and kept in the URL."""
+    if "chat_session" not in st.session_state:
+        st.session_state.chat_session = get_chat_store().create("bi" if st.session_state[BI_KEY] else "trade")
+        st.query_params["chat"] = st.session_state.chat_session
+    return st.session_state.chat_session
+
+
+def get_result_store():
+    """This session's result store: recent results in memory, all of them saved to Parquet with the chat."""
+    if "result_store" not in st.session_state:
+        st.session_state.result_store = result_store.ResultStore(
+            memory_window=CHAT_SETTINGS.get("results_in_memory", result_store.MEMORY_WINDOW),
+            directory=get_chat_store().results_dir(chat_session_id()),
+            persist=True,
+        )
+    return st.session_state.result_store
+
+
+def add_message(message):
+    """Append a message to the chat and save it with the session."""
+    message["seq"] = get_chat_store().append(chat_session_id(), message)
+    st.session_state.chat_history.append(message)
+
+
+def restore_messages(messages):
+    """Reattach persisted result handles; results whose files are gone are dropped."""
+    store = get_result_store()
+    for message in messages:
+        if message["result"] and not store.adopt(message["result"]):
+            message["result"] = None
+    return messages
+
+
+def open_requested_chat():
+    """Reopen the chat named in the URL (after a refresh or on another replica): its latest messages only."""
+    requested = st.query_params.get("chat")
+    if not requested:
+        return
+    store = get_chat_store()
+    info = store.session(requested)
+    if info is None or (info["access_level"] == "bi" and not st.session_state[BI_KEY]):
+        del st.query_params["chat"]
+        return
+    st.session_state.chat_session = requested
+    st.session_state.chat_history = restore_messages(store.load(requested, limit=HISTORY_PAGE))
+    st.session_state.query_counter = info["queries"]
+
+
+def show_earlier_messages():
+    """Widen the replayed window, paging older messages in from the session store when needed."""
+    st.session_state.history_visible += HISTORY_PAGE
+    history = st.session_state.chat_history
+    missing = st.session_state.history_visible - len(history)
+    if missing > 0 and history and (history[0].get("seq") or 1) > 1:
+        older = get_chat_store().load(chat_session_id(), before=history[0]["seq"], limit=max(missing, HISTORY_PAGE))
+        st.session_state.chat_history = restore_messages(older) + history
+
+
+# Messages replayed on each rerun; older ones stay collapsed (and unloaded) until asked for
+HISTORY_PAGE = CHAT_SETTINGS.get("history_page", chat_sessions.PAGE_MESSAGES)
 
 # =========================
 # Initialize session state for chat history and result tracking
 if "chat_history" not in st.session_state:
-    # Each entry: {"role": "user"/"assistant", "content": str, "sql": Optional[str], "df": Optional[pd.DataFrame], "query_id": Optional[str]}
+    # Each entry: {"role": "user"/"assistant", "content": str, "sql": Optional[str], "local_sql": Optional[str], "result": Optional[handle from the result store], "query_id": Optional[str], "seq": Optional[int]}
     st.session_state.chat_history = []
+    st.session_state.query_counter = 0
+    open_requested_chat()
 
 if "query_counter" not in st.session_state:
     st.session_state.query_counter = 0
 
+if "history_visible" not in st.session_state:
+    st.session_state.history_visible = HISTORY_PAGE
+
+@st.fragment
+def show_latency_panel():
+    """BI only: per-stage latency percentiles over recent turns (all sessions)."""
+    with st.expander("⏱️ Chatbot latency"):
+        st.button("🔄 Refresh", key="refresh_latency")
+        store = get_metrics_store()
+        rates = store.rates()
+        if not rates:
+            st.caption("No turns recorded yet.")
+            return
+        st.caption(f"Last {rates['turns']} turns, milliseconds")
+        st.dataframe(store.percentiles(), hide_index=True)
+        st.caption(
+            f"Question cache hits {rates['question_cache_hit']:.0%} · result cache hits {rates['result_cache_hit']:.0%} · "
+            f"answered in memory {rates['answered_locally']:.0%} · errors {rates['errors']:.0%} · "
+            f"median rows {rates['median_rows']:,.0f}"
+        )
+        gateway = get_llm().stats()
+        st.caption(
+            f"LLM gateway ({gateway['backend']}): {gateway['running']}/{gateway['max_concurrency']} running · "
+            f"{gateway['queued']} queued · {gateway['deduplicated']} of {gateway['calls']} calls deduplicated · "
+            f"{gateway['timeouts']} timeouts · {gateway['rejected']} rejected · "
+            f"{gateway['hedge_wins']}/{gateway['hedged']} hedges won · {gateway['early_stops']} early stops"
+        )
+
+
 # Sidebar: tools and previous results info
 with st.sidebar:
     st.markdown("### Tools")
     clear = st.button("🧹 Clear Conversation")
     if clear:
+        if "chat_session" in st.session_state:
+            get_chat_store().delete(st.session_state.pop("chat_session"))
+            st.session_state.pop("result_store", None)
+        st.query_params.pop("chat", None)
         st.session_state.chat_history = []
         st.session_state.query_counter = 0
+        st.session_state.history_visible = HISTORY_PAGE
+        st.session_state.pop("charts", None)
         st.rerun()
 
     # 🧠 Enable/Disable memory
     use_memory = st.toggle("🧠 Enable Chat Memory", value=True)
+    use_planning = st.toggle("🧩 Planning Mode", value=True,
+                             help="Split compound questions into simple sub-queries that run in parallel.")
+
+    if st.session_state[BI_KEY]:
+        show_latency_panel()
     
     # Show available previous results
     st.markdown("### 📊 Previous Results")
     result_datasets = []
+    session_sheets = []
     for i, msg in enumerate(st.session_state.chat_history):
-        if msg.get("role") == "assistant" and isinstance(msg.get("df"), pd.DataFrame) and not msg["df"].empty:
+        if msg.get("role") == "assistant" and msg.get("result"):
             # Get the previous user question for context
             user_question = ""
             if i > 0 and st.session_state.chat_history[i-1].get("role") == "user":
@@ -736,9 +455,10 @@ with st.sidebar:
             result_datasets.append({
                 "index": len(result_datasets) + 1,
                 "question": user_question,
-                "rows": len(msg["df"]),
-                "columns": len(msg["df"].columns)
+                "rows": msg["result"]["rows"],
+                "columns": len(msg["result"]["columns"])
             })
+            session_sheets.append((f"Dataset {len(result_datasets)}", user_question, msg["result"]))
     
     if result_datasets:
         for dataset in result_datasets:
@@ -749,6 +469,11 @@ with st.sidebar:
                 📊 {dataset['rows']} rows, {dataset['columns']} columns
             </div>
             """, unsafe_allow_html=True)
+        # Built only on click, one result at a time
+        store = get_result_store()
+        st.download_button("⬇️ Download all results (Excel)",
+                           data=lambda: export.xlsx_bytes(export.session_sheets(store, session_sheets)),
+                           file_name="sanad_chat_results.xlsx", mime=export.XLSX_MIME, on_click="ignore")
         st.markdown("💡 **Tip:** You can reference these results in new queries by saying things like 'filter the last results', 'group the previous data', or 'show me more details about the data above'.")
     else:
         st.markdown("*No previous results available*")
@@ -756,14 +481,70 @@ with st.sidebar:
 # =========================
 # Replay History
 # =========================
-for msg in st.session_state.chat_history:
+def get_chart(result_id, df):
+    """Suggested chart for a result, aggregated/downsampled once and kept for replays."""
+    charts = st.session_state.setdefault("charts", {})
+    if result_id not in charts:
+        charts[result_id] = auto_chart.build(
+            df, CHAT_SETTINGS.get("chart_points", auto_chart.MAX_POINTS), CHAT_SETTINGS.get("chart_top_n", auto_chart.TOP_N)
+        )
+    return charts[result_id]
+
+
+def show_chart(chart):
+    if chart["kind"] == "line":
+        st.line_chart(chart["data"], x=chart["x"], y=chart["y"], color=chart["color"])
+    else:
+        st.bar_chart(chart["data"], x=chart["x"], y=chart["y"], horizontal=True, sort=False)
+    if chart["note"]:
+        st.caption(f"📈 {chart['note'].capitalize()}.")
+
+
+def show_data(df, chart):
+    """Table, plus a chart tab when the result suits one."""
+    if chart is None:
+        st.dataframe(df)
+        return
+    table_tab, chart_tab = st.tabs(["📋 Table", "📈 Chart"])
+    with table_tab:
+        st.dataframe(df)
+    with chart_tab:
+        show_chart(chart)
+
+
+@st.fragment
+def show_result(handle):
+    """Results in the memory window render in full; older ones show a preview and load on demand."""
+    store = get_result_store()
+    if store.in_memory(handle["id"]):
+        df = store.get(handle["id"])
+        show_data(df, get_chart(handle["id"], df))
+        return
+    with st.expander(f"📄 Result: {handle['rows']:,} rows × {len(handle['columns'])} columns"):
+        st.dataframe(handle["preview"])
+        chart = st.session_state.get("charts", {}).get(handle["id"])
+        if chart is not None:
+            show_chart(chart)
+        if handle["rows"] > len(handle["preview"]) and st.button(f"Load all {handle['rows']:,} rows", key=f"load_{handle['id']}"):
+            st.dataframe(store.get(handle["id"], keep=False))
+
+
+history = st.session_state.chat_history
+if len(history) > st.session_state.history_visible or (history and (history[0].get("seq") or 1) > 1):
+    st.button("⬆️ Show earlier messages", on_click=show_earlier_messages)
+for msg in history[-st.session_state.history_visible:]:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
-        if st.session_state[BI_KEY] and msg.get("sql"):
+        if st.session_state[BI_KEY] and (msg.get("local_sql") or msg.get("sql")):
             with st.expander("View SQL"):
-                st.code(msg["sql"], language="sql")
-        if isinstance(msg.get("df"), pd.DataFrame) and not msg["df"].empty:
-            st.dataframe(msg["df"])
+                # A turn answered in memory shows its SQLite query; ``sql`` stays the warehouse SQL it built on
+                st.code(msg.get("local_sql") or msg["sql"], language="sql")
+                if msg.get("prompt_tokens"):
+                    st.caption(f"Prompt ≈ {msg['prompt_tokens']:,} tokens")
+        if msg.get("result"):
+            show_result(msg["result"])
+            if msg["result"].get("truncated"):
+                truncation_note(msg["result"]["row_cap"])
 
 # =========================
 # Chat Input & Handling
@@ -772,8 +553,9 @@ user_input = st.chat_input("Ask your question in Arabic or English, or reference
 
 if user_input:
     # Save user message immediately
-    st.session_state.chat_history.append({"role": "user", "content": user_input})
+    add_message({"role": "user", "content": user_input})
     st.chat_message("user").markdown(user_input)
+    timer = telemetry.TurnTimer()
 
     with st.chat_message("assistant"):
         with st.spinner("Generating SQL and executing... ⏳"):
@@ -786,6 +568,7 @@ if user_input:
                 ]
                 
                 is_referencing_previous = any(keyword.lower() in user_input.lower() for keyword in reference_keywords)
+                timer.lap("keywords")
                 
                 # Get the most recent result dataset
                 last_result_df = None
@@ -794,26 +577,37 @@ if user_input:
                 
                 for i in range(len(st.session_state.chat_history) - 2, -1, -1):  # Start from second-to-last (skip current user message)
                     msg = st.session_state.chat_history[i]
-                    if msg.get("role") == "assistant" and isinstance(msg.get("df"), pd.DataFrame) and not msg["df"].empty:
-                        last_result_df = msg["df"]
+                    if msg.get("role") == "assistant" and msg.get("result"):
+                        last_result_df = get_result_store().get(msg["result"]["id"])
                         last_result_sql = msg.get("sql", "")
                         # Find the corresponding user question
                         if i > 0 and st.session_state.chat_history[i-1].get("role") == "user":
                             last_user_question = st.session_state.chat_history[i-1]["content"]
                         break
+                # Keywords alone ("last month", "group by") do not make a follow-up: there must be a result to follow
+                follows_previous = is_referencing_previous and last_result_df is not None
+                access_level = "bi" if st.session_state[BI_KEY] else "trade"
 
                 # ---- Build conversational prompt ----
                 if use_memory:
-                    history_text = ""
-                    for msg in st.session_state.chat_history:
-                        history_text += f"{msg['role'].upper()}: {msg['content']}\n"
-                        if msg.get("sql"):
-                            history_text += f"SQL_USED: {msg['sql']}\n"
-                    conversation_context = history_text
+                    # Recent turns verbatim, older ones summarized, within the token budget
+                    conversation_context = chat_context.build_conversation_context(
+                        st.session_state.chat_history,
+                        CHAT_SETTINGS.get("context_tokens", chat_context.CONTEXT_TOKENS),
+                        CHAT_SETTINGS.get("recent_turns", chat_context.RECENT_TURNS),
+                    )
                 else:
                     # Only last message
                     conversation_context = f"USER: {user_input}\n"
 
+                # Schema prompt: table rules plus only the brands/categories the question names
+                # (with memory on, the previous question counts too: "same for last month")
+                match_text = user_input
+                if use_memory or is_referencing_previous:
+                    prior_questions = [m["content"] for m in st.session_state.chat_history[:-1] if m["role"] == "user"]
+                    match_text = " ".join(prior_questions[-1:] + [user_input])
+                schema_text = get_schema_index().prompt_for(match_text)
+
                 # Add previous results summary if memory is enabled or user is referencing previous data
                 previous_results_info = ""
                 if use_memory or is_referencing_previous:
@@ -830,7 +624,7 @@ if user_input:
 You are a SQL assistant with access to previous query results.
 
 Database Schema & Business Rules:
-{Schema_description()}
+{schema_text}
 
 {previous_results_info}
 
@@ -843,7 +637,11 @@ Based on the previous results structure and the user's request, generate a NEW S
 Write ONLY the SQL query (no explanation).
 """
                 else:
-                    # Regular prompt
+                    # Regular prompt, with the closest past questions as worked examples
+                    examples_text = few_shot.prompt_block(
+                        get_few_shot_index(access_level).search(user_input, CHAT_SETTINGS.get("few_shot_examples", few_shot.TOP_K)),
+                        CHAT_SETTINGS.get("few_shot_tokens", few_shot.PROMPT_TOKENS),
+                    )
                     full_prompt = f"""
 You are a SQL assistant with memory.
 Your job is to generate valid SQL Server SELECT queries based on user requests.
@@ -852,7 +650,9 @@ If the user refers to something from the past (like 'same as before', 'previous
 use the chat history below to understand the context.
 
 Database Schema & Business Rules:
-{Schema_description()}
+{schema_text}
+
+{examples_text}
 
 {previous_results_info}
 
@@ -861,20 +661,100 @@ Conversation Context:
 
 Now write ONLY the SQL query (no explanation) that answers the last USER question.
 """
-
-                # Call Gemini
-                model = genai.GenerativeModel("gemini-2.5-flash")
-                response = model.generate_content(full_prompt)
-
-                # Extract SQL
-                sql_query = sanitize_and_extract_sql_from_gemini(response)
+                    if use_planning and query_plan.is_compound(user_input):
+                        full_prompt += query_plan.PLANNING_RULES
+
+                timer.lap("context")
+
+                # Follow-ups over the previous result run in memory first; warehouse SQL is the fallback
+                prompt_tokens = 0
+                local_df = None
+                local_sql = None
+                if follows_previous and local_followup.refers_to_result(user_input):
+                    local_prompt = local_followup.build_prompt(user_input, last_result_df, last_user_question)
+                    prompt_tokens += estimate_tokens(local_prompt)
+                    try:
+                        local_sql = sanitize_and_extract_sql_from_gemini(get_llm().generate_content(local_prompt))
+                        if local_sql and not local_followup.needs_warehouse(local_sql) and is_safe_select(local_sql):
+                            local_df = local_followup.run(local_sql, last_result_df)
+                    except Exception:
+                        # Model timeout, blocked or empty response: go on with warehouse SQL
+                        local_df = None
+                    timer.lap("local_followup")
+                answered_locally = local_df is not None
+
+                # Repeated standalone questions reuse validated SQL and skip the model
+                question_cache = get_question_cache()
+                sql_query = local_sql if answered_locally else None
+                if sql_query is None and not follows_previous:
+                    sql_query = question_cache.get(user_input, access_level, schema_version())
+                from_cache = sql_query is not None and not answered_locally
+                timer.lap("question_cache")
+
+                if sql_query is None:
+                    prompt_tokens += estimate_tokens(full_prompt)
+                    # Call Gemini; the item dimension for the SQL rewrite loads meanwhile
+                    pending = get_llm().generate_async(full_prompt)
+                    get_item_dimension()
+                    response = pending.result()
+                    timer.lap("llm")
+
+                    # Extract SQL
+                    sql_query = sanitize_and_extract_sql_from_gemini(response)
                 if not sql_query:
                     raise ValueError("Empty SQL returned from model.")
-                if not is_safe_select(sql_query):
+                # Compound questions may come back as several sub-queries (each safety-checked)
+                plan = query_plan.parse_plan(sql_query) if use_planning and not answered_locally else None
+                if plan is None and not is_safe_select(sql_query):
                     raise ValueError("Generated SQL failed safety check (SELECT-only policy).")
-                conn =connect_db()
-                # Execute SQL
-                df = execute_query_safe(conn, sql_query)
+                rewrite_notes = []
+                # As the model wrote it: few-shot examples should not teach the rewrites below
+                model_sql = sql_query
+                if plan is not None:
+                    row_cap = CHAT_SETTINGS.get("row_cap", sql_rewrite.ROW_CAP)
+                    prepared = [(label, sql_rewrite.prepare(sql, get_item_dimension(), row_cap)) for label, sql in plan["parts"]]
+                    plan["parts"] = [(label, sql) for label, (sql, _) in prepared]
+                    rewrite_notes = sorted({note for _, (_, notes) in prepared for note in notes})
+                    sql_query = query_plan.plan_sql(plan)
+                elif not answered_locally:
+                    # Sargable brand/category filters and a TOP row cap before the warehouse sees it
+                    sql_query, rewrite_notes = sql_rewrite.prepare(
+                        sql_query, get_item_dimension(), CHAT_SETTINGS.get("row_cap", sql_rewrite.ROW_CAP)
+                    )
+                timer.lap("sql_check")
+                plan_parts = None
+                if answered_locally:
+                    df, from_result_cache = local_df, False
+                elif plan is not None:
+                    try:
+                        df, plan_parts = run_plan(plan)
+                    except query_stream.QueryCancelled:
+                        st.stop()
+                    from_result_cache = False
+                    timer.lap("execute")
+                else:
+                    conn =connect_db()
+                    # Execute SQL
+                    df, from_result_cache = result_cache.run_cached(conn, sql_query, lambda: execute_query_safe(conn, sql_query))
+                    timer.lap("execute")
+                timer.set(
+                    access_level=access_level,
+                    prompt_tokens=prompt_tokens,
+                    rows=len(df),
+                    question_cache="skip" if follows_previous else ("hit" if from_cache else "miss"),
+                    result_cache="skip" if answered_locally else ("hit" if from_result_cache else "miss"),
+                    answered_locally=answered_locally,
+                )
+                if plan_parts is not None:
+                    timer.set(plan_parts=len(plan_parts), plan_part_ms=[round(ms, 1) for _, ms in plan_parts])
+
+                # Only SQL that ran and answered a question on its own is reusable
+                is_standalone = plan is None and not follows_previous and (
+                    not use_memory or sum(m["role"] == "user" for m in st.session_state.chat_history) == 1
+                )
+                if not from_cache and is_standalone and not df.empty:
+                    question_cache.put(user_input, access_level, schema_version(), sql_query)
+                    get_few_shot_index(access_level).add(user_input, model_sql)
 
                 # Increment query counter
                 st.session_state.query_counter += 1
@@ -887,11 +767,26 @@ Now write ONLY the SQL query (no explanation) that answers the last USER questio
                     reply_text = "Here are your results:"
                 
                 st.markdown(reply_text)
+                if from_cache:
+                    st.caption("⚡ Answered from the saved SQL for this question.")
+                if from_result_cache:
+                    st.caption("⚡ Served from the shared result cache.")
+                if answered_locally:
+                    st.caption("🧮 Computed in memory from the previous result (no warehouse query).")
+                if plan_parts is not None:
+                    st.caption(f"🧩 Answered with {len(plan_parts)} sub-queries run in parallel: " + " · ".join(
+                        f"{label} ({len(part_df):,} rows, {ms / 1000:.1f}s)"
+                        for (label, _), (part_df, ms) in zip(plan["parts"], plan_parts)))
 
                 if st.session_state[BI_KEY]:
                     with st.expander("View SQL"):
                         st.code(sql_query, language="sql")
+                        if prompt_tokens:
+                            st.caption(f"Prompt ≈ {prompt_tokens:,} tokens")
+                        if rewrite_notes:
+                            st.caption("Rewritten: " + "; ".join(rewrite_notes))
 
+                result = get_result_store().put(df) if not df.empty else None
                 if not df.empty:
                     # Show comparison info if referencing previous results
                     if is_referencing_previous and last_result_df is not None:
@@ -901,22 +796,18 @@ Now write ONLY the SQL query (no explanation) that answers the last USER questio
                         with col_info2:
                             st.info(f"📋 **Previous Results:** {len(last_result_df)} rows, {len(last_result_df.columns)} columns")
 
-                    # Export buttons
+                    # Export buttons: files are generated only when clicked
                     col_a, col_b = st.columns([1, 1])
-                    csv = df.to_csv(index=False).encode("utf-8-sig")
                     with col_a:
-                        st.download_button("⬇️ Download CSV", data=csv,
-                                           file_name=f"results_{query_id}.csv", mime="text/csv")
-                    with io.BytesIO() as output:
-                        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                            df.to_excel(writer, index=False, sheet_name="Results")
-                        xlsx_data = output.getvalue()
+                        st.download_button("⬇️ Download CSV", data=lambda df=df: export.csv_file(df),
+                                           file_name=f"results_{query_id}.csv", mime="text/csv", on_click="ignore")
                     with col_b:
-                        st.download_button("⬇️ Download Excel", data=xlsx_data,
-                                           file_name=f"results_{query_id}.xlsx", 
-                                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+                        st.download_button("⬇️ Download Excel", data=lambda df=df: export.xlsx_bytes([("Results", df)]),
+                                           file_name=f"results_{query_id}.xlsx", mime=export.XLSX_MIME, on_click="ignore")
 
-                    st.dataframe(df)
+                    show_data(df, get_chart(result["id"], df))
+                    if df.attrs.get("truncated"):
+                        truncation_note(df.attrs["row_cap"])
                     
                     # Show helpful suggestions for further analysis
                     # if len(df) > 0:
@@ -935,21 +826,29 @@ Now write ONLY the SQL query (no explanation) that answers the last USER questio
                     st.info("No data returned for this query.")
 
                 # Save assistant response to history with query ID
-                st.session_state.chat_history.append({
+                add_message({
                     "role": "assistant",
                     "content": reply_text,
-                    "sql": sql_query if st.session_state[BI_KEY] else None,
-                    "df": df,
+                    # Later prompts reuse "sql" as warehouse context, so an in-memory answer keeps the previous one
+                    "sql": (last_result_sql if answered_locally else sql_query) if st.session_state[BI_KEY] else None,
+                    "local_sql": sql_query if answered_locally and st.session_state[BI_KEY] else None,
+                    "result": result,
                     "query_id": query_id,
+                    "prompt_tokens": prompt_tokens,
                 })
+                timer.lap("render")
 
             except Exception as e:
+                timer.error = str(e)[:300]
                 error_text = f"❌ Failed to generate SQL. Reason: {str(e)}"
                 st.error(error_text)
-                st.session_state.chat_history.append({
+                add_message({
                     "role": "assistant",
                     "content": error_text,
                     "sql": None,
-                    "df": pd.DataFrame(),
+                    "result": None,
                     "query_id": None,
                 })
+
+    # Failed turns are recorded too, with their error
+    get_metrics_store().record(timer)
@@ -1,31 +1,19 @@
 import streamlit as st
 import pandas as pd
-import urllib
-from sqlalchemy import create_engine
 import datetime
 
+from utils import coproducts_queries, db
+from utils.ui import load_css
 
-# Function to load and inject CSS
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
+# Function to load and inject CSS
 # Call it at the start of your app
 load_css("style.css")
 st.set_page_config(page_title="co Purchased items", page_icon="💬", layout="wide")
 
 
-db_config = st.secrets["database"]
 # --- Database Connection ---
-connection_string = (
-        f"DRIVER={{{db_config['driver']}}};"
-        f"SERVER={db_config['server']};"
-        f"DATABASE={db_config['database']};"
-        f"UID={db_config['username']};"
-        f"PWD={db_config['password']}"
-)
-params = urllib.parse.quote_plus(connection_string)
-engine = create_engine(f"mssql+pyodbc:///?odbc_connect={params}")
+engine = db.create_engine(st.secrets["database"])
 
 # --- UI ---
 st.title("🛍️ Co-Purchased Items by Brand")
@@ -52,35 +40,32 @@ if not st.session_state[BI_KEY] :
 # Step 1: Load brand & governorate lists
 @st.cache_data
 def get_brand_list():
-    with engine.connect() as conn:
-        query = """
+    query = """
             SELECT DISTINCT 
                 RIGHT(MASTER_BRAND, LEN(MASTER_BRAND) - CHARINDEX('|', MASTER_BRAND)) AS Brand
             FROM MP_Items
             WHERE MASTER_BRAND LIKE '%|%' AND MASTER_BRAND IS NOT NULL
             ORDER BY Brand 
         """
-        result = pd.read_sql(query, conn)
-        return result["Brand"].dropna().unique().tolist()
+    result = db.read_sql(query, engine)
+    return result["Brand"].dropna().unique().tolist()
 
 
 brand_list = get_brand_list()
 
 @st.cache_data
 def get_govermant_list():
-    with engine.connect() as conn:
-        query = "SELECT DISTINCT GOVERNER_NAME FROM MP_Customers"
-        result = pd.read_sql(query, conn)
-        return result["GOVERNER_NAME"].dropna().unique().tolist()
+    query = "SELECT DISTINCT GOVERNER_NAME FROM MP_Customers"
+    result = db.read_sql(query, engine)
+    return result["GOVERNER_NAME"].dropna().unique().tolist()
 
 governer_list = get_govermant_list()
 
 @st.cache_data
 def get_area_list(selected_governerment):
-    with engine.connect() as conn:
-        query = f"""SELECT DISTINCT AREA_NAME FROM MP_Customers WHERE GOVERNER_NAME = N'{selected_governerment}' """
-        result = pd.read_sql(query,conn)
-        return result['AREA_NAME'].dropna().unique().tolist()
+    query = f"""SELECT DISTINCT AREA_NAME FROM MP_Customers WHERE GOVERNER_NAME = N'{selected_governerment}' """
+    result = db.read_sql(query, engine)
+    return result['AREA_NAME'].dropna().unique().tolist()
 
 
 
@@ -93,13 +78,13 @@ selected_areas = st.multiselect("🏙️ (Optional) Choose an Area", options=[""
 
 
     # Governorate filter
+@st.cache_data(ttl=300)
 def get_max_date():
-    with engine.connect() as conn:
-        query = "SELECT MAX(Date) AS MaxDate FROM MP_Sales"
-        result = pd.read_sql(query, conn)
-        if not result.empty and result["MaxDate"].iloc[0] is not None:
-            return result["MaxDate"].iloc[0].date()
-        return datetime.date.today()  # fallback
+    query = "SELECT MAX(Date) AS MaxDate FROM MP_Sales"
+    result = db.read_sql(query, engine)
+    if not result.empty and result["MaxDate"].iloc[0] is not None:
+        return result["MaxDate"].iloc[0].date()
+    return datetime.date.today()  # fallback
 
 max_available_date = get_max_date()
 
@@ -114,27 +99,27 @@ date_range = st.date_input(
 
 
 # --- Get item list for selected brand ---
+@st.cache_data(ttl=300)
 def get_items_for_brand(brand):
-    with engine.connect() as conn:
-        query = f"""
+    query = f"""
             SELECT DISTINCT ITEM_CODE, DESCRIPTION 
             FROM MP_Items  
             WHERE RIGHT(MASTER_BRAND, LEN(MASTER_BRAND) - CHARINDEX('|', MASTER_BRAND)) = '{brand}'
         """
-        return pd.read_sql(query, conn)
+    return db.read_sql(query, engine)
 
 # Load items for selected brand
 items_list_df = get_items_for_brand(selected_brand) if selected_brand else pd.DataFrame(columns=["ITEM_CODE", "DESCRIPTION"])
 
 
+@st.cache_data(ttl=300)
 def get_category_list():
-    with engine.connect() as conn:
-        query = f"""
+    query = f"""
             SELECT DisTinct Right(MG2, LEN(MG2) - CHARINDEX('|', MG2)) AS Category
             FROM MP_Items  
         """
-        result = pd.read_sql(query, conn)
-        return result["Category"].dropna().unique().tolist() 
+    result = db.read_sql(query, engine)
+    return result["Category"].dropna().unique().tolist() 
     
 category_list_df = get_category_list() 
 selected_category = st.selectbox("🏙️ (Optional) Choose a Category", options=[""] + category_list_df)
@@ -183,25 +168,9 @@ if st.session_state.selected_code and st.session_state.selected_description:
 
 # Step 4: Top rows input    
 top_rows = st.number_input("🔢 Select Top Rows", min_value=1, max_value=100, value=20, step=1)
-gov_condition = f" AND c.GOVERNER_NAME = N'{selected_governerment}'" if selected_governerment else ""
-
-# Area filter
-area_item_filter = ""
-if selected_areas:
-    selected_areas_clean = [a for a in selected_areas if a]
-    if selected_areas_clean:
-        areas_str = ",".join([f"N'{a}'" for a in selected_areas_clean])
-        area_item_filter = f" AND c.AREA_NAME IN ({areas_str})"
-
-# Brand filter
-brand_item_filter = ""
-if st.session_state.selected_code:
-    codes_str = ",".join([f"'{c}'" for c in st.session_state.selected_code if c])
-    if codes_str:
-        brand_item_filter = f" AND i.ITEM_CODE IN ({codes_str})"
-
-# Category filter
-category_item_filter = f" AND Right(i.MG2, LEN(i.MG2) - CHARINDEX('|', i.MG2)) = N'{selected_category}'" if selected_category else ""
+filters = coproducts_queries.build_filters(
+    selected_governerment, selected_areas, st.session_state.selected_code, selected_category
+)
 # Step 5: Action button
 if "show_results" not in st.session_state:
     st.session_state.show_results = False
@@ -210,35 +179,44 @@ if st.button("Show Co-Purchased Items") and selected_brand:
     st.session_state.show_results = True
 
 
+@st.cache_data(ttl=300)
+def run_query(query):
+    return db.read_sql(query, engine)
 
 
-if st.session_state.show_results:
-    start_date = date_range[0].strftime('%Y-%m-%d')
-    end_date = (
-        date_range[1].strftime('%Y-%m-%d') 
-        if len(date_range) > 1 and date_range[1] else 
-        max_available_date.strftime('%Y-%m-%d')) 
-    with engine.connect() as conn:
-        max_order_query = f"""
-            SELECT TOP 1 
-                s.Order_Number,
-                SUM(s.NetSalesValue) AS OrderValue
-            FROM MP_Sales s
-            LEFT JOIN MP_Items i ON s.ItemId = i.ITEM_CODE 
-            LEFT JOIN MP_Customers c ON s.CustomerId = c.SITE_NUMBER
-            WHERE RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) = '{selected_brand}'
-            AND s.Date BETWEEN '{start_date}' AND '{end_date}'
-            {gov_condition} {area_item_filter} {brand_item_filter}
-            GROUP BY s.Order_Number
-            ORDER BY OrderValue DESC
-        """
-        result = pd.read_sql(max_order_query, conn)
-        if not result.empty:
-            max_order_number = int(result["Order_Number"].iloc[0])
-            max_order_value = int(result["OrderValue"].iloc[0])
-        else:
-            max_order_number = None
-            max_order_value = 20000
+# Result panels are fragments: the slider, SQL password, order picker and
+# order drill-down only rerun their own panel, not the filters above.
+@st.fragment
+def order_details_panel(selected_order, selected_brand):
+    if st.button("🔍 Show Order Details"):
+        order_num = selected_order
+
+        detail_df = run_query(coproducts_queries.order_detail_query(order_num)).copy()
+        detail_df["Selected"] = detail_df["Brand"] == selected_brand
+
+        st.write(f"🧾 **Items in Order {order_num}**")
+
+        # Highlight selected brand items
+        def highlight_selected(val):
+            return 'background-color: lightgreen' if val else ''
+
+        st.dataframe(
+            detail_df.style.map(highlight_selected, subset=['Selected'])
+        )
+        st.write("📊 **Order Details**")
+        st.bar_chart(detail_df.set_index("Item_Description")["NetSalesValue"])
+        st.write("net_sales_value", detail_df["NetSalesValue"].sum().round(0))
+
+
+@st.fragment
+def co_purchase_panel(selected_brand, start_date, end_date, top_rows, filters):
+    result = run_query(coproducts_queries.max_order_query(selected_brand, start_date, end_date, filters))
+    if not result.empty:
+        max_order_number = int(result["Order_Number"].iloc[0])
+        max_order_value = int(result["OrderValue"].iloc[0])
+    else:
+        max_order_number = None
+        max_order_value = 20000
 
     # --- Dynamic slider ---
     order_min, order_max = st.slider(
@@ -257,51 +235,14 @@ if st.session_state.show_results:
 
 
     # Save queries
-    st.session_state.brand_orders_query = f"""
-        SELECT DISTINCT s.Order_Number
-        FROM MP_Sales s
-        LEFT JOIN MP_Items i ON s.ItemId = i.ITEM_CODE 
-        LEFT JOIN MP_Customers c ON s.CustomerId = c.SITE_NUMBER
-        WHERE RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) = '{selected_brand}'
-          AND s.Date BETWEEN '{start_date}' AND '{end_date}'
-          {gov_condition} {brand_item_filter} {area_item_filter}
-        GROUP BY s.Order_Number
-        HAVING SUM(s.NetSalesValue) BETWEEN {order_min} AND {order_max}
-    """
-
-    st.session_state.main_query = f"""
-        WITH BrandOrders AS (
-            {st.session_state.brand_orders_query}
-        )
-        SELECT TOP {int(top_rows)}
-        i.ITEM_CODE,
-            i.DESCRIPTION AS Item_Description,
-            RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) AS Brand,
-            RIGHT(i.MG2, LEN(i.MG2) - CHARINDEX('|', i.MG2)) AS category,
-            RIGHT(i.MG3, LEN(i.MG3) - CHARINDEX('|', i.MG3)) AS subcategory,
-            COUNT(DISTINCT s.Order_Number) AS Distinct_Orders,
-            ROUND(SUM(s.NetSalesValue),0) AS Total_Sales,
-            SUM(s.SalesQtyInCases) AS Total_Cases
-        FROM MP_Sales s
-        LEFT JOIN MP_Items i ON s.ItemId = i.ITEM_CODE
-        LEFT JOIN MP_Customers c ON s.CustomerId = c.SITE_NUMBER
-        INNER JOIN BrandOrders bo ON s.Order_Number = bo.Order_Number
-        WHERE RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) <> '{selected_brand}'
-          AND s.Date BETWEEN '{start_date}' AND '{end_date}'  AND i.ITEM_CODE NOT LIKE '%XE%'
-          {gov_condition} {category_item_filter} {area_item_filter}
-        GROUP BY  
-        i.ITEM_CODE,
-            i.DESCRIPTION,
-            RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)),
-            RIGHT(i.MG2, LEN(i.MG2) - CHARINDEX('|', i.MG2)) ,
-            RIGHT(i.MG3, LEN(i.MG3) - CHARINDEX('|', i.MG3))
-        ORDER BY Distinct_Orders DESC
-    """
-    with engine.connect() as conn:
-        st.session_state.df = pd.read_sql(st.session_state.main_query, conn)
-
-# Now show the results, even after rerun
-if st.session_state.get("df") is not None:
+    st.session_state.brand_orders_query = coproducts_queries.brand_orders_query(
+        selected_brand, start_date, end_date, order_min, order_max, filters
+    )
+
+    st.session_state.main_query = coproducts_queries.main_query(
+        st.session_state.brand_orders_query, selected_brand, start_date, end_date, top_rows, filters
+    )
+    st.session_state.df = run_query(st.session_state.main_query)
     df = st.session_state.df
 
     st.subheader(f"📦 Items frequently bought with **{selected_brand}**")
@@ -340,8 +281,7 @@ if st.session_state.get("df") is not None:
         st.write("💰 Total Sales Value:", df["Total_Sales"].sum().round(0))
 
     # Show brand orders
-    with engine.connect() as conn:
-        orders_df = pd.read_sql(st.session_state.brand_orders_query, conn)
+    orders_df = run_query(st.session_state.brand_orders_query)
 
     if not orders_df.empty:
         with st.expander("🧾 View Orders That Included Selected Brand"):
@@ -350,38 +290,14 @@ if st.session_state.get("df") is not None:
         selected_order = st.selectbox("🔢 Select an Order to Inspect", options=orders_df["Order_Number"].unique())
         st.session_state["selected_order_number"] = selected_order
 
+        # Show Order Details
+        order_details_panel(selected_order, selected_brand)
 
 
-# Show Order Details
-if "selected_order_number" in st.session_state:
-    if st.button("🔍 Show Order Details"):
-        order_num = st.session_state["selected_order_number"]
-
-        with engine.connect() as conn:
-            detail_query = f"""
-                SELECT 
-                    s.Order_Number,
-                    FORMAT(s.Date, 'yyyy-MM-dd') AS Date,
-                    i.DESCRIPTION AS Item_Description,
-                    RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) AS Brand,
-                    s.SalesQtyInCases AS Cases,
-                    s.NetSalesValue AS NetSalesValue
-                FROM MP_Sales s
-                LEFT JOIN MP_Items i ON s.ItemId = i.ITEM_CODE
-                WHERE s.Order_Number = '{order_num}'
-            """
-            detail_df = pd.read_sql(detail_query, conn)
-            detail_df["Selected"] = detail_df["Brand"] == selected_brand
-
-        st.write(f"🧾 **Items in Order {order_num}**")
-
-        # Highlight selected brand items
-        def highlight_selected(val):
-            return 'background-color: lightgreen' if val else ''
-
-        st.dataframe(
-            detail_df.style.applymap(highlight_selected, subset=['Selected'])
-        )
-        st.write("📊 **Order Details**")
-        st.bar_chart(detail_df.set_index("Item_Description")["NetSalesValue"])
-        st.write("net_sales_value", detail_df["NetSalesValue"].sum().round(0))
\ No newline at end of file
+if st.session_state.show_results and selected_brand:
+    start_date = date_range[0].strftime('%Y-%m-%d')
+    end_date = (
+        date_range[1].strftime('%Y-%m-%d') 
+        if len(date_range) > 1 and date_range[1] else 
+        max_available_date.strftime('%Y-%m-%d')) 
+    co_purchase_panel(selected_brand, start_date, end_date, top_rows, filters)
@@ -1,31 +1,22 @@
 import streamlit as st
 import streamlit as st
 import pandas as pd
-import urllib
-from sqlalchemy import create_engine
-import gspread
-from google.oauth2.service_account import Credentials
 
+from utils import db
+from utils.lazy import lazy_import
+from utils.local_sheet import open_roster
+from utils.ui import load_css
+
+gspread = lazy_import("gspread")
+service_account = lazy_import("google.oauth2.service_account")
 
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
 # Call it at the start of your app
 load_css("style.css")
 
 
-db_config = st.secrets["database"]
 # --- Database Connection ---
-connection_string = (
-        f"DRIVER={{{db_config['driver']}}};"
-        f"SERVER={db_config['server']};"
-        f"DATABASE={db_config['database']};"
-        f"UID={db_config['username']};"
-        f"PWD={db_config['password']}"
-)
-params = urllib.parse.quote_plus(connection_string)
-engine = create_engine(f"mssql+pyodbc:///?odbc_connect={params}")
+engine = db.create_engine(st.secrets["database"])
 
 
 BI_PASSWORD = "BI_admin"
@@ -47,8 +38,11 @@ if not st.session_state[BI_key]:
 # --- Connect to Google Sheet ---
 @st.cache_resource
 def connect_to_sheet():
+    local_sheet = open_roster(st.secrets)
+    if local_sheet is not None:
+        return local_sheet
     scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    creds = Credentials.from_service_account_info(
+    creds = service_account.Credentials.from_service_account_info(
         st.secrets["gcp_service_account"],
         scopes=scopes
     )
@@ -62,16 +56,15 @@ def connect_to_sheet():
 # --- Brand list from DB ---
 @st.cache_data
 def get_brand_list():
-    with engine.connect() as conn:
-        query = """
+    query = """
             SELECT DISTINCT 
                 RIGHT(MASTER_BRAND, LEN(MASTER_BRAND) - CHARINDEX('|', MASTER_BRAND)) AS Brand
             FROM MP_Items
             WHERE MASTER_BRAND LIKE '%|%' AND MASTER_BRAND IS NOT NULL
             ORDER BY Brand 
         """
-        result = pd.read_sql(query, conn)
-        return result["Brand"].dropna().unique().tolist()
+    result = db.read_sql(query, engine)
+    return result["Brand"].dropna().unique().tolist()
 
 brand_list = get_brand_list()
 selected_brand = st.selectbox("🔍 Choose a Brand", options=brand_list)
@@ -150,8 +143,7 @@ def get_customers_B2B(customer_ids, selected_brand):
 
     id_list_sql = ",".join(f"'{id_}'" for id_ in customer_ids)
 
-    with engine.connect() as conn:
-        query = f"""
+    query = f"""
         SELECT 
             COUNT(DISTINCT c.Customer_B2B_ID) AS Active,
             FORMAT(SUM(s.Netsalesvalue),'N0') AS Sales,
@@ -168,8 +160,8 @@ def get_customers_B2B(customer_ids, selected_brand):
             AND RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) = '{selected_brand}'
         ORDER BY Sales DESC, TotalQty DESC
         """
-        df = pd.read_sql(query, conn)
-        st.code(query, language="sql")
+    df = db.read_sql(query, engine)
+    st.code(query, language="sql")
 
     if df.empty:
         st.warning("No data for this customer in the last 3 months.")
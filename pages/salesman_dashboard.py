@@ -1,24 +1,20 @@
 import streamlit as st
 import pandas as pd
-import urllib
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import datetime
-import gspread
-from google.oauth2.service_account import Credentials
 import pickle
 import json
 import os
 import requests
 from functools import lru_cache
 
+from utils import db, recommenders
+from utils.lazy import lazy_import
+from utils.local_sheet import open_roster
+from utils.ui import load_css
 
-# Function to load and inject CSS
-def load_css(file_name):
-    try:
-        with open(file_name) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-    except FileNotFoundError:
-        pass  # Ignore if CSS file doesn't exist
+gspread = lazy_import("gspread")
+service_account = lazy_import("google.oauth2.service_account")
 
 # Call it at the start of your app
 load_css("style.css")
@@ -29,7 +25,7 @@ st.set_page_config(page_title="salesman", page_icon="💬", layout="wide")
 @st.cache_resource
 def load_content_model():
     """Load content model with caching and auto-download"""
-    local_path = "models/content_model.pkl"
+    local_path = os.path.join(st.secrets.get("models", {}).get("local_dir", "models"), "content_model.pkl")
     url = "https://github.com/mahmoud35634/Sanad-ML/releases/download/v1.0/content_model.pkl"
 
     if not os.path.exists(local_path):
@@ -51,23 +47,17 @@ def load_content_model():
 @st.cache_resource
 def get_database_engine():
     """Create database engine with caching"""
-    db_config = st.secrets["database"]
-    connection_string = (
-        f"DRIVER={{{db_config['driver']}}};"
-        f"SERVER={db_config['server']};"
-        f"DATABASE={db_config['database']};"
-        f"UID={db_config['username']};"
-        f"PWD={db_config['password']}"
-    )
-    params = urllib.parse.quote_plus(connection_string)
-    return create_engine(f"mssql+pyodbc:///?odbc_connect={params}")
+    return db.create_engine(st.secrets["database"])
 
 
 @st.cache_resource
 def connect_to_sheet():
     """Connect to Google Sheet with caching"""
+    local_sheet = open_roster(st.secrets)
+    if local_sheet is not None:
+        return local_sheet
     scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    creds = Credentials.from_service_account_info(
+    creds = service_account.Credentials.from_service_account_info(
         st.secrets["gcp_service_account"],
         scopes=scopes
     )
@@ -78,12 +68,7 @@ def connect_to_sheet():
     return sheet
 
 
-# Load models and credentials once
-model_data = load_content_model()
-tfidf = model_data["tfidf"]
-cosine_sim = model_data["cosine_sim"]
-indices = model_data["indices"]
-items_df = model_data["items_df"]
+# Credentials once; the content model (and sklearn with it) loads on the first recommendation
 SALES_CREDENTIALS = st.secrets["SALES_CREDENTIALS"]
 engine = get_database_engine()
 
@@ -91,18 +76,7 @@ engine = get_database_engine()
 @lru_cache(maxsize=64)
 def recommend_similar_items(item_code, num_recommendations=5):
     """Recommend items similar to the given item_code using cosine similarity."""
-    if item_code not in indices:
-        return pd.DataFrame(columns=["ITEM_CODE", "DESCRIPTION", "brand", "category"])
-    
-    idx = indices[item_code]
-    sim_scores = list(enumerate(cosine_sim[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    sim_scores = sim_scores[1:num_recommendations+1]  # skip self
-
-    item_indices = [i[0] for i in sim_scores]
-    recs = items_df.iloc[item_indices][["ITEM_CODE", "DESCRIPTION", "brand", "category"]].copy()
-    recs["similarity_score"] = [round(i[1], 3) for i in sim_scores]
-    return recs
+    return recommenders.recommend_similar_items(load_content_model(), item_code, num_recommendations)
 
 
 def recommend_for_customer_content(sanad_id, num_recommendations=5):
@@ -110,32 +84,11 @@ def recommend_for_customer_content(sanad_id, num_recommendations=5):
     df_b2b, summary_df = get_customers_B2B(sanad_id)
     if df_b2b.empty:
         return pd.DataFrame(columns=["ITEM_CODE", "DESCRIPTION", "brand", "category"])
-    
-    recs = pd.DataFrame()
-
-    for item_code in df_b2b["ITEM_CODE"].unique():
-        similar_items = recommend_similar_items(item_code, num_recommendations=10)
-        recs = pd.concat([recs, similar_items])
-
-    recs = recs[~recs["ITEM_CODE"].isin(df_b2b["ITEM_CODE"].unique())]
-    recs = recs.drop_duplicates(subset=["ITEM_CODE"])
-
-    # Diversification
-    diverse_list = []
-    seen_categories = set()
-    for _, row in recs.iterrows():
-        if row["category"] not in seen_categories:
-            diverse_list.append(row.to_dict())
-            seen_categories.add(row["category"])
-        if len(diverse_list) >= num_recommendations:
-            break
-    
-    if len(diverse_list) < num_recommendations:
-        remaining = recs[~recs["ITEM_CODE"].isin([r["ITEM_CODE"] for r in diverse_list])]
-        extra_needed = num_recommendations - len(diverse_list)
-        diverse_list.extend(remaining.head(extra_needed).to_dict("records"))
 
-    return pd.DataFrame(diverse_list)
+    return recommenders.recommend_for_customer_content(
+        load_content_model(), df_b2b["ITEM_CODE"], num_recommendations,
+        similar_items=recommend_similar_items,
+    )
 
 
 
@@ -150,8 +103,7 @@ def get_active_customers_last_3_months(customer_sanad_ids):
     sanad_ids_str = "', '".join(customer_sanad_ids)
     sanad_ids_str = f"'{sanad_ids_str}'"
 
-    with engine.connect() as conn:
-        query = text(f"""
+    query = text(f"""
 SELECT DISTINCT 
     COALESCE(TGT_P2.CUSTOMER_B2B_ID, ACH_C.CUSTOMER_B2B_ID)  AS CUSTOMER_B2B_ID,
     COALESCE(TGT_P2.CONTACT_NAME, ACH_C.CONTACT_NAME) AS Contact_Name,
@@ -193,7 +145,7 @@ ON TGT_P2.CUSTOMER_B2B_ID = ACH_C.CUSTOMER_B2B_ID;
 
         """)
 
-        df = pd.read_sql(query, conn)
+    df = db.read_sql(query, engine)
 
     return df
 
@@ -215,8 +167,7 @@ def get_active_customers_current_month(customer_sanad_ids):
     sanad_ids_str = "', '".join(customer_sanad_ids)
     sanad_ids_str = f"'{sanad_ids_str}'"
 
-    with engine.connect() as conn:
-        query = text(f"""
+    query = text(f"""
         SELECT DISTINCT
             c.CUSTOMER_B2B_ID as SanadID
         FROM MP_Sales s
@@ -231,7 +182,7 @@ def get_active_customers_current_month(customer_sanad_ids):
 
         """)
 
-        df = pd.read_sql(query, conn)
+    df = db.read_sql(query, engine)
 
     return df
 
@@ -281,9 +232,8 @@ def get_customers_B2B(sanad_id):
     if not sanad_id:
         return pd.DataFrame(), pd.DataFrame()
 
-    with engine.connect() as conn:
         # Modified main query - removed FORMAT(S.Date, 'MMM-yyyy') from SELECT and GROUP BY
-        query = text(f"""
+    query = text(f"""
         SELECT 
             i.ITEM_CODE,
             i.DESCRIPTION,
@@ -307,8 +257,8 @@ def get_customers_B2B(sanad_id):
         ORDER BY sales DESC
         """)
 
-        # Summary query remains the same
-        summary_query = text(f"""
+    # Summary query remains the same
+    summary_query = text(f"""
                              SELECT
             MIN(CAST(s.Date AS DATE)) AS FirstPurchasedDate,
             MAX(CAST(s.Date AS DATE)) AS LastPurchasedDate,
@@ -335,8 +285,8 @@ def get_customers_B2B(sanad_id):
             AND i.ITEM_CODE NOT LIKE '%XE%'
         """)
 
-        df = pd.read_sql(query, conn)
-        summary_df = pd.read_sql(summary_query, conn)
+    df = db.read_sql(query, engine)
+    summary_df = db.read_sql(summary_query, engine)
 
     return df, summary_df
 
@@ -347,9 +297,8 @@ def get_current_month_data(sanad_id):
     if not sanad_id:
         return pd.DataFrame(), pd.DataFrame()
 
-    with engine.connect() as conn:
         # Current month query
-        query = text(f"""
+    query = text(f"""
         SELECT 
         	s.Order_Number,
             cast(S.Date as date) as Date,
@@ -377,8 +326,8 @@ def get_current_month_data(sanad_id):
         ORDER BY Date DESC, sales DESC
         """)
 
-        # Current month summary
-        summary_query = text(f"""
+    # Current month summary
+    summary_query = text(f"""
         SELECT 
             FORMAT(DATEFROMPARTS(YEAR(GETDATE()), MONTH(GETDATE()), 1), 'MMM-yyyy') AS Month,
              MIN(CAST(s.Date AS DATE)) AS FirstPurchasedDate,
@@ -407,8 +356,8 @@ def get_current_month_data(sanad_id):
             AND i.ITEM_CODE NOT LIKE '%XE%'
         """)
 
-        df = pd.read_sql(query, conn)
-        summary_df = pd.read_sql(summary_query, conn)
+    df = db.read_sql(query, engine)
+    summary_df = db.read_sql(summary_query, engine)
 
     return df, summary_df
 
@@ -419,9 +368,8 @@ def get_last_month_data(sanad_id):
     if not sanad_id:
         return pd.DataFrame(), pd.DataFrame()
 
-    with engine.connect() as conn:
         # Last month query
-        query = text(f"""
+    query = text(f"""
         SELECT 
         	s.Order_Number,
             cast(S.Date as date) as Date,
@@ -449,8 +397,8 @@ def get_last_month_data(sanad_id):
         ORDER BY Date  DESC, sales DESC
         """)
 
-        # Last month summary
-        summary_query = text(f"""
+    # Last month summary
+    summary_query = text(f"""
         SELECT 
             FORMAT(DATEADD(MONTH, -1, DATEFROMPARTS(YEAR(GETDATE()), MONTH(GETDATE()), 1)), 'MMM-yyyy') AS Month,
             Round(Sum(s.Netsalesvalue),0) AS SalesAfterReturns,
@@ -468,8 +416,8 @@ def get_last_month_data(sanad_id):
             AND i.ITEM_CODE NOT LIKE '%XE%'
         """)
 
-        df = pd.read_sql(query, conn)
-        summary_df = pd.read_sql(summary_query, conn)
+    df = db.read_sql(query, engine)
+    summary_df = db.read_sql(summary_query, engine)
 
     return df, summary_df
 
@@ -480,9 +428,8 @@ def get_two_months_ago_data(sanad_id):
     if not sanad_id:
         return pd.DataFrame(), pd.DataFrame()
 
-    with engine.connect() as conn:
         # Two months ago query
-        query = text(f"""
+    query = text(f"""
 SELECT 
     s.Order_Number,
     cast(S.Date as date)  as Date,
@@ -511,8 +458,8 @@ ORDER BY Date DESC, sales DESC;
 
         """)
 
-        # Two months ago summary
-        summary_query = text(f"""
+    # Two months ago summary
+    summary_query = text(f"""
 SELECT 
     Format(s.Date , 'MMM-yyyy') as  Month,
    Round(Sum(s.Netsalesvalue),0) AS SalesAfterReturns,
@@ -533,8 +480,8 @@ ORDER BY MAX(S.Date);
 
         """)
 
-        df = pd.read_sql(query, conn)
-        summary_df = pd.read_sql(summary_query, conn)
+    df = db.read_sql(query, engine)
+    summary_df = db.read_sql(summary_query, engine)
 
     return df, summary_df
 
@@ -712,6 +659,72 @@ if not customer_df.empty:
 else:
     st.warning("No customers found for selected salesman.")
 
+# Result panels run as fragments: interacting with one reruns only that panel
+@st.fragment
+def monthly_details_panel(sanad_id):
+    """Monthly buttons rerun only this panel."""
+    # Three independent buttons for monthly data
+    if st.button("📅 الشهر الحالي", key="current_month_btn"):
+        # with st.spinner("Loading current month data..."):
+        monthly_df, monthly_summary = get_current_month_data(sanad_id)
+
+        if not monthly_df.empty:
+            st.subheader("📋 Current Month Data")
+            st.dataframe(monthly_df, use_container_width=True, height=300)
+
+            st.subheader("📊 Current Month Summary")
+            st.dataframe(monthly_summary, use_container_width=True)
+        else:
+            st.warning("No data found for current month.")
+
+    if st.button("📅 الشهر السابق", key="last_month_btn"):
+        # with st.spinner("Loading last month data..."):
+        monthly_df, monthly_summary = get_last_month_data(sanad_id)
+
+        if not monthly_df.empty:
+            st.subheader("📋 Last Month Data")
+            st.dataframe(monthly_df, use_container_width=True, height=300)
+
+            st.subheader("📊 Last Month Summary")
+            st.dataframe(monthly_summary, use_container_width=True)
+        else:
+            st.warning("No data found for last month.")
+
+    if st.button("📅 اول شهرين ", key="two_months_ago_btn"):
+        # with st.spinner("Loading 2 months ago data..."):
+        monthly_df, monthly_summary = get_two_months_ago_data(sanad_id)
+
+        if not monthly_df.empty:
+            st.subheader("📋 بيانات اول شهرين")
+            st.dataframe(monthly_df, use_container_width=True, height=300)
+
+            st.subheader("📊 ملخص مسوحبات اول شهرين ")
+            st.dataframe(monthly_summary, use_container_width=True)
+        else:
+            st.warning("ملوش مسوحبات اول هشرين  من ال3 شهور")
+
+
+@st.fragment
+def recommendations_panel(sanad_id):
+    """Slider and button rerun only this panel."""
+    top_n = st.slider("عدد المنتجات التي تريد اقتراحها", 1, 20, 5)
+
+    if st.button("📄 اعرض توصيات المنتجات", type="primary"):
+        # with st.spinner("Generating recommendations..."):
+        try:
+            content_recs = recommend_for_customer_content(
+                sanad_id, 
+                num_recommendations=top_n
+            )
+            if not content_recs.empty:
+                st.success(f"Top {top_n} Content-Based Recommendations for Customer ID: {sanad_id}")
+                st.dataframe(content_recs.reset_index(drop=True), use_container_width=True)
+            else:
+                st.warning("No content-based recommendations found.")
+        except Exception as e:
+            st.error(f"Error generating recommendations: {str(e)}")
+
+
 # Main data display
 if st.session_state.selected_sanad:
     # Create two columns for main view and monthly details
@@ -732,45 +745,7 @@ if st.session_state.selected_sanad:
     with detail_col:
         st.subheader("🗓️ Monthly Details")
         
-        # Three independent buttons for monthly data
-        if st.button("📅 الشهر الحالي", key="current_month_btn"):
-            # with st.spinner("Loading current month data..."):
-            monthly_df, monthly_summary = get_current_month_data(st.session_state.selected_sanad)
-                
-            if not monthly_df.empty:
-                st.subheader("📋 Current Month Data")
-                st.dataframe(monthly_df, use_container_width=True, height=300)
-                
-                st.subheader("📊 Current Month Summary")
-                st.dataframe(monthly_summary, use_container_width=True)
-            else:
-                st.warning("No data found for current month.")
-        
-        if st.button("📅 الشهر السابق", key="last_month_btn"):
-            # with st.spinner("Loading last month data..."):
-            monthly_df, monthly_summary = get_last_month_data(st.session_state.selected_sanad)
-                
-            if not monthly_df.empty:
-                st.subheader("📋 Last Month Data")
-                st.dataframe(monthly_df, use_container_width=True, height=300)
-                
-                st.subheader("📊 Last Month Summary")
-                st.dataframe(monthly_summary, use_container_width=True)
-            else:
-                st.warning("No data found for last month.")
-        
-        if st.button("📅 اول شهرين ", key="two_months_ago_btn"):
-            # with st.spinner("Loading 2 months ago data..."):
-            monthly_df, monthly_summary = get_two_months_ago_data(st.session_state.selected_sanad)
-                
-            if not monthly_df.empty:
-                st.subheader("📋 بيانات اول شهرين")
-                st.dataframe(monthly_df, use_container_width=True, height=300)
-                
-                st.subheader("📊 ملخص مسوحبات اول شهرين ")
-                st.dataframe(monthly_summary, use_container_width=True)
-            else:
-                st.warning("ملوش مسوحبات اول هشرين  من ال3 شهور")
+        monthly_details_panel(st.session_state.selected_sanad)
 
 else:
     st.info("من فضلك اختر عميل تريد الاستفسرار علي مسحوباته")
@@ -786,22 +761,7 @@ st.header("🎯 جزء توصيات المنتجات")
 
 if st.session_state.selected_sanad:
     
-    top_n = st.slider("عدد المنتجات التي تريد اقتراحها", 1, 20, 5)
-
-    if st.button("📄 اعرض توصيات المنتجات", type="primary"):
-        # with st.spinner("Generating recommendations..."):
-        try:
-            content_recs = recommend_for_customer_content(
-                st.session_state.selected_sanad, 
-                num_recommendations=top_n
-            )
-            if not content_recs.empty:
-                st.success(f"Top {top_n} Content-Based Recommendations for Customer ID: {st.session_state.selected_sanad}")
-                st.dataframe(content_recs.reset_index(drop=True), use_container_width=True)
-            else:
-                st.warning("No content-based recommendations found.")
-        except Exception as e:
-            st.error(f"Error generating recommendations: {str(e)}")
+    recommendations_panel(st.session_state.selected_sanad)
 else:
     st.info("حدد العميل التي تريد عرض توصيات له")
 
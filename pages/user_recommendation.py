@@ -3,7 +3,12 @@ import pickle
 import pandas as pd
 import requests
 import io
-from huggingface_hub import hf_hub_download
+import os
+
+from utils.lazy import lazy_import
+from utils.recommenders import recommend_for_customer
+
+huggingface_hub = lazy_import("huggingface_hub")
 
 HF_REPO = "your-username/sanad-pkl"  # <-- change to your repo name
 
@@ -17,8 +22,12 @@ FILES = [
 @st.cache_resource(show_spinner=True)
 def load_data():
     data_objects = []
+    local_dir = st.secrets.get("models", {}).get("local_dir")
     for file in FILES:
-        filepath = hf_hub_download(repo_id=HF_REPO, filename=file)
+        if local_dir and os.path.exists(os.path.join(local_dir, file)):
+            filepath = os.path.join(local_dir, file)
+        else:
+            filepath = huggingface_hub.hf_hub_download(repo_id=HF_REPO, filename=file)
         with open(filepath, "rb") as f:
             data_objects.append(pickle.load(f))
     return data_objects  # returns in same order as FILES
@@ -43,32 +52,6 @@ selected_customer = st.selectbox(
 customer_id = selected_customer if selected_customer else st.text_input("Enter Customer B2B ID", value="", placeholder="e.g., 12345")
 top_n = st.slider("Number of Recommendations", 1, 20, 5)
 
-def recommend_for_customer(customer_id, top_n=5, item_metadata=None):
-    if customer_id not in user_item.index:
-        return []
-    customer_purchases = user_item.loc[customer_id]
-    purchased_items = customer_purchases[customer_purchases > 0].index.tolist()
-    scores = pd.Series(dtype=float)
-
-    for item in purchased_items:
-        similar_items = item_sim_df[item].drop(index=purchased_items)
-        if item_metadata is not None:
-            item_info = item_metadata.set_index('ItemId')
-            if item in item_info.index:
-                item_row = item_info.loc[item]
-                mask = (item_info['Brand'] == item_row['Brand']) | (item_info['Category'] == item_row['Category'])
-                boost_ids = item_info[mask].index
-                similar_items[similar_items.index.isin(boost_ids)] *= 1.2
-        scores = scores.add(similar_items, fill_value=0)
-
-    if item_metadata is not None:
-        purchased_info = item_metadata[item_metadata['ItemId'].isin(purchased_items)]
-        target_values = purchased_info[['Brand', 'Category']].drop_duplicates()
-        valid_items = item_metadata.merge(target_values, on=['Brand', 'Category'])['ItemId']
-        scores = scores[scores.index.isin(valid_items)]
-
-    return scores.sort_values(ascending=False).head(top_n).index.tolist()
-
 if customer_id.strip() != "":
     if customer_id in df_customers['id'].values:
         customer_name = df_customers[df_customers['id'] == customer_id]['name'].values[0]
@@ -79,6 +62,8 @@ if customer_id.strip() != "":
 if st.button("🔍 Show Recommendations") and customer_id.strip() != "":
     recommendations = recommend_for_customer(
         customer_id=customer_id.strip(),
+        user_item=user_item,
+        item_sim_df=item_sim_df,
         top_n=top_n,
         item_metadata=df_items,
     )
@@ -0,0 +1,35 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+from utils import db, result_cache
+
+# Slow enough (a three-way cross join over 250 rows) to cancel while it runs
+SLOW_SQL = "SELECT COUNT(*) AS n FROM MP_Sales a, MP_Sales b, MP_Sales c"
+SLOW_ROWS = 250 ** 3
+
+
+@pytest.fixture
+def standin_pool(tmp_path):
+    """Connection pool over a small stand-in database; the shared result cache starts empty."""
+    path = os.path.join(tmp_path, "standin.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE MP_Sales (Date TEXT)")
+        conn.executemany("INSERT INTO MP_Sales VALUES (?)", [("2026-10-01",)] * 250)
+    result_cache.shared()[0].clear()
+    return db.ConnectionPool({"local_path": path})
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.05)
+
+
+def coalesced():
+    """Calls that joined another caller's execution in the shared result cache so far."""
+    return result_cache.shared()[0].stats()["coalesced"]
@@ -0,0 +1,54 @@
+"""Chart suggestions and the point budget for chatbot results."""
+import numpy as np
+import pandas as pd
+
+from utils import auto_chart
+
+
+def test_dates_give_a_line_per_brand():
+    df = pd.DataFrame({"Date": pd.date_range("2026-01-01", periods=6).repeat(2),
+                       "Brand": ["A", "B"] * 6, "Sales": range(12)})
+    assert auto_chart.suggest(df) == {"kind": "line", "x": "Date", "y": "Sales", "color": "Brand", "period": None}
+
+
+def test_year_and_month_numbers_become_one_period():
+    df = pd.DataFrame({"Year": [2025] * 12 + [2026] * 12, "Month": list(range(1, 13)) * 2, "Sales": range(24)})
+    chart = auto_chart.build(df)
+    assert chart["x"] == auto_chart.PERIOD and chart["period"] == ["Year", "Month"]
+    # Two years stay apart instead of being summed per month
+    assert len(chart["data"]) == 24
+    assert chart["data"][auto_chart.PERIOD].iloc[0] == pd.Timestamp("2025-01-01")
+
+
+def test_year_with_a_week_number_draws_a_line_per_year():
+    df = pd.DataFrame({"Year": [2025, 2025, 2026, 2026], "Week": [1, 2, 1, 2], "Sales": [1, 2, 3, 4]})
+    spec = auto_chart.suggest(df)
+    assert (spec["x"], spec["color"]) == ("Week", "Year")
+
+
+def test_categories_past_the_top_are_grouped():
+    df = pd.DataFrame({"Brand": [f"b{n}" for n in range(30)], "Sales": range(30)})
+    chart = auto_chart.build(df, top=5)
+    assert chart["kind"] == "bar"
+    assert list(chart["data"]["Brand"]) == ["b29", "b28", "b27", "b26", "b25", auto_chart.OTHER]
+    assert chart["data"]["Sales"].iloc[-1] == sum(range(25))
+    assert "25 more" in chart["note"]
+
+
+def test_long_series_are_downsampled_keeping_the_peak():
+    sales = np.zeros(5000)
+    sales[1234] = 100
+    df = pd.DataFrame({"Date": pd.date_range("2020-01-01", periods=5000), "Sales": sales})
+    chart = auto_chart.build(df, max_points=200)
+    assert len(chart["data"]) == 200
+    assert chart["data"]["Sales"].max() == 100
+    assert "downsampled" in chart["note"]
+
+
+def test_lttb_keeps_the_ends():
+    keep = auto_chart.lttb(np.arange(100), np.sin(np.arange(100)), 10)
+    assert len(keep) == 10 and keep[0] == 0 and keep[-1] == 99
+
+
+def test_no_chart_without_a_measure():
+    assert auto_chart.suggest(pd.DataFrame({"Brand": ["A", "B"], "ItemId": [1, 2]})) is None
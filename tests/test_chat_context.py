@@ -0,0 +1,46 @@
+"""Token-budgeted conversation memory."""
+import pandas as pd
+
+from utils import chat_context
+from utils.schema_index import estimate_tokens
+
+SQL = ("SELECT c.GOVERNER_NAME, SUM(s.Netsalesvalue) FROM MP_Sales s JOIN MP_Customers c "
+       "ON s.CustomerID = c.SITE_NUMBER WHERE YEAR(s.Date) = 2026 GROUP BY c.GOVERNER_NAME")
+
+
+def conversation(turns):
+    history = []
+    for n in range(turns):
+        history.append({"role": "user", "content": f"question {n} " + "about sales " * 10})
+        history.append({"role": "assistant", "content": "Here are your results:", "sql": SQL,
+                        "result": {"rows": 27, "columns": ["GOVERNER_NAME", "Sales"],
+                                   "preview": pd.DataFrame({"GOVERNER_NAME": ["Cairo"], "Sales": [1]})}})
+    history.append({"role": "user", "content": "and last month?"})
+    return history
+
+
+def test_describe_sql():
+    assert chat_context.describe_sql(SQL) == "MP_Sales, MP_Customers where YEAR(s.Date) = 2026"
+
+
+def test_recent_turns_verbatim_and_older_ones_summarized():
+    text = chat_context.build_conversation_context(conversation(5), budget_tokens=10_000, recent_turns=2)
+    assert text.count("SQL_USED:") == 2
+    assert text.count("- USER asked:") == 3
+    assert "27 rows (GOVERNER_NAME, Sales)" in text
+    assert text.endswith("USER: and last month?\n")
+
+
+def test_context_stays_within_the_budget():
+    history = conversation(30)
+    text = chat_context.build_conversation_context(history, budget_tokens=300)
+    assert estimate_tokens(text) <= 300
+    assert "question 29" in text and "question 0 " not in text
+    assert "and last month?" in text
+
+
+def test_previous_results_keep_the_latest_sample():
+    summary = chat_context.previous_results_summary(conversation(20), budget_tokens=200)
+    assert "Cairo" in summary and "SQL Used:" in summary
+    assert "Total: 20 datasets" in summary
+    assert summary.count("Result #") < 20
@@ -0,0 +1,50 @@
+"""Persisted chat sessions and their results."""
+import os
+import time
+
+import pandas as pd
+
+from utils.chat_sessions import ChatSessionStore
+from utils.result_store import ResultStore
+
+
+def test_messages_page_in_from_the_latest(tmp_path):
+    store = ChatSessionStore(os.path.join(tmp_path, "chats.sqlite"), os.path.join(tmp_path, "results"))
+    session_id = store.create("bi")
+    for n in range(25):
+        store.append(session_id, {"role": "user" if n % 2 == 0 else "assistant", "content": f"m{n}"})
+    latest = store.load(session_id)
+    assert [m["content"] for m in latest] == [f"m{n}" for n in range(15, 25)]
+    earlier = store.load(session_id, before=latest[0]["seq"], limit=20)
+    assert [m["content"] for m in earlier] == [f"m{n}" for n in range(15)]
+    assert store.session(session_id)["messages"] == 25
+    assert store.session("unknown") is None
+
+
+def test_result_handles_reopen_in_a_new_process(tmp_path):
+    store = ChatSessionStore(os.path.join(tmp_path, "chats.sqlite"), os.path.join(tmp_path, "results"))
+    session_id = store.create("bi")
+    df = pd.DataFrame({"Governorate": ["Cairo", "Giza"], "Sales": [30, 10]})
+    handle = ResultStore(store.results_dir(session_id), persist=True).put(df)
+    store.append(session_id, {"role": "assistant", "content": "Here are your results:", "sql": "SELECT 1",
+                              "result": handle, "query_id": "query_1"})
+
+    (message,) = ChatSessionStore(store.path, store.results_root).load(session_id)
+    assert message["sql"] == "SELECT 1" and "preview" not in message["result"]
+    reopened = ResultStore(store.results_dir(session_id))
+    assert reopened.adopt(message["result"])
+    pd.testing.assert_frame_equal(message["result"]["preview"], df)
+    pd.testing.assert_frame_equal(reopened.get(message["result"]["id"]), df)
+    # The next result does not reuse the adopted id
+    assert reopened.put(df)["id"] != handle["id"]
+
+
+def test_idle_sessions_are_pruned_with_their_results(tmp_path, monkeypatch):
+    store = ChatSessionStore(os.path.join(tmp_path, "chats.sqlite"), os.path.join(tmp_path, "results"))
+    session_id = store.create("trade")
+    ResultStore(store.results_dir(session_id), persist=True).put(pd.DataFrame({"a": [1]}))
+    later = time.time() + 31 * 86400
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert store.prune(30) == 1
+    assert store.session(session_id) is None
+    assert not os.path.exists(store.results_dir(session_id))
@@ -0,0 +1,19 @@
+"""SQL extraction from model responses."""
+import pytest
+
+from utils.chatbot import complete_sql_block, sanitize_and_extract_sql_from_gemini
+from utils.llm import TextResponse
+
+
+@pytest.mark.parametrize("text", [
+    "Here you go:\n```sql\nSELECT 1\n```\nThis counts rows.",
+    "```SQL\nSELECT 1\n```",
+    "```\nSELECT 1\n```",
+])
+def test_whole_and_streamed_extraction_agree(text):
+    assert sanitize_and_extract_sql_from_gemini(TextResponse(text)) == complete_sql_block(text) == "SELECT 1"
+
+
+def test_unfenced_response_is_the_sql():
+    assert sanitize_and_extract_sql_from_gemini(TextResponse("  SELECT 1 ")) == "SELECT 1"
+    assert complete_sql_block("```sql\nSELECT 1") is None
@@ -0,0 +1,52 @@
+"""Pooled warehouse connections and coalesced reads."""
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from tests.conftest import SLOW_ROWS, SLOW_SQL
+from utils import db
+from utils.query_stream import QueryCancelled, QueryTimeout
+
+
+@pytest.mark.parametrize("error", [QueryCancelled, QueryTimeout])
+def test_stopped_query_does_not_return_its_connection(standin_pool, error):
+    with pytest.raises(error):
+        with standin_pool.connection() as conn:
+            stopped = conn
+            raise error("stopped")
+    with standin_pool.connection() as conn:
+        assert conn is not stopped
+
+
+def test_connection_is_reused_after_a_query(standin_pool):
+    with standin_pool.connection() as conn:
+        first = conn
+    with standin_pool.connection() as conn:
+        assert conn is first
+
+
+def test_identical_reads_share_one_connection(standin_pool):
+    engine = db.create_engine(standin_pool.db_config)
+    checked_out, most = [0], [0]
+
+    @event.listens_for(engine, "checkout")
+    def checkout(*args):
+        checked_out[0] += 1
+        most[0] = max(most[0], checked_out[0])
+
+    @event.listens_for(engine, "checkin")
+    def checkin(*args):
+        checked_out[0] -= 1
+
+    shared_before = db._in_flight.shared
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(db.read_sql(SLOW_SQL, engine))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [df["n"].iloc[0] for df in results] == [SLOW_ROWS] * 4
+    # Waiters share the first caller's execution without checking out connections of their own
+    assert db._in_flight.shared > shared_before
+    assert most[0] == 1
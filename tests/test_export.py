@@ -0,0 +1,47 @@
+"""On-demand CSV/Excel exports."""
+import codecs
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from utils import export
+from utils.result_store import ResultStore
+
+DF = pd.DataFrame({"Governorate": ["القاهرة", "Giza", None], "Sales": [30.5, 10, 20]})
+
+
+def test_csv_is_written_in_chunks_with_one_header():
+    data = export.csv_file(DF, chunk_rows=1).read()
+    assert data.startswith(codecs.BOM_UTF8)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(data), encoding="utf-8-sig"), DF)
+
+
+def test_query_export_stops_at_the_row_limit(standin_pool):
+    with standin_pool.connection() as conn:
+        data = export.query_csv_bytes(conn, "SELECT Date FROM MP_Sales", max_rows=100, chunk_rows=30)
+    df = pd.read_csv(io.BytesIO(data), encoding="utf-8-sig")
+    assert list(df.columns) == ["Date"] and len(df) == 100
+
+
+def test_sheet_names_are_excel_safe_and_unique():
+    used = set()
+    assert export.sheet_name("Sales [2026]: Q1/Q2", used) == "Sales  2026   Q1 Q2"
+    long = "x" * 40
+    assert export.sheet_name(long, used) == "x" * 31
+    assert export.sheet_name(long, used) == "x" * 27 + " (2)"
+
+
+def test_session_workbook_reads_results_one_at_a_time(tmp_path):
+    pytest.importorskip("xlsxwriter")
+    store = ResultStore(os.path.join(tmp_path, "results"), memory_window=0)
+    handles = [store.put(DF), store.put(DF.head(1))]
+    datasets = [("Result 1", "sales by governorate", handles[0]), ("Result 2", "top one", handles[1]),
+                ("Result 3", "expired", {"id": "r99", "rows": 0, "columns": []})]
+    data = export.xlsx_bytes(export.session_sheets(store, datasets))
+    with zipfile.ZipFile(io.BytesIO(data)) as workbook:
+        names = workbook.read("xl/workbook.xml").decode("utf-8")
+    assert [n in names for n in ("Datasets", "Result 1", "Result 2", "Result 3")] == [True, True, True, False]
+    assert not any(store.in_memory(h["id"]) for h in handles)
@@ -0,0 +1,28 @@
+"""Few-shot examples: n-gram search, persistence and access levels."""
+import os
+
+from utils import few_shot
+from utils.few_shot import FewShotIndex
+
+SQL = "SELECT c.GOVERNER_NAME, SUM(s.NetSalesValue) AS Sales FROM MP_Sales s GROUP BY c.GOVERNER_NAME"
+
+
+def test_similar_wording_finds_the_example(tmp_path):
+    index = FewShotIndex(os.path.join(tmp_path, "examples.jsonl"))
+    index.add("Total sales by governorate", SQL)
+    index.add("Number of active customers per brand", "SELECT 1")
+    (score, question, sql), = index.search("total sale by governorates", k=1)
+    assert question == "Total sales by governorate" and sql == SQL
+
+
+def test_examples_survive_a_restart(tmp_path):
+    path = os.path.join(tmp_path, "examples.jsonl")
+    FewShotIndex(path).add("Total sales by governorate", SQL)
+    assert FewShotIndex(path).search("Total sales by governorate")[0][2] == SQL
+
+
+def test_access_levels_keep_separate_examples(tmp_path):
+    path = os.path.join(tmp_path, "examples.jsonl")
+    assert few_shot.level_path(path, "bi") == os.path.join(tmp_path, "examples.bi.jsonl")
+    FewShotIndex(few_shot.level_path(path, "bi")).add("Total sales by governorate", SQL)
+    assert FewShotIndex(few_shot.level_path(path, "trade")).search("Total sales by governorate") == []
@@ -0,0 +1,91 @@
+"""The process-wide model gateway: timeouts, single-flight and hedged requests."""
+import threading
+import time
+
+import pytest
+
+from utils import llm
+from utils.llm_gateway import LLMGateway, LLMTimeout
+
+PROMPT = 'The user is asking: "total sales"'
+
+
+class ScriptedBackend:
+    """Answers after the delay scripted for each call in turn; honours the request timeout."""
+
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.timeouts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, timeout=None):
+        with self._lock:
+            call = len(self.timeouts)
+            self.timeouts.append(timeout)
+        delay = self.delays[min(call, len(self.delays) - 1)]
+        if timeout and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("request timed out")
+        time.sleep(delay)
+        return llm.TextResponse(f"answer {call}")
+
+
+def test_hung_request_gives_its_slot_back():
+    backend = ScriptedBackend(60, 0)
+    gateway = LLMGateway(backend, max_concurrency=1, timeout=0.2)
+    with pytest.raises(LLMTimeout):
+        gateway.generate_content("first")
+    # The provider request had a deadline of its own, so the only slot frees up
+    started = time.monotonic()
+    assert gateway.generate_content("second", timeout=10).text == "answer 1"
+    assert time.monotonic() - started < 5
+    assert backend.timeouts[0] <= 1
+
+
+def test_identical_prompts_share_one_request():
+    backend = llm.StubBackend(latency=0.3)
+    gateway = LLMGateway(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gateway.generate_content(PROMPT).text))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.calls == 1
+    assert len(set(results)) == 1
+    assert gateway.stats()["deduplicated"] == 2
+
+
+def test_slow_request_is_hedged():
+    gateway = LLMGateway(ScriptedBackend(3, 0), hedge_after=0.1)
+    assert gateway.generate_content(PROMPT).text == "answer 1"
+    stats = gateway.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+
+class StreamingBackend:
+    """Streams the SQL block, then an explanation the gateway should never wait for."""
+
+    def __init__(self):
+        self.sent = []
+
+    def stream_content(self, prompt, timeout=None):
+        for chunk in ["```sql\nSELECT ", "1\n```", "\nThis query", " returns one."]:
+            self.sent.append(chunk)
+            yield chunk
+
+
+def test_stream_stops_at_the_closing_fence():
+    backend = StreamingBackend()
+    gateway = LLMGateway(backend)
+    assert gateway.generate_content(PROMPT).text == "```sql\nSELECT 1\n```"
+    assert len(backend.sent) == 2
+    assert gateway.stats()["early_stops"] == 1
+
+
+def test_generate_async_while_the_model_writes():
+    gateway = LLMGateway(llm.StubBackend(latency=0.2))
+    future = gateway.generate_async(PROMPT)
+    assert not future.done()
+    assert "SELECT" in future.result(timeout=10).text
@@ -0,0 +1,23 @@
+"""In-memory follow-ups over the previous chatbot result."""
+import pandas as pd
+import pytest
+
+from utils import local_followup
+
+
+@pytest.mark.parametrize("question, follows", [
+    ("filter the previous results to the top 3", True),
+    ("which of these are in Cairo?", True),
+    ("رتب النتائج السابقة حسب المبيعات", True),
+    ("Total sales by governorate last month", False),
+    ("group sales by brand", False),
+    ("المبيعات الشهر الماضي", False),
+])
+def test_refers_to_result(question, follows):
+    assert local_followup.refers_to_result(question) is follows
+
+
+def test_run_over_previous_result():
+    previous = pd.DataFrame({"Governorate": ["Cairo", "Giza", "Alex"], "Sales": [30, 10, 20]})
+    df = local_followup.run(f"SELECT * FROM {local_followup.TABLE} ORDER BY Sales DESC LIMIT 2", previous)
+    assert df["Governorate"].tolist() == ["Cairo", "Alex"]
@@ -0,0 +1,60 @@
+"""Background SQL Query jobs on the SQLite stand-in."""
+import pytest
+
+from tests.conftest import SLOW_ROWS, SLOW_SQL, coalesced, wait_for
+from utils import query_jobs, result_cache
+
+
+@pytest.fixture
+def runner(standin_pool):
+    return query_jobs.JobRunner(standin_pool)
+
+
+def cached_query(sql):
+    # What the page submits: the SQL through the shared result cache, read as part of the job
+    def work(conn, job):
+        df, job.info["from_cache"] = result_cache.run_cached(conn, sql, lambda: job.read(conn, sql))
+        return df
+
+    return work
+
+
+def test_cancelled_job_does_not_cancel_a_job_sharing_its_query(runner):
+    shared_before = coalesced()
+    first = runner.submit(cached_query(SLOW_SQL))
+    wait_for(lambda: first.status == query_jobs.RUNNING)
+    second = runner.submit(cached_query(SLOW_SQL))
+    # The second job waits on the first one's execution of the same SQL
+    wait_for(lambda: coalesced() > shared_before)
+
+    runner.cancel(first.id)
+    wait_for(lambda: first.done and second.done, timeout=120)
+
+    assert first.status == query_jobs.CANCELLED
+    assert second.status == query_jobs.DONE, second.error
+    assert second.result["n"].iloc[0] == SLOW_ROWS
+
+
+def test_finished_results_are_bounded_in_memory(standin_pool):
+    runner = query_jobs.JobRunner(standin_pool, max_mb=1)
+    jobs = [runner.submit(cached_query(f"SELECT TOP 20000 a.Date, {n} AS run FROM MP_Sales a, MP_Sales b"))
+            for n in range(4)]
+    wait_for(lambda: all(job.done for job in jobs))
+
+    kept = [job for job in jobs if runner.get(job.id) is not None]
+    assert all(job.status == query_jobs.DONE for job in jobs)
+    assert 0 < len(kept) < len(jobs)
+    assert sum(job.nbytes for job in kept) <= 2**20
+    # The newest results stay
+    assert kept[-1] is jobs[-1]
+
+
+def test_discarded_job_is_cancelled_and_forgotten(runner):
+    job = runner.submit(cached_query(SLOW_SQL))
+    wait_for(lambda: job.status == query_jobs.RUNNING)
+
+    runner.discard(job.id)
+    wait_for(lambda: job.done)
+
+    assert runner.get(job.id) is None
+    assert job.status == query_jobs.CANCELLED
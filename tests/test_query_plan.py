@@ -0,0 +1,65 @@
+"""Planned chatbot sub-queries on the SQLite stand-in."""
+import threading
+
+import pandas as pd
+import pytest
+
+from tests.conftest import SLOW_ROWS, SLOW_SQL, coalesced, wait_for
+from utils import query_plan, result_cache
+from utils.query_stream import QueryCancelled, QueryStream, StreamGroup
+
+
+def run_plan(pool, parts, group, outcome):
+    # What BI_Chatbot.run_plan does per session: each part streamed through the shared result cache
+    def run_part(sql):
+        with pool.connection() as conn:
+            stream = group.add(QueryStream(conn, sql))
+            df, _ = result_cache.run_cached(conn, sql, stream.read)
+            return df
+
+    try:
+        outcome["parts"] = query_plan.execute(parts, run_part, cancel=group.cancel)
+    except Exception as e:
+        outcome["error"] = e
+
+
+def test_cancelled_plan_does_not_fail_a_session_sharing_a_part(standin_pool):
+    parts = [("Sales lines", SLOW_SQL)]
+    cancelled, other = StreamGroup(), StreamGroup()
+    cancelled_outcome, other_outcome = {}, {}
+    shared_before = coalesced()
+    first = threading.Thread(target=run_plan, args=(standin_pool, parts, cancelled, cancelled_outcome))
+    first.start()
+    wait_for(lambda: cancelled._streams)
+    second = threading.Thread(target=run_plan, args=(standin_pool, parts, other, other_outcome))
+    second.start()
+    # The second session's part waits on the first session's execution
+    wait_for(lambda: coalesced() > shared_before)
+
+    cancelled.cancel()
+    first.join(120)
+    second.join(120)
+
+    assert isinstance(cancelled_outcome.get("error"), QueryCancelled)
+    assert "error" not in other_outcome, other_outcome.get("error")
+    (df, _), = other_outcome["parts"]
+    assert df["n"].iloc[0] == SLOW_ROWS
+
+
+def test_compound_markers():
+    assert query_plan.is_compound("sales and active customers per governorate this month vs last month")
+    assert query_plan.is_compound("مقارنة المبيعات هذا الشهر بالشهر الماضي")
+    assert not query_plan.is_compound("sales for Cairo and Giza by brand")
+    assert not query_plan.is_compound("المبيعات والعملاء في القاهرة")
+
+
+def test_combine_rejects_repeated_keys():
+    parts = [("This month", ""), ("Last month", "")]
+    this_month = pd.DataFrame({"GOVERNER_NAME": ["Cairo", "Giza"], "Sales": [10, 20]})
+    last_month = pd.DataFrame({"GOVERNER_NAME": ["Cairo", "Cairo"], "Sales": [5, 6]})
+    with pytest.raises(ValueError, match="Last month"):
+        query_plan.combine(["GOVERNER_NAME"], parts, [this_month, last_month])
+
+    last_month = last_month.drop_duplicates("GOVERNER_NAME")
+    combined = query_plan.combine(["GOVERNER_NAME"], parts, [this_month, last_month])
+    assert len(combined) == 2
@@ -0,0 +1,61 @@
+"""Chunked, cancellable query execution."""
+import threading
+
+import pytest
+
+from tests.conftest import SLOW_SQL, wait_for
+from utils import query_stream
+from utils.query_stream import ConnectionBusy, QueryCancelled, QueryStream, QueryTimeout
+
+
+class StuckCursor:
+    """A cursor whose statement ignores cancel() until released."""
+
+    description = [("n",)]
+
+    def __init__(self, release):
+        self.release = release
+
+    def execute(self, sql):
+        self.release.wait(30)
+
+    def fetchmany(self, size):
+        return []
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StuckConnection:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def cursor(self):
+        return StuckCursor(self.release)
+
+
+def test_cancel_waits_for_the_worker(standin_pool):
+    with standin_pool.connection() as conn:
+        # Four-way cross join: far too long to finish before the first poll
+        stream = QueryStream(conn, SLOW_SQL + ", MP_Sales d", timeout=60)
+        with pytest.raises(QueryCancelled):
+            # Cancelled at the first poll, while the statement runs
+            stream.read(on_wait=QueryStream.cancel)
+        assert not stream.busy
+
+
+def test_worker_that_will_not_stop_reports_a_busy_connection(monkeypatch):
+    monkeypatch.setattr(query_stream, "JOIN_SECONDS", 0.2)
+    conn = StuckConnection()
+    stream = QueryStream(conn, "SELECT 1", timeout=0.3)
+    try:
+        with pytest.raises(ConnectionBusy) as raised:
+            stream.read()
+        assert isinstance(raised.value.__context__, QueryTimeout)
+        assert stream.busy
+    finally:
+        conn.release.set()
+    wait_for(lambda: not stream.busy)
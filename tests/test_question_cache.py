@@ -0,0 +1,39 @@
+"""Question -> SQL cache keys: normalized question, access level and schema version."""
+import time
+
+from utils.question_cache import QuestionCache, normalize_question
+
+SQL = "SELECT 1"
+
+
+def test_wordings_that_normalize_alike():
+    assert normalize_question("Sales by governorate this month") == normalize_question("sales  by Governorate this month?")
+    assert normalize_question("مبيعات شهر ١٠") == normalize_question("مبيعات شهر 10")
+    assert normalize_question("أعلى مبيعات") == normalize_question("اعلى مبيعات")
+    assert normalize_question("مَبيعات") == normalize_question("مبيعات")
+
+
+def test_access_level_and_schema_version_are_part_of_the_key():
+    cache = QuestionCache()
+    cache.put("Total sales by governorate", "bi", "v1", SQL)
+    assert cache.get("total sales by governorate?", "bi", "v1") == SQL
+    assert cache.get("Total sales by governorate", "trade", "v1") is None
+    assert cache.get("Total sales by governorate", "bi", "v2") is None
+
+
+def test_new_schema_version_drops_older_entries():
+    cache = QuestionCache()
+    cache.put("q1", "bi", "v1", SQL)
+    cache.put("q2", "bi", "v2", SQL)
+    assert cache.stats()["entries"] == 1
+
+
+def test_lru_and_ttl(monkeypatch):
+    cache = QuestionCache(max_entries=2, ttl_seconds=60)
+    for question in ("q1", "q2", "q3"):
+        cache.put(question, "bi", "v1", SQL)
+    assert cache.get("q1", "bi", "v1") is None
+    assert cache.get("q3", "bi", "v1") == SQL
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("q3", "bi", "v1") is None
@@ -0,0 +1,74 @@
+"""The shared query result cache and the MP_Sales data version."""
+import pandas as pd
+
+from utils import result_cache
+from utils.result_cache import DataVersion, ResultCache
+
+
+class VersionCursor:
+    def __init__(self, answers, query_log):
+        self.answers = answers
+        self.query_log = query_log
+        self.row = None
+
+    def execute(self, sql):
+        self.query_log.append(sql)
+        answer = self.answers[result_cache.DATA_VERSION_QUERIES.index(sql)]
+        if isinstance(answer, Exception):
+            raise answer
+        self.row = (answer,)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class VersionConnection:
+    """Answers the data version queries in order: a value, None (NULL) or an exception."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.queries = []
+
+    def cursor(self):
+        return VersionCursor(self.answers, self.queries)
+
+
+def test_null_version_falls_back_to_the_load_date():
+    conn = VersionConnection(None, "2026-10-01")
+    assert DataVersion()._fetch(conn) == "2026-10-01"
+
+
+def test_no_version_means_no_caching():
+    version = DataVersion()._fetch(VersionConnection(None, None))
+    assert version is None
+    cache = ResultCache()
+    cache.put("SELECT 1", version, pd.DataFrame({"a": [1]}))
+    assert cache.get("SELECT 1", version) is None
+
+
+def test_standin_version(standin_pool):
+    with standin_pool.connection() as conn:
+        assert DataVersion()._fetch(conn).startswith("2026-10-01")
+
+
+def test_new_data_version_drops_older_results():
+    cache = ResultCache()
+    df = pd.DataFrame({"a": [1, 2]})
+    cache.put("select  1", "v1", df)
+    # Same fingerprint: case and whitespace do not matter
+    assert cache.get("SELECT 1", "v1") is not None
+    cache.put("SELECT 2", "v2", df)
+    assert cache.get("SELECT 1", "v1") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_lru_within_the_memory_budget():
+    df = pd.DataFrame({"a": range(100_000)})
+    cache = ResultCache(max_mb=2)
+    for n in range(3):
+        cache.put(f"SELECT {n}", "v", df)
+    assert cache.get("SELECT 0", "v") is None
+    assert cache.get("SELECT 2", "v") is not None
@@ -0,0 +1,35 @@
+"""Chatbot results: in-memory LRU window, Parquet spill and reopening."""
+import os
+
+import pandas as pd
+import pytest
+
+from utils.result_store import ResultStore
+
+
+def frame(n):
+    return pd.DataFrame({"Governorate": [f"g{i}" for i in range(50)], "Sales": range(n, n + 50)})
+
+
+def test_older_results_spill_and_read_back(tmp_path):
+    store = ResultStore(os.path.join(tmp_path, "results"), memory_window=2, preview_rows=5)
+    handles = [store.put(frame(n)) for n in range(4)]
+    assert [store.in_memory(h["id"]) for h in handles] == [False, False, True, True]
+    assert store.stats()["spilled"] == 2
+    assert len(handles[0]["preview"]) == 5 and handles[0]["rows"] == 50
+
+    pd.testing.assert_frame_equal(store.get(handles[0]["id"], keep=False), frame(0))
+    assert not store.in_memory(handles[0]["id"])
+    # Reading it back with keep=True moves it into the window, pushing out the least recent
+    store.get(handles[1]["id"])
+    assert store.in_memory(handles[1]["id"]) and not store.in_memory(handles[2]["id"])
+    with pytest.raises(KeyError):
+        store.get("r99")
+
+
+def test_duplicate_unnamed_columns_survive_the_spill(tmp_path):
+    store = ResultStore(os.path.join(tmp_path, "results"), memory_window=0)
+    df = pd.DataFrame([[1, 2], [3, 4]], columns=["", ""])
+    handle = store.put(df)
+    assert list(store.get(handle["id"], keep=False).columns) == ["", ""]
+
@@ -0,0 +1,33 @@
+"""Relevance-filtered schema prompt."""
+import pytest
+
+from utils.chatbot import Schema_description
+from utils.schema_index import SchemaIndex, estimate_tokens
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SchemaIndex(Schema_description())
+
+
+def test_the_prompt_is_split_into_rules_and_code_lists(index):
+    assert "MP_Sales" in index.core
+    assert "692376|Coca Cola" not in index.core
+    assert ("692376", "Coca Cola") in index.lists["brands"]
+    assert len(index.lists["categories"]) <= 20
+
+
+def test_brands_match_in_english_arabic_and_with_typos(index):
+    for question in ("sales of Coca Cola", "مبيعات كوكاكولا", "sales of cocacola", "sales of Coca Colla"):
+        assert ("692376", "Coca Cola") in index.match(question).get("brands", []), question
+    # Short names only match exactly
+    assert ("876045", "RC") in index.match("RC sales").get("brands", [])
+    assert "brands" not in index.match("arc sales")
+
+
+def test_prompt_carries_only_the_mentioned_brands(index):
+    prompt = index.prompt_for("Chipsy sales by governorate")
+    assert "892069|Chipsy" in prompt
+    assert "692376|Coca Cola" not in prompt
+    assert estimate_tokens(prompt) < estimate_tokens(index.full_prompt) / 2
+    assert "No listed brand was recognized" in index.prompt_for("sales by governorate")
@@ -0,0 +1,46 @@
+"""Server-side paging of SQL Query page SELECTs."""
+import pytest
+
+from utils import db, sql_paging
+
+
+def test_pages_stop_at_the_query_top():
+    paged = sql_paging.PagedQuery("SELECT TOP 200 Date FROM MP_Sales ORDER BY Date")
+    assert paged.limit == 200
+    assert "TOP" not in paged.sql
+    assert paged.page_sql(1, 150).endswith("OFFSET 150 ROWS FETCH NEXT 50 ROWS ONLY")
+    assert paged.page_sql(2, 100) is None
+    assert paged.clamp(10_000) == 200
+
+
+def test_unordered_pages_use_every_column():
+    paged = sql_paging.PagedQuery("SELECT Date, COUNT(*) FROM MP_Sales GROUP BY Date")
+    assert "ORDER BY 1, 2\n" in paged.page_sql(0, 100)
+    assert paged.stable
+    assert not sql_paging.PagedQuery("SELECT * FROM MP_Sales").stable
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT Date FROM MP_Sales ORDER BY Date OFFSET 5 ROWS",
+    "SELECT Date FROM MP_Sales OPTION (RECOMPILE)",
+    "SELECT TOP 10 PERCENT Date FROM MP_Sales",
+])
+def test_unpageable_queries(sql):
+    with pytest.raises(sql_paging.PagingUnsupported):
+        sql_paging.PagedQuery(sql)
+
+
+def test_estimate_is_clamped_to_the_top(standin_pool, monkeypatch):
+    paged = sql_paging.PagedQuery("SELECT TOP 200 Date FROM MP_Sales")
+    with standin_pool.connection() as conn:
+        # No plan on the stand-in: an exact COUNT
+        assert sql_paging.estimate_rows(conn, paged, db.driver_errors()) == (200, True)
+        # A SQL Server plan estimate above the TOP is only an estimate, clamped to it
+        monkeypatch.setattr(sql_paging, "_plan_estimate", lambda conn, sql: 1e6)
+        assert sql_paging.estimate_rows(conn, paged, db.driver_errors()) == (200, False)
+
+
+def test_count_fallback_with_unnamed_columns(standin_pool):
+    paged = sql_paging.PagedQuery("WITH d AS (SELECT Date FROM MP_Sales) SELECT Date, COUNT(*) FROM d GROUP BY Date")
+    with standin_pool.connection() as conn:
+        assert sql_paging.estimate_rows(conn, paged, db.driver_errors()) == (1, True)
@@ -0,0 +1,18 @@
+"""Coded-filter rewrites and the row cap."""
+from utils.sql_rewrite import prepare
+
+CODE = "LEFT(i.MG2, CHARINDEX('|', i.MG2) - 1)"
+
+
+def test_only_whole_predicates_are_rewritten():
+    sql, _ = prepare(f"SELECT a FROM t i WHERE {CODE} = 'X1' AND b = 1", row_cap=None)
+    assert sql == "SELECT a FROM t i WHERE i.MG2 LIKE 'X1|%' AND b = 1"
+    for tail in ("COLLATE Latin1_General_CI_AS", "+ 'b'"):
+        original = f"SELECT a FROM t i WHERE {CODE} = 'X1' {tail}"
+        assert prepare(original, row_cap=None) == (original, [])
+
+
+def test_compound_queries_say_they_are_not_capped():
+    sql, notes = prepare("SELECT a FROM t UNION ALL SELECT b FROM u", row_cap=100)
+    assert "TOP" not in sql
+    assert any("UNION" in note for note in notes)
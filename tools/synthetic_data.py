@@ -0,0 +1,426 @@
+"""Generate a synthetic Sanad warehouse for load and benchmark testing.
+
+Writes MP_Items, MP_Customers and MP_Sales (same column names the pages query)
+into a local SQLite stand-in, a salesman roster CSV standing in for the Google
+Sheet, a secrets file pointing the pages at all of it, and model artifacts
+shaped like the ones the recommender pages download.
+
+    python -m tools.synthetic_data --out data/synthetic --sales-lines 20000000
+"""
+import argparse
+import datetime
+import os
+import pickle
+import sqlite3
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Real brand / category codes so prompts and golden questions line up with the data
+BRANDS = [
+    "724046|موندليز", "692376|Coca Cola", "694044|MP_P&G", "692385|Indomie", "892069|Chipsy",
+    "692370|PEPSICO", "692372|Nestle", "692379|Unilever", "692369|Juhayna", "180829|Domty",
+    "692355|Edita", "692391|Savola", "787044|lipton", "692453|Ferrero", "692704|Haribo",
+    "692388|Sun Top", "692394|Obour Land", "692402|Abu Auf", "151081|Bisco Misr", "692652|Pantene",
+    "692455|Vatika", "692572|Clorox", "692434|Galaxy", "894045|Kit Kat", "731057|Redbull",
+    "692516|Cheetos", "692554|Doritos", "692695|Pringles", "692694|Mentos", "692437|Ulker",
+    "849052|Milka", "692381|Mansour", "711383|سيما", "711224|الريحان", "711399|غندور",
+]
+CATEGORIES = [
+    "720046|البسكويت والحلويات", "841044|بقوليات و توابل", "720048|منتجات العناية الشخصية",
+    "720050|المنتجات التموينية (البقالة)", "718047|المياه", "720044|المشروبات الباردة",
+    "720049|الشييسي و المقرمشات", "711054|منتجات البان", "720047|المعلبات و المأكولات",
+    "934046|الورقيات و الحفاضات", "718049|المنظفات و أدوات المنزل", "720045|المشروبات الساخنة",
+]
+SUBCATEGORIES = {
+    "720046|البسكويت والحلويات": ["719050|شوكولاتة", "711066|بسكويت", "711132|كيك", "804045|وافل"],
+    "841044|بقوليات و توابل": ["846044|توابل", "845044|البقوليات"],
+    "720048|منتجات العناية الشخصية": ["719079|العناية بالشعر", "888045|العنايه بالاسنان", "711107|صابون"],
+    "720050|المنتجات التموينية (البقالة)": ["711090|زيت", "711097|سكر", "711058|ارز", "711163|مكرونة"],
+    "718047|المياه": ["718047|المياه"],
+    "720044|المشروبات الباردة": ["711151|مشروبات غازية", "711112|عصائر", "711150|مشروبات طاقة"],
+    "720049|الشييسي و المقرمشات": ["711102|شرائح بطاطس", "711162|مقرمشات"],
+    "711054|منتجات البان": ["719045|حليب كامل الدسم", "711057|اجبان", "711087|زبادي"],
+    "720047|المعلبات و المأكولات": ["711073|تونة", "711176|نودلز", "711108|صلصة"],
+    "934046|الورقيات و الحفاضات": ["936044|المناديل", "936046|الحفاضات"],
+    "718049|المنظفات و أدوات المنزل": ["711146|مسحوق غسيل", "719077|منظف اطباق", "719076|منظف"],
+    "720045|المشروبات الساخنة": ["711101|شاي", "711121|قهوة", "711173|نسكافية"],
+}
+GOVERNORATES = [
+    "القاهرة", "الجيزة", "الإسكندرية", "القليوبية", "الشرقية", "الدقهلية", "الغربية",
+    "المنوفية", "البحيرة", "كفر الشيخ", "دمياط", "بورسعيد", "الإسماعيلية", "السويس",
+    "الفيوم", "بني سويف", "المنيا", "أسيوط", "سوهاج", "قنا", "الأقصر", "أسوان",
+]
+SIZES = ["100g", "250g", "500g", "1kg", "330ml", "1L", "1.5L", "2.25L", "Small", "Family"]
+FORMS = ["Pack", "Bottle", "Can", "Box", "Bag", "Jar"]
+
+ITEMS_COLUMNS = [
+    "ITEM_CODE", "DESCRIPTION", "MASTER_BRAND", "MG2", "MG3", "GCOMPANY",
+    "GFORM", "GSIZE", "MSU", "CONVERSION_RATE", "Supplier",
+]
+CUSTOMERS_COLUMNS = [
+    "SITE_NUMBER", "CUSTOMER_B2B_ID", "CUSTOMER_NAME", "CONTACT_NAME",
+    "PHONE_NUMBER", "GOVERNER_NAME", "AREA_NAME",
+]
+SALES_COLUMNS = [
+    "Order_Number", "Date", "month", "CustomerID", "ItemId", "MASTER_BRAND",
+    "Netsalesvalue", "SalesQtyInCases", "SalesQtyInPieces",
+]
+
+
+# =========================
+# Dimensions
+# =========================
+def make_brands(n_brands):
+    """Real brands first, then synthetic ``code|name`` brands up to ``n_brands``."""
+    brands = list(BRANDS[:n_brands])
+    for k in range(len(brands), n_brands):
+        brands.append(f"{960100 + k}|Brand {k:04d}")
+    return brands
+
+
+def make_items(rng, n_items, n_brands):
+    brands = make_brands(n_brands)
+    # Each brand sells in one or two categories
+    brand_categories = {
+        b: rng.choice(len(CATEGORIES), size=rng.integers(1, 3), replace=False) for b in brands
+    }
+    # Zipf-ish brand sizes so a few brands own most of the catalog
+    weights = 1.0 / np.arange(1, len(brands) + 1) ** 0.8
+    item_brand = rng.choice(len(brands), size=n_items, p=weights / weights.sum())
+    item_brand.sort()
+
+    rows = []
+    for k, b in enumerate(item_brand):
+        brand = brands[b]
+        category = CATEGORIES[rng.choice(brand_categories[brand])]
+        subcategory = rng.choice(SUBCATEGORIES[category])
+        brand_name = brand.split("|", 1)[1]
+        sub_name = subcategory.split("|", 1)[1]
+        size, form = rng.choice(SIZES), rng.choice(FORMS)
+        conversion = int(rng.choice([6, 12, 24, 36, 48]))
+        code = f"{1000000 + k}"
+        if rng.random() < 0.02:  # free-goods items the pages exclude with NOT LIKE '%XE%'
+            code += "XE"
+        rows.append((
+            code, f"{brand_name} {sub_name} {size} {form}", brand, category, subcategory,
+            f"{brand.split('|', 1)[0]}|{brand_name} Co.", form, size, "CS", conversion,
+            f"{brand_name} Supplier",
+        ))
+    return pd.DataFrame(rows, columns=ITEMS_COLUMNS)
+
+
+def make_customers(rng, n_customers):
+    gov_weights = 1.0 / np.arange(1, len(GOVERNORATES) + 1) ** 0.6
+    gov_idx = rng.choice(len(GOVERNORATES), size=n_customers, p=gov_weights / gov_weights.sum())
+    area_idx = rng.integers(1, 9, size=n_customers)
+    ids = np.arange(n_customers)
+    return pd.DataFrame({
+        "SITE_NUMBER": (500000 + ids).astype(str),
+        "CUSTOMER_B2B_ID": [f"B2B{k:07d}" for k in ids],
+        "CUSTOMER_NAME": [f"سوبر ماركت {k}" for k in ids],
+        "CONTACT_NAME": [f"Contact {k}" for k in ids],
+        "PHONE_NUMBER": [f"01{k % 3}{k:08d}" for k in ids],
+        "GOVERNER_NAME": [GOVERNORATES[g] for g in gov_idx],
+        "AREA_NAME": [f"{GOVERNORATES[g]} - منطقة {a}" for g, a in zip(gov_idx, area_idx)],
+    })
+
+
+# =========================
+# Sales facts
+# =========================
+def sales_chunks(rng, items, customers, n_lines, start, end, chunk_size):
+    """Yield MP_Sales chunks of ~``chunk_size`` lines with co-purchase structure.
+
+    Every order has an anchor brand; about half of its lines come from that
+    brand and the rest from a popularity-weighted pick over the whole catalog.
+    """
+    n_items, n_customers = len(items), len(customers)
+    item_pop = 1.0 / np.arange(1, n_items + 1) ** 0.9
+    rng.shuffle(item_pop)
+    item_pop /= item_pop.sum()
+    cust_pop = 1.0 / np.arange(1, n_customers + 1) ** 0.5
+    cust_pop /= cust_pop.sum()
+
+    brand_codes, brand_of_item = np.unique(items["MASTER_BRAND"].to_numpy(), return_inverse=True)
+    by_brand = np.argsort(brand_of_item, kind="stable")  # item positions grouped by brand
+    brand_count = np.bincount(brand_of_item, minlength=len(brand_codes))
+    brand_start = np.concatenate([[0], np.cumsum(brand_count)[:-1]])
+    price = rng.lognormal(mean=5.5, sigma=0.6, size=n_items).round(2)
+    conversion = items["CONVERSION_RATE"].to_numpy()
+    days = (end - start).days + 1
+
+    order_no, produced = 10_000_000, 0
+    while produced < n_lines:
+        total = min(chunk_size, n_lines - produced)
+        # 1-11 lines per order (mean 6); over-draw, then cut at exactly ``total`` lines
+        lines_per_order = rng.integers(1, 12, size=total // 3 + 2)
+        cumulative = np.cumsum(lines_per_order)
+        cut = int(np.searchsorted(cumulative, total))
+        lines_per_order = lines_per_order[:cut + 1]
+        lines_per_order[-1] -= cumulative[cut] - total
+        n_orders = len(lines_per_order)
+
+        order_ids = np.repeat(np.arange(order_no, order_no + n_orders), lines_per_order)
+        order_cust = rng.choice(n_customers, size=n_orders, p=cust_pop)
+        order_day = rng.integers(0, days, size=n_orders)
+        anchor_item = rng.choice(n_items, size=n_orders, p=item_pop)
+        anchor_brand = brand_of_item[anchor_item]
+
+        line_anchor = np.repeat(anchor_brand, lines_per_order)
+        from_anchor = rng.random(total) < 0.5
+        in_brand = by_brand[brand_start[line_anchor] + (rng.random(total) * brand_count[line_anchor]).astype(int)]
+        global_pick = rng.choice(n_items, size=total, p=item_pop)
+        item_idx = np.where(from_anchor, in_brand, global_pick)
+
+        cases = rng.integers(1, 15, size=total).astype(float)
+        sign = np.where(rng.random(total) < 0.03, -1.0, 1.0)  # ~3% return lines
+        dates = np.datetime64(start) + np.repeat(order_day, lines_per_order).astype("timedelta64[D]")
+        date_str = np.datetime_as_string(dates, unit="D")
+
+        yield pd.DataFrame({
+            "Order_Number": order_ids,
+            "Date": date_str,
+            "month": [d[:7] for d in date_str],
+            "CustomerID": customers["SITE_NUMBER"].to_numpy()[np.repeat(order_cust, lines_per_order)],
+            "ItemId": items["ITEM_CODE"].to_numpy()[item_idx],
+            "MASTER_BRAND": items["MASTER_BRAND"].to_numpy()[item_idx],
+            "Netsalesvalue": (sign * cases * price[item_idx]).round(2),
+            "SalesQtyInCases": sign * cases,
+            "SalesQtyInPieces": sign * cases * conversion[item_idx],
+        })
+        order_no += n_orders
+        produced += total
+
+
+# =========================
+# Writers
+# =========================
+def _create_tables(conn):
+    conn.executescript("""
+        DROP TABLE IF EXISTS MP_Items;
+        DROP TABLE IF EXISTS MP_Customers;
+        DROP TABLE IF EXISTS MP_Sales;
+        CREATE TABLE MP_Items (
+            ITEM_CODE TEXT, DESCRIPTION TEXT, MASTER_BRAND TEXT, MG2 TEXT, MG3 TEXT,
+            GCOMPANY TEXT, GFORM TEXT, GSIZE TEXT, MSU TEXT, CONVERSION_RATE INTEGER, Supplier TEXT
+        );
+        CREATE TABLE MP_Customers (
+            SITE_NUMBER TEXT, CUSTOMER_B2B_ID TEXT, CUSTOMER_NAME TEXT, CONTACT_NAME TEXT,
+            PHONE_NUMBER TEXT, GOVERNER_NAME TEXT, AREA_NAME TEXT
+        );
+        CREATE TABLE MP_Sales (
+            Order_Number INTEGER, Date TEXT, month TEXT, CustomerID TEXT, ItemId TEXT,
+            MASTER_BRAND TEXT, Netsalesvalue REAL, SalesQtyInCases REAL, SalesQtyInPieces REAL
+        );
+    """)
+
+
+def _insert(conn, table, df):
+    placeholders = ",".join("?" * len(df.columns))
+    conn.executemany(
+        f"INSERT INTO {table} ({','.join(df.columns)}) VALUES ({placeholders})",
+        df.itertuples(index=False, name=None),
+    )
+
+
+def _create_indexes(conn):
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS ix_items_code ON MP_Items (ITEM_CODE);
+        CREATE INDEX IF NOT EXISTS ix_items_brand ON MP_Items (MASTER_BRAND);
+        CREATE INDEX IF NOT EXISTS ix_customers_site ON MP_Customers (SITE_NUMBER);
+        CREATE INDEX IF NOT EXISTS ix_customers_b2b ON MP_Customers (CUSTOMER_B2B_ID);
+        CREATE INDEX IF NOT EXISTS ix_sales_date ON MP_Sales (Date);
+        CREATE INDEX IF NOT EXISTS ix_sales_customer ON MP_Sales (CustomerID, Date);
+        CREATE INDEX IF NOT EXISTS ix_sales_item ON MP_Sales (ItemId);
+        CREATE INDEX IF NOT EXISTS ix_sales_order ON MP_Sales (Order_Number);
+        ANALYZE;
+    """)
+
+
+def write_roster(path, rng, customers, n_salesmen):
+    """Salesman roster with the Google Sheet headers used by the dashboard pages."""
+    salesmen = [f"Salesman {k:03d}" for k in range(n_salesmen)]
+    owner = rng.integers(0, n_salesmen, size=len(customers))
+    roster = pd.DataFrame({
+        "SR Name": [salesmen[o] for o in owner],
+        "Sction SR": [salesmen[o] for o in owner],
+        "SanadID": customers["CUSTOMER_B2B_ID"],
+        "Phone_Number": customers["PHONE_NUMBER"],
+        "Customer_Name": customers["CUSTOMER_NAME"],
+        "Contact_NAME": customers["CONTACT_NAME"],
+        "Area": customers["GOVERNER_NAME"],
+        "City": customers["AREA_NAME"],
+        "Address1": [f"Street {k}" for k in range(len(customers))],
+    })
+    roster.to_csv(path, index=False, encoding="utf-8")
+    return salesmen
+
+
+def write_secrets(path, db_path, roster_path, models_dir, salesmen):
+    """Streamlit secrets pointing every page at the local stand-in."""
+    lines = [
+        "[database]",
+        f'local_path = "{os.path.abspath(db_path)}"',
+        'driver = "local"', 'server = "local"', 'database = "sanad"',
+        'username = "local"', 'password = "local"',
+        "",
+        "[roster]",
+        f'csv_path = "{os.path.abspath(roster_path)}"',
+        "",
+        "[models]",
+        f'local_dir = "{os.path.abspath(models_dir)}"',
+        "",
+        "[auth]",
+        'BI_PASSWORD = "bi"', 'BI_KEY = "auth_bi"',
+        'TRADE_PASSWORD = "trade"', 'TRADE_KEY = "auth_trade"',
+        "",
+        '[gcp_service_account]',
+        'type = "service_account"',
+        "",
+    ]
+    for k, salesman in enumerate(salesmen):
+        lines += [f"[SALES_CREDENTIALS.user{k:03d}]", 'password = "pass"', f'salesman = "{salesman}"', ""]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def write_models(models_dir, items, customers, purchases, max_customers):
+    """Model artifacts in the formats the recommender pages load."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    os.makedirs(models_dir, exist_ok=True)
+    item_codes = items["ITEM_CODE"].tolist()
+
+    # salesman_dashboard: content model
+    items_df = pd.DataFrame({
+        "ITEM_CODE": items["ITEM_CODE"],
+        "DESCRIPTION": items["DESCRIPTION"],
+        "brand": items["MASTER_BRAND"].str.split("|").str[1],
+        "category": items["MG2"].str.split("|").str[1],
+    })
+    tfidf = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), min_df=1)
+    matrix = tfidf.fit_transform(items_df["DESCRIPTION"] + " " + items_df["brand"] + " " + items_df["category"])
+    with open(os.path.join(models_dir, "content_model.pkl"), "wb") as f:
+        pickle.dump({
+            "tfidf": tfidf,
+            "cosine_sim": cosine_similarity(matrix).astype(np.float32),
+            "indices": pd.Series(range(len(items_df)), index=items_df["ITEM_CODE"]),
+            "items_df": items_df,
+        }, f)
+
+    # Collaborative artifacts from a customer sample of the purchase counts
+    counts = purchases.groupby(["CustomerID", "ItemId"]).size()
+    top_customers = counts.groupby(level=0).sum().nlargest(max_customers).index
+    site_to_b2b = customers.set_index("SITE_NUMBER")["CUSTOMER_B2B_ID"]
+    user_item = (
+        counts[counts.index.get_level_values(0).isin(top_customers)]
+        .unstack(fill_value=0)
+        .reindex(columns=item_codes, fill_value=0)
+    )
+    user_item.index = site_to_b2b.reindex(user_item.index).to_numpy()
+    item_sim = cosine_similarity(user_item.T.to_numpy()).astype(np.float32)
+    item_sim_df = pd.DataFrame(item_sim, index=item_codes, columns=item_codes)
+
+    # 2_Product_Recommendation
+    joblib.dump(item_sim_df, os.path.join(models_dir, "item_similarity.pkl"))
+    joblib.dump(dict(zip(items["ITEM_CODE"], items["DESCRIPTION"])), os.path.join(models_dir, "item_name_map.pkl"))
+
+    # user_recommendation
+    df_items = pd.DataFrame({
+        "ItemId": items["ITEM_CODE"], "itemname": items["DESCRIPTION"],
+        "Brand": items_df["brand"], "Category": items_df["category"],
+    })
+    df_customers = pd.DataFrame({"id": customers["CUSTOMER_B2B_ID"], "name": customers["CUSTOMER_NAME"]})
+    for name, obj in [
+        ("user_item.pkl", user_item), ("item_sim_df.pkl", item_sim_df),
+        ("df_items.pkl", df_items), ("df_customers.pkl", df_customers),
+    ]:
+        with open(os.path.join(models_dir, name), "wb") as f:
+            pickle.dump(obj, f)
+
+
+def generate(out_dir, sales_lines=1_000_000, n_items=2_000, n_customers=20_000, n_brands=120,
+             n_salesmen=40, months=6, end_date=None, seed=7, chunk_size=500_000,
+             model_customers=2_000, with_models=True, log=print):
+    """Build the whole synthetic environment under ``out_dir``; return its paths."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    db_path = os.path.join(out_dir, "sanad.db")
+    roster_path = os.path.join(out_dir, "roster.csv")
+    models_dir = os.path.join(out_dir, "models")
+    secrets_path = os.path.join(out_dir, "secrets.toml")
+
+    end = end_date or datetime.date.today()
+    start = (pd.Timestamp(end).replace(day=1) - pd.DateOffset(months=months - 1)).date()
+
+    started = time.perf_counter()
+    items = make_items(rng, n_items, n_brands)
+    customers = make_customers(rng, n_customers)
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    _create_tables(conn)
+    _insert(conn, "MP_Items", items)
+    _insert(conn, "MP_Customers", customers)
+
+    # Only a bounded sample of lines is kept in memory for the model artifacts
+    sample, sample_rows, written = [], 0, 0
+    for chunk in sales_chunks(rng, items, customers, sales_lines, start, end, chunk_size):
+        _insert(conn, "MP_Sales", chunk)
+        conn.commit()
+        written += len(chunk)
+        if sample_rows < 2_000_000:
+            sample.append(chunk[["CustomerID", "ItemId"]])
+            sample_rows += len(chunk)
+        log(f"MP_Sales: {written:,}/{sales_lines:,} lines ({time.perf_counter() - started:.0f}s)")
+    log("Creating indexes...")
+    _create_indexes(conn)
+    conn.close()
+
+    salesmen = write_roster(roster_path, rng, customers, n_salesmen)
+    write_secrets(secrets_path, db_path, roster_path, models_dir, salesmen)
+    if with_models:
+        log("Building model artifacts...")
+        write_models(models_dir, items, customers, pd.concat(sample, ignore_index=True), model_customers)
+
+    log(f"Done in {time.perf_counter() - started:.0f}s -> {out_dir}")
+    return {
+        "db_path": db_path, "roster_path": roster_path, "models_dir": models_dir,
+        "secrets_path": secrets_path, "start_date": start, "end_date": end,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--out", default="data/synthetic", help="output directory")
+    parser.add_argument("--sales-lines", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=2_000)
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--brands", type=int, default=120)
+    parser.add_argument("--salesmen", type=int, default=40)
+    parser.add_argument("--months", type=int, default=6, help="months of history ending today")
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    parser.add_argument("--model-customers", type=int, default=2_000,
+                        help="customers kept in the collaborative user-item matrix")
+    parser.add_argument("--no-models", action="store_true", help="skip model artifacts")
+    args = parser.parse_args()
+
+    generate(
+        args.out, sales_lines=args.sales_lines, n_items=args.items, n_customers=args.customers,
+        n_brands=args.brands, n_salesmen=args.salesmen, months=args.months, end_date=args.end_date,
+        seed=args.seed, chunk_size=args.chunk_size, model_customers=args.model_customers,
+        with_models=not args.no_models,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Chart suggestions for chatbot results, reduced before they reach the browser.
+
+``build(df)`` picks a chart from the result's columns:
+
+* a ``Date``/month/year column gives a line chart of the main measure over
+  time (one line per brand/governorate when the result also has one);
+  separate Year and Month (and Day) numbers are combined into one period,
+  Year with another number (Week, Quarter) draws one line per year, and time
+  parts that cannot share one axis get no chart rather than summed-up years;
+* otherwise a brand/governorate/category column gives a bar chart.
+
+The data is aggregated per x value first, then long series are downsampled
+with Largest-Triangle-Three-Buckets (LTTB), which keeps the peaks and dips a
+plain stride would drop, and categories past the top N are summed into
+"Other". A chart of a result with hundreds of thousands of rows ships at most
+``max_points`` points per line and ``top + 1`` bars.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 1000
+TOP_N = 15
+SERIES = 6  # lines per chart when split by a category
+OTHER = "Other"
+
+TIME_NAMES = re.compile(r"date|month|year|week|day|period|تاريخ|شهر|سنة", re.IGNORECASE)
+CATEGORY_NAMES = re.compile(
+    r"brand|gover|region|city|area|categ|mg\d|channel|salesman|customer|item|desc|name|ماركة|محافظة|فئة", re.IGNORECASE)
+ID_NAMES = re.compile(r"(^|_)(id|code|no|number)$|id$|number$", re.IGNORECASE)
+MEASURE_NAMES = re.compile(r"sales|value|amount|revenue|qty|quantity|total|count|مبيعات|قيمة|كمية", re.IGNORECASE)
+MEAN_NAMES = re.compile(r"avg|average|mean|price|rate|ratio|percent|pct|share|%", re.IGNORECASE)
+YEAR_NAMES = re.compile(r"year|سنة", re.IGNORECASE)
+MONTH_NAMES = re.compile(r"month|شهر", re.IGNORECASE)
+DAY_NAMES = re.compile(r"day|يوم", re.IGNORECASE)
+PERIOD = "Period"
+
+
+def lttb(x, y, n_out):
+    """Indices of the ``n_out`` points Largest-Triangle-Three-Buckets keeps; first and last always."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Each bucket is scored against the mean of the next one (the last point for the final bucket)
+    sizes = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x, edges[:-1])[1:] / sizes[1:], x[-1])
+    avg_y = np.append(np.add.reduceat(y, edges[:-1])[1:] / sizes[1:], y[-1])
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y[i] - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _usable(df):
+    """Columns with a unique, non-empty label (unaliased SQL expressions come back as duplicate "")."""
+    labels = pd.Series(df.columns)
+    return [c for c, dup in zip(df.columns, labels.duplicated(keep=False)) if not dup and str(c).strip()]
+
+
+def _time_axis(s, name):
+    """The column as chartable time values, or None."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    if not TIME_NAMES.search(str(name)):
+        return None
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s  # month or year numbers
+    if s.dtype == object or pd.api.types.is_string_dtype(s):
+        parsed = pd.to_datetime(s, errors="coerce", format="mixed")
+        if parsed.notna().mean() >= 0.9:
+            return parsed
+    return None
+
+
+def _period(df, parts):
+    """Year, month (and day) number columns as one datetime column."""
+    fields = {"year": df[parts[0]], "month": df[parts[1]], "day": df[parts[2]] if len(parts) > 2 else 1}
+    return pd.to_datetime(pd.DataFrame(fields, index=df.index), errors="coerce")
+
+
+def _pick_time(df, times):
+    """``(x, period, color)`` for the result's time columns, or None when they do not fit on one axis.
+
+    ``period`` lists the Year/Month(/Day) columns combined into ``PERIOD``; ``color`` is a year
+    column drawn as one line per year.
+    """
+    if len(times) <= 1:
+        return (times[0] if times else None), None, None
+    parts = [c for c in times if pd.api.types.is_numeric_dtype(df[c])]
+    if len(parts) < len(times):
+        # A full date already tells the periods apart; numbers next to it are parts of it
+        return next(c for c in times if c not in parts), None, None
+    year = next((c for c in parts if YEAR_NAMES.search(str(c))), None)
+    month = next((c for c in parts if c != year and MONTH_NAMES.search(str(c))), None)
+    if year is not None and month is not None:
+        day = next((c for c in parts if c not in (year, month) and DAY_NAMES.search(str(c))), None)
+        period = [year, month] + ([day] if day is not None else [])
+        if len(period) == len(parts) and _period(df, period).notna().mean() >= 0.9:
+            return PERIOD, period, None
+        return None
+    if year is not None and len(parts) == 2:
+        return next(c for c in parts if c != year), None, year
+    return None
+
+
+def suggest(df):
+    """``{"kind": "line"|"bar", "x", "y", "color", "period"}`` for ``df``, or None when no chart fits."""
+    if df is None or len(df) < 2:
+        return None
+    columns = _usable(df)
+    times = [c for c in columns if _time_axis(df[c], c) is not None]
+    picked = _pick_time(df, times)
+    if picked is None:
+        return None
+    time, period, by_year = picked
+    categories = [c for c in columns if c not in times and not pd.api.types.is_numeric_dtype(df[c])
+                  and not pd.api.types.is_datetime64_any_dtype(df[c]) and df[c].nunique() > 1]
+    category = next((c for c in categories if CATEGORY_NAMES.search(str(c))), categories[0] if categories else None)
+    measures = [c for c in columns if c not in times and pd.api.types.is_numeric_dtype(df[c])
+                and not pd.api.types.is_bool_dtype(df[c]) and not ID_NAMES.search(str(c))]
+    if not measures:
+        return None
+    measure = next((c for c in measures if MEASURE_NAMES.search(str(c))), measures[0])
+    if time is not None and (period is not None or df[time].nunique() > 1):
+        return {"kind": "line", "x": time, "y": measure, "color": by_year or category, "period": period}
+    if category is not None:
+        return {"kind": "bar", "x": category, "y": measure, "color": None, "period": None}
+    return None
+
+
+def _aggregate(df, keys, measure, sort=False):
+    grouped = df.groupby(keys, sort=sort, dropna=False)[measure]
+    return (grouped.mean() if MEAN_NAMES.search(str(measure)) else grouped.sum()).reset_index()
+
+
+def top_n(df, category, measure, n=TOP_N):
+    """``(frame, others)``: the ``n`` largest categories by ``measure`` and the rest summed into "Other"."""
+    totals = _aggregate(df[[category, measure]], [category], measure)
+    totals[category] = totals[category].astype(str)
+    totals = totals.sort_values(measure, ascending=False, kind="stable")
+    if len(totals) <= n + 1:
+        return totals, 0
+    rest = totals.iloc[n:]
+    other = pd.DataFrame({category: [OTHER], measure: [rest[measure].mean() if MEAN_NAMES.search(str(measure))
+                                                       else rest[measure].sum()]})
+    return pd.concat([totals.iloc[:n], other], ignore_index=True), len(rest)
+
+
+def build(df, max_points=MAX_POINTS, top=TOP_N, series=SERIES):
+    """Chart-ready ``{"kind", "data", "x", "y", "color", "note"}`` for ``df``, or None."""
+    spec = suggest(df)
+    if spec is None:
+        return None
+    x, y, color = spec["x"], spec["y"], spec["color"]
+    notes = []
+    if spec["kind"] == "bar":
+        data, others = top_n(df, x, y, top)
+        if others:
+            notes.append(f"top {top} {x} shown, {others:,} more grouped as {OTHER}")
+        return {**spec, "data": data, "note": "; ".join(notes)}
+
+    frame = pd.DataFrame({x: _period(df, spec["period"]) if spec["period"] else _time_axis(df[x], x), y: df[y]})
+    keys = [x]
+    if color is not None:
+        frame[color] = df[color].astype(str)
+        kept = _aggregate(frame[[color, y]], [color], y).nlargest(series, y)[color]
+        hidden = frame[color].nunique() - len(kept)
+        if hidden:
+            frame[color] = frame[color].where(frame[color].isin(kept), OTHER)
+            notes.append(f"top {series} {color} shown, {hidden:,} more grouped as {OTHER}")
+        keys.append(color)
+    frame = frame.dropna(subset=[x])
+    data = _aggregate(frame, keys, y, sort=True)
+
+    parts = []
+    # Sorted by x within each line, as LTTB needs
+    for _, part in (data.groupby(color, sort=False) if color is not None else [(None, data)]):
+        if len(part) > max_points:
+            xs = part[x].astype("int64") if pd.api.types.is_datetime64_any_dtype(part[x]) else part[x]
+            part = part.iloc[lttb(xs.to_numpy(dtype=float), part[y].to_numpy(dtype=float), max_points)]
+        parts.append(part)
+    sampled = pd.concat(parts, ignore_index=True)
+    if len(sampled) < len(data):
+        notes.append(f"{len(data):,} points downsampled to {len(sampled):,}")
+    return {**spec, "data": sampled, "note": "; ".join(notes)}
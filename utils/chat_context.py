@@ -0,0 +1,144 @@
+"""Token-budgeted conversation memory for the BI Chatbot prompt.
+
+The last few turns go into the prompt verbatim (question, SQL, answer);
+older turns are compressed to one line each (question, tables, filters,
+result shape) and the oldest summaries are dropped once the budget is
+spent. Previous-result summaries follow the same rule: the latest result
+keeps its sample rows, older ones keep only their shape.
+"""
+from utils.schema_index import estimate_tokens
+from utils.sql_text import tokenize
+
+CONTEXT_TOKENS = 1200
+RESULTS_TOKENS = 600
+RECENT_TURNS = 2
+
+
+def _shorten(text, limit):
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def _has_result(msg):
+    return bool(msg.get("result"))
+
+
+def group_turns(history):
+    """``[(user_msg, assistant_msg or None), ...]`` in conversation order."""
+    turns = []
+    for msg in history:
+        if msg.get("role") == "user":
+            turns.append([msg, None])
+        elif turns and turns[-1][1] is None:
+            turns[-1][1] = msg
+    return [tuple(t) for t in turns]
+
+
+def describe_sql(sql, limit=160):
+    """``"MP_Sales, MP_Items where <top-level filter>"`` for a compact turn summary."""
+    tokens = [t for t in tokenize(sql or "") if t.kind != "comment"]
+    tables, where, depth, in_where, expect_table = [], [], 0, False, False
+    for tok in tokens:
+        if tok.kind == "ws":
+            if in_where:
+                where.append(" ")
+            continue
+        if expect_table and tok.kind in ("ident", "quoted") and tok.text.strip("[]") not in tables:
+            tables.append(tok.text.strip("[]"))
+        expect_table = tok.is_keyword("FROM", "JOIN")
+        if tok.text == "(":
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+        if depth == 0 and tok.is_keyword("WHERE"):
+            in_where = True
+            continue
+        if depth == 0 and tok.is_keyword("GROUP", "ORDER", "HAVING", "UNION"):
+            in_where = False
+        if in_where:
+            where.append(tok.text)
+    text = ", ".join(tables) or "?"
+    if where:
+        text += " where " + _shorten("".join(where), limit)
+    return text
+
+
+def summarize_turn(user_msg, assistant_msg):
+    line = f"- USER asked: {_shorten(user_msg['content'], 150)}"
+    if assistant_msg is None:
+        return line
+    if assistant_msg.get("sql"):
+        line += f" | SQL on {describe_sql(assistant_msg['sql'])}"
+    if _has_result(assistant_msg):
+        result = assistant_msg["result"]
+        line += f" | {result['rows']} rows ({_shorten(', '.join(result['columns']), 120)})"
+    elif assistant_msg.get("content", "").startswith("❌"):
+        line += " | failed"
+    return line
+
+
+def verbatim_turn(user_msg, assistant_msg):
+    text = f"USER: {user_msg['content']}\n"
+    if assistant_msg is not None:
+        text += f"ASSISTANT: {assistant_msg['content']}\n"
+        if assistant_msg.get("sql"):
+            text += f"SQL_USED: {assistant_msg['sql']}\n"
+    return text
+
+
+def build_conversation_context(history, budget_tokens=CONTEXT_TOKENS, recent_turns=RECENT_TURNS):
+    """History text for the prompt: recent turns verbatim, older ones summarized, within the budget.
+
+    The last user message (the question being answered) is always kept.
+    """
+    turns = group_turns(history)
+    if not turns:
+        return ""
+    *past, current = turns
+    current_text = verbatim_turn(*current)
+    budget = max(budget_tokens - estimate_tokens(current_text), 0)
+
+    recent = [verbatim_turn(*t) for t in past[-recent_turns:]] if recent_turns else []
+    older = [summarize_turn(*t) for t in past[: len(past) - len(recent)]]
+
+    # Over budget: demote the oldest verbatim turns to summaries, then drop the oldest summaries
+    while recent and estimate_tokens("".join(recent) + "\n".join(older)) > budget:
+        older.append(summarize_turn(*past[len(past) - len(recent)]))
+        recent.pop(0)
+    while older and estimate_tokens("".join(recent) + "\n".join(older)) > budget:
+        older.pop(0)
+
+    text = ""
+    if older:
+        text += "Earlier in this conversation (summarized):\n" + "\n".join(older) + "\n\n"
+    return text + "".join(recent) + current_text
+
+
+def previous_results_summary(history, budget_tokens=RESULTS_TOKENS, sample_rows=2):
+    """Previous-results block for the prompt: latest result with sample rows, older ones by shape."""
+    results = [(user_msg, assistant_msg) for user_msg, assistant_msg in group_turns(history)
+               if assistant_msg is not None and _has_result(assistant_msg)]
+    if not results:
+        return ""
+
+    blocks = []
+    for number, (user_msg, msg) in enumerate(results, 1):
+        result = msg["result"]
+        block = (f"\nResult #{number}:\n"
+                 f"- User Question: {_shorten(user_msg['content'], 150)}\n"
+                 f"- Columns: {', '.join(result['columns'])}\n"
+                 f"- Row Count: {result['rows']}\n")
+        if number == len(results):
+            block += f"- Sample Data (first {sample_rows} rows):\n{result['preview'].head(sample_rows).to_string()}\n"
+            if msg.get("sql"):
+                block += f"- SQL Used: {msg['sql']}\n"
+        blocks.append(block)
+
+    # Keep the latest result; drop the oldest ones past the budget
+    while len(blocks) > 1 and estimate_tokens("".join(blocks)) > budget_tokens:
+        blocks.pop(0)
+
+    summary = "\n=== PREVIOUS QUERY RESULTS AVAILABLE FOR REFERENCE ===\n" + "".join(blocks)
+    summary += f"\n=== END PREVIOUS RESULTS (Total: {len(results)} datasets available) ===\n"
+    summary += "\nIMPORTANT: If the user asks to analyze, filter, or work with 'previous results', 'last results', or 'the data above', you should reference the most recent result dataset. You can perform operations like filtering, grouping, calculations on the previous results by understanding their structure from the summary above.\n"
+    return summary
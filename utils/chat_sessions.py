@@ -0,0 +1,148 @@
+"""Chat sessions persisted across refreshes and replicas.
+
+Messages (text, SQL, query ids and result handles) go to a local SQLite file;
+result DataFrames stay in Parquet, one directory per session under
+``results_root`` (the page's ``ResultStore`` writes them with ``persist=True``).
+The page keeps the session id in the URL (``?chat=...``), so a refresh, or a
+request served by another replica sharing the same files, reopens the chat.
+
+Only the last ``PAGE_MESSAGES`` messages are loaded when a chat is reopened;
+``load(..., before=seq)`` pages older ones in when the user asks for them.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import closing
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "sanad_chats.sqlite")
+DEFAULT_RESULTS = os.path.join(tempfile.gettempdir(), "sanad_chat_results")
+PAGE_MESSAGES = 10
+MAX_AGE_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    access_level TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT,
+    sql TEXT,
+    local_sql TEXT,
+    query_id TEXT,
+    prompt_tokens INTEGER,
+    result TEXT,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated);
+"""
+
+COLUMNS = ("seq", "role", "content", "sql", "local_sql", "query_id", "prompt_tokens", "result")
+
+
+class ChatSessionStore:
+    """SQLite log of chat messages per session; result handles are stored without their preview."""
+
+    def __init__(self, path=DEFAULT_PATH, results_root=DEFAULT_RESULTS):
+        self.path = path
+        self.results_root = results_root
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+            # Files written before in-memory follow-ups were recorded separately
+            if "local_sql" not in {row[1] for row in conn.execute("PRAGMA table_info(messages)")}:
+                conn.execute("ALTER TABLE messages ADD COLUMN local_sql TEXT")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def results_dir(self, session_id):
+        """Parquet directory for the session's results."""
+        return os.path.join(self.results_root, session_id)
+
+    def create(self, access_level):
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("INSERT INTO sessions (id, access_level, created, updated) VALUES (?, ?, ?, ?)",
+                         (session_id, access_level, now, now))
+        return session_id
+
+    def session(self, session_id):
+        """``{"id", "access_level", "messages", "queries"}``, or None for an unknown id."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT s.id, s.access_level, COUNT(m.seq), COUNT(m.query_id) FROM sessions s "
+                "LEFT JOIN messages m ON m.session_id = s.id WHERE s.id = ? GROUP BY s.id", (session_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "access_level", "messages", "queries"), row))
+
+    def append(self, session_id, message):
+        """Store one chat message; returns its sequence number, or None if it could not be saved.
+
+        Persistence never breaks the chat, so database errors are swallowed.
+        """
+        handle = message.get("result")
+        if handle:
+            handle = json.dumps({k: v for k, v in handle.items() if k != "preview"}, default=str)
+        now = time.time()
+        try:
+            with self._lock, closing(self._connect()) as conn, conn:
+                (seq,) = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE session_id = ?",
+                                      (session_id,)).fetchone()
+                conn.execute(
+                    "INSERT INTO messages (session_id, seq, ts, role, content, sql, local_sql, query_id, prompt_tokens, result) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (session_id, seq, now, message["role"], message.get("content"), message.get("sql"),
+                     message.get("local_sql"), message.get("query_id"), message.get("prompt_tokens"), handle),
+                )
+                conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (now, session_id))
+            return seq
+        except sqlite3.Error:
+            return None
+
+    def load(self, session_id, before=None, limit=PAGE_MESSAGES):
+        """Up to ``limit`` messages preceding sequence number ``before`` (default: the latest), oldest first.
+
+        Each message carries its ``seq``; result handles come back without a preview.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM messages WHERE session_id = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, before if before is not None else 2**62, limit),
+            ).fetchall()
+        messages = []
+        for row in reversed(rows):
+            message = dict(zip(COLUMNS, row))
+            message["result"] = json.loads(message["result"]) if message["result"] else None
+            messages.append(message)
+        return messages
+
+    def delete(self, session_id):
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        shutil.rmtree(self.results_dir(session_id), ignore_errors=True)
+
+    def prune(self, max_age_days=MAX_AGE_DAYS):
+        """Delete sessions (and their results) idle for longer than ``max_age_days``."""
+        cutoff = time.time() - max_age_days * 86400
+        with closing(self._connect()) as conn:
+            stale = [r[0] for r in conn.execute("SELECT id FROM sessions WHERE updated < ?", (cutoff,))]
+        for session_id in stale:
+            self.delete(session_id)
+        return len(stale)
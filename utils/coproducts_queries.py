@@ -0,0 +1,107 @@
+"""SQL builders for the Co-Products By item Level page."""
+
+
+def build_filters(selected_governerment="", selected_areas=(), selected_codes=(), selected_category=""):
+    """Optional WHERE fragments shared by the co-products queries."""
+    gov_condition = f" AND c.GOVERNER_NAME = N'{selected_governerment}'" if selected_governerment else ""
+
+    # Area filter
+    area_item_filter = ""
+    if selected_areas:
+        selected_areas_clean = [a for a in selected_areas if a]
+        if selected_areas_clean:
+            areas_str = ",".join([f"N'{a}'" for a in selected_areas_clean])
+            area_item_filter = f" AND c.AREA_NAME IN ({areas_str})"
+
+    # Brand filter
+    brand_item_filter = ""
+    if selected_codes:
+        codes_str = ",".join([f"'{c}'" for c in selected_codes if c])
+        if codes_str:
+            brand_item_filter = f" AND i.ITEM_CODE IN ({codes_str})"
+
+    # Category filter
+    category_item_filter = f" AND Right(i.MG2, LEN(i.MG2) - CHARINDEX('|', i.MG2)) = N'{selected_category}'" if selected_category else ""
+
+    return {
+        "gov_condition": gov_condition,
+        "area_item_filter": area_item_filter,
+        "brand_item_filter": brand_item_filter,
+        "category_item_filter": category_item_filter,
+    }
+
+
+def max_order_query(selected_brand, start_date, end_date, filters):
+    return f"""
+            SELECT TOP 1
+                s.Order_Number,
+                SUM(s.NetSalesValue) AS OrderValue
+            FROM MP_Sales s
+            LEFT JOIN MP_Items i ON s.ItemId = i.ITEM_CODE
+            LEFT JOIN MP_Customers c ON s.CustomerId = c.SITE_NUMBER
+            WHERE RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) = '{selected_brand}'
+            AND s.Date BETWEEN '{start_date}' AND '{end_date}'
+            {filters['gov_condition']} {filters['area_item_filter']} {filters['brand_item_filter']}
+            GROUP BY s.Order_Number
+            ORDER BY OrderValue DESC
+        """
+
+
+def brand_orders_query(selected_brand, start_date, end_date, order_min, order_max, filters):
+    return f"""
+        SELECT DISTINCT s.Order_Number
+        FROM MP_Sales s
+        LEFT JOIN MP_Items i ON s.ItemId = i.ITEM_CODE
+        LEFT JOIN MP_Customers c ON s.CustomerId = c.SITE_NUMBER
+        WHERE RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) = '{selected_brand}'
+          AND s.Date BETWEEN '{start_date}' AND '{end_date}'
+          {filters['gov_condition']} {filters['brand_item_filter']} {filters['area_item_filter']}
+        GROUP BY s.Order_Number
+        HAVING SUM(s.NetSalesValue) BETWEEN {order_min} AND {order_max}
+    """
+
+
+def main_query(brand_orders_sql, selected_brand, start_date, end_date, top_rows, filters):
+    return f"""
+        WITH BrandOrders AS (
+            {brand_orders_sql}
+        )
+        SELECT TOP {int(top_rows)}
+        i.ITEM_CODE,
+            i.DESCRIPTION AS Item_Description,
+            RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) AS Brand,
+            RIGHT(i.MG2, LEN(i.MG2) - CHARINDEX('|', i.MG2)) AS category,
+            RIGHT(i.MG3, LEN(i.MG3) - CHARINDEX('|', i.MG3)) AS subcategory,
+            COUNT(DISTINCT s.Order_Number) AS Distinct_Orders,
+            ROUND(SUM(s.NetSalesValue),0) AS Total_Sales,
+            SUM(s.SalesQtyInCases) AS Total_Cases
+        FROM MP_Sales s
+        LEFT JOIN MP_Items i ON s.ItemId = i.ITEM_CODE
+        LEFT JOIN MP_Customers c ON s.CustomerId = c.SITE_NUMBER
+        INNER JOIN BrandOrders bo ON s.Order_Number = bo.Order_Number
+        WHERE RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) <> '{selected_brand}'
+          AND s.Date BETWEEN '{start_date}' AND '{end_date}'  AND i.ITEM_CODE NOT LIKE '%XE%'
+          {filters['gov_condition']} {filters['category_item_filter']} {filters['area_item_filter']}
+        GROUP BY
+        i.ITEM_CODE,
+            i.DESCRIPTION,
+            RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)),
+            RIGHT(i.MG2, LEN(i.MG2) - CHARINDEX('|', i.MG2)) ,
+            RIGHT(i.MG3, LEN(i.MG3) - CHARINDEX('|', i.MG3))
+        ORDER BY Distinct_Orders DESC
+    """
+
+
+def order_detail_query(order_num):
+    return f"""
+                SELECT
+                    s.Order_Number,
+                    FORMAT(s.Date, 'yyyy-MM-dd') AS Date,
+                    i.DESCRIPTION AS Item_Description,
+                    RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) AS Brand,
+                    s.SalesQtyInCases AS Cases,
+                    s.NetSalesValue AS NetSalesValue
+                FROM MP_Sales s
+                LEFT JOIN MP_Items i ON s.ItemId = i.ITEM_CODE
+                WHERE s.Order_Number = '{order_num}'
+            """
@@ -0,0 +1,130 @@
+"""Warehouse connections built from ``st.secrets["database"]``.
+
+When the database secrets carry a ``local_path`` the pages run against the
+SQLite stand-in from tools/synthetic_data.py instead of SQL Server.
+"""
+import queue
+import sqlite3
+import sys
+import threading
+import urllib
+from contextlib import contextmanager
+
+import pandas as pd
+
+from utils import local_db
+from utils.query_stream import QueryTimeout
+from utils.singleflight import Interrupted, SingleFlight
+from utils.sql_text import fingerprint
+
+_in_flight = SingleFlight()
+
+POOL_SIZE = 4
+
+
+def odbc_connection_string(db_config):
+    return (
+        f"DRIVER={{{db_config['driver']}}};"
+        f"SERVER={db_config['server']};"
+        f"DATABASE={db_config['database']};"
+        f"UID={db_config['username']};"
+        f"PWD={db_config['password']}"
+    )
+
+
+def create_engine(db_config, **kwargs):
+    """SQLAlchemy engine for the warehouse (or the local stand-in)."""
+    if db_config.get("local_path"):
+        return local_db.create_engine(db_config["local_path"], **kwargs)
+    from sqlalchemy import create_engine as sa_create_engine
+
+    params = urllib.parse.quote_plus(odbc_connection_string(db_config))
+    return sa_create_engine(f"mssql+pyodbc:///?odbc_connect={params}", **kwargs)
+
+
+def driver_errors():
+    """DB-API error classes of the drivers loaded so far, for ``except`` clauses.
+
+    pyodbc is only imported when a SQL Server connection is opened, so pages can
+    catch driver errors without importing it themselves.
+    """
+    errors = [sqlite3.Error]
+    pyodbc = sys.modules.get("pyodbc")
+    if pyodbc is not None:
+        errors.append(pyodbc.Error)
+    return tuple(errors)
+
+
+def _database_key(conn):
+    """Same database, same key: SQLAlchemy connections and engines by URL, DB-API ones by identity."""
+    engine = getattr(conn, "engine", conn)
+    url = getattr(engine, "url", None)
+    return str(url) if url is not None else f"{type(conn).__name__}:{id(conn)}"
+
+
+def read_sql(sql, conn, params=None, **kwargs):
+    """``pd.read_sql`` with identical concurrent queries coalesced into one execution.
+
+    Callers that arrive while the same SQL (by fingerprint, with the same
+    params) is already running against the same database wait for it and
+    get a shallow copy of its result instead of running it again.
+    ``st.cache_data`` already makes concurrent calls of one cached function
+    with the same arguments wait for each other; this also covers the same
+    SQL sent from different functions or pages, and uncached calls.
+
+    Pass the SQLAlchemy engine rather than a connection from it: only the
+    caller that runs the query checks a connection out of the engine's pool,
+    so the callers waiting for it hold none.
+    """
+    key = (fingerprint(str(sql)), repr(params), repr(sorted(kwargs.items())), _database_key(conn))
+    df, shared = _in_flight.do(key, lambda: pd.read_sql(sql, conn, params=params, **kwargs))
+    return df.copy(deep=False) if shared else df
+
+
+def connect(db_config):
+    """DB-API connection for the warehouse (or the local stand-in)."""
+    if db_config.get("local_path"):
+        return local_db.connect(db_config["local_path"])
+    import pyodbc
+
+    return pyodbc.connect(odbc_connection_string(db_config))
+
+
+class ConnectionPool:
+    """Up to ``size`` DB-API connections, opened on first need and lent to one caller at a time.
+
+    For work that runs several queries at once (planned chatbot sub-queries);
+    a connection that raised a driver error is closed instead of reused, and
+    so is one whose query was cancelled or timed out (``Interrupted``,
+    ``QueryTimeout``): the statement may not have let go of it yet.
+    """
+
+    def __init__(self, db_config, size=POOL_SIZE):
+        self.db_config = db_config
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No pooled connection free within {timeout:g} seconds.")
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect(self.db_config)
+            yield conn
+        except (*driver_errors(), Interrupted, QueryTimeout):
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
@@ -0,0 +1,139 @@
+"""On-demand CSV/Excel exports of chatbot results.
+
+The page hands ``st.download_button`` callables, so nothing is built until a
+download is clicked. CSV is written chunk by chunk. Workbooks use xlsxwriter's
+``constant_memory`` mode, which flushes each row to a temp file as it is
+written; pandas' ``to_excel`` writes column by column and cannot use it. The
+session workbook reads one result at a time (spilled ones from Parquet), so
+only a single result is in memory while it is written. ``query_csv_bytes``
+streams a query from the cursor to a temp file chunk by chunk, so the full
+result of a paged SQL Query is never held as a DataFrame; it is capped in rows
+and time because ``st.download_button`` serves the finished file from memory.
+"""
+import codecs
+import io
+import os
+import re
+import tempfile
+
+CHUNK_ROWS = 50_000
+QUERY_EXPORT_ROWS = 1_000_000
+QUERY_EXPORT_SECONDS = 300
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+WORKBOOK_OPTIONS = {
+    "constant_memory": True,
+    "default_date_format": "yyyy-mm-dd",
+    "nan_inf_to_errors": True,
+    # Cell text is data, not formulas or links
+    "strings_to_formulas": False,
+    "strings_to_urls": False,
+}
+
+
+def iter_chunks(df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def csv_file(df, chunk_rows=CHUNK_ROWS):
+    """UTF-8 (with BOM, for Excel) CSV of ``df`` as a rewound file object."""
+    out = io.BytesIO()
+    out.write(codecs.BOM_UTF8)
+    if df.empty:
+        out.write(df.to_csv(index=False).encode("utf-8"))
+    for n, chunk in enumerate(iter_chunks(df, chunk_rows)):
+        out.write(chunk.to_csv(index=False, header=n == 0).encode("utf-8"))
+    out.seek(0)
+    return out
+
+
+def query_csv_bytes(conn, sql, max_rows=QUERY_EXPORT_ROWS, timeout=QUERY_EXPORT_SECONDS, chunk_rows=CHUNK_ROWS):
+    """UTF-8 (with BOM) CSV bytes of the first ``max_rows`` rows ``sql`` returns.
+
+    Rows go from the cursor to a temp file one chunk at a time. Past ``timeout``
+    seconds the statement is cancelled and QueryTimeout raised.
+    """
+    import pandas as pd
+
+    from utils.query_stream import QueryStream
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(codecs.BOM_UTF8)
+            stream = QueryStream(conn, sql, row_cap=max_rows, chunk_rows=chunk_rows, timeout=timeout)
+            header = True
+            for chunk in stream.chunks():
+                out.write(chunk.to_csv(index=False, header=header).encode("utf-8"))
+                header = False
+            if header:
+                out.write(pd.DataFrame(columns=stream.columns or []).to_csv(index=False).encode("utf-8"))
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def sheet_name(name, used):
+    """Excel-safe (31 chars, no []:*?/\\), unique sheet name."""
+    base = re.sub(r"[\[\]:*?/\\]", " ", str(name)).strip().strip("'")[:31] or "Sheet"
+    candidate, n = base, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate, n = base[:31 - len(suffix)] + suffix, n + 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_sheet(workbook, name, df, chunk_rows=CHUNK_ROWS):
+    """Header plus rows in order, as constant_memory requires."""
+    worksheet = workbook.add_worksheet(name)
+    worksheet.write_row(0, 0, [str(c) for c in df.columns])
+    row = 1
+    for chunk in iter_chunks(df, chunk_rows):
+        # object dtype turns numpy scalars into Python values xlsxwriter understands
+        values = chunk.astype(object).where(chunk.notna(), None).values.tolist()
+        for record in values:
+            worksheet.write_row(row, 0, record)
+            row += 1
+    return worksheet
+
+
+def xlsx_bytes(sheets, chunk_rows=CHUNK_ROWS):
+    """Workbook bytes for ``sheets``: an iterable of ``(name, DataFrame)``, consumed lazily."""
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {**WORKBOOK_OPTIONS, "tmpdir": tempfile.gettempdir()})
+        used = set()
+        for name, df in sheets:
+            write_sheet(workbook, sheet_name(name, used), df, chunk_rows)
+        if not used:
+            workbook.add_worksheet("Results")
+        workbook.close()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def session_sheets(store, datasets):
+    """``(name, DataFrame)`` per saved result, read from the store one at a time.
+
+    ``datasets`` is ``[(label, question, handle), ...]``; an index sheet comes first.
+    """
+    import pandas as pd
+
+    yield "Datasets", pd.DataFrame(
+        [(label, question, h["rows"], len(h["columns"]), h.get("truncated", False)) for label, question, h in datasets],
+        columns=["Sheet", "Question", "Rows", "Columns", "Truncated"],
+    )
+    for label, _, handle in datasets:
+        try:
+            df = store.get(handle["id"], keep=False)
+        except KeyError:
+            continue
+        yield label, df
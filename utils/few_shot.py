@@ -0,0 +1,169 @@
+"""Few-shot examples for the BI Chatbot prompt: past question/SQL pairs that worked.
+
+Questions are indexed by character n-grams (TF-IDF weighted, cosine
+similarity) of their normalized form, so different wordings, typos and
+Arabic/English mixes still match without any model or network call. Each
+insertion updates an inverted index and appends one JSON line to the index
+file; the file is replayed on start-up, so the index survives restarts.
+Each access level has an index (and file, ``level_path``) of its own, so
+examples written for one permission tier never reach another tier's prompts.
+"""
+import heapq
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from utils.question_cache import normalize_question
+from utils.schema_index import estimate_tokens
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "sanad_few_shot.jsonl")
+NGRAM_SIZES = (2, 3, 4)
+MIN_SCORE = 0.3
+TOP_K = 3
+PROMPT_TOKENS = 600
+# Rebuild document norms once the corpus has grown this much (IDF drift)
+NORM_REFRESH = 0.2
+# N-grams found in more than this share of a large index carry almost no
+# weight but touch every posting list, so search skips them
+COMMON_SHARE = 0.3
+
+
+def level_path(path, access_level):
+    """Index file for ``access_level`` next to ``path`` (``sanad_few_shot.bi.jsonl``)."""
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{access_level}{ext}"
+
+
+def char_ngrams(text):
+    """Counts of 2-4 character n-grams of each word (padded with spaces)."""
+    grams = Counter()
+    for word in normalize_question(text).split():
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            for i in range(max(len(padded) - n + 1, 1)):
+                grams[padded[i:i + n]] += 1
+    return grams
+
+
+class FewShotIndex:
+    """Incremental char n-gram TF-IDF index of question -> SQL examples."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._docs = {}  # normalized question -> {"question", "sql", "grams", "ts"}
+        self._postings = defaultdict(dict)  # n-gram -> {normalized question: tf}
+        self._norms = {}
+        self._norms_at = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---- persistence ----
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        lines = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                lines += 1
+                self._add(record["question"], record["sql"], record.get("ts", 0))
+        if lines > 2 * len(self._docs) + 100:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the file with one line per question (latest SQL wins)."""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for doc in self._docs.values():
+                f.write(json.dumps({"question": doc["question"], "sql": doc["sql"], "ts": doc["ts"]}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+    # ---- index ----
+    def _add(self, question, sql, ts):
+        key = normalize_question(question)
+        if not key:
+            return
+        old = self._docs.pop(key, None)
+        if old is not None:
+            for gram in old["grams"]:
+                self._postings[gram].pop(key, None)
+        grams = char_ngrams(question)
+        for gram, tf in grams.items():
+            self._postings[gram][key] = tf
+        self._docs[key] = {"question": question, "sql": sql, "grams": grams, "ts": ts}
+        self._norms.pop(key, None)
+
+    def add(self, question, sql):
+        """Index a question whose SQL ran and returned rows; appended to the file immediately.
+
+        Pass the SQL as the model wrote it, before ``sql_rewrite.prepare``: the
+        row cap and expanded brand lists are not patterns to teach back.
+        """
+        ts = time.time()
+        with self._lock:
+            self._add(question, sql, ts)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"question": question, "sql": sql, "ts": ts}, ensure_ascii=False) + "\n")
+
+    def _idf(self, gram):
+        return math.log((1 + len(self._docs)) / (1 + len(self._postings.get(gram, ())))) + 1
+
+    def _norm(self, key):
+        if len(self._docs) > self._norms_at * (1 + NORM_REFRESH):
+            self._norms.clear()
+            self._norms_at = len(self._docs)
+        norm = self._norms.get(key)
+        if norm is None:
+            grams = self._docs[key]["grams"]
+            norm = self._norms[key] = math.sqrt(sum((tf * self._idf(g)) ** 2 for g, tf in grams.items())) or 1.0
+        return norm
+
+    def search(self, question, k=TOP_K, min_score=MIN_SCORE):
+        """``[(score, question, sql), ...]``, best first."""
+        query = char_ngrams(question)
+        with self._lock:
+            if not query or not self._docs:
+                return []
+            weights = {g: tf * self._idf(g) for g, tf in query.items()}
+            query_norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            common = COMMON_SHARE * len(self._docs) if len(self._docs) >= 100 else len(self._docs)
+            scores = defaultdict(float)
+            for gram, weight in weights.items():
+                postings = self._postings.get(gram, {})
+                if len(postings) > common:
+                    continue
+                idf = self._idf(gram)
+                for key, tf in postings.items():
+                    scores[key] += weight * tf * idf
+            ranked = heapq.nlargest(
+                k, ((score / (query_norm * self._norm(key)), key) for key, score in scores.items())
+            )
+            return [(round(score, 3), self._docs[key]["question"], self._docs[key]["sql"])
+                    for score, key in ranked if score >= min_score]
+
+    def __len__(self):
+        return len(self._docs)
+
+
+def prompt_block(examples, budget_tokens=PROMPT_TOKENS):
+    """Examples section for the prompt, best first, within the token budget."""
+    lines = []
+    for _, question, sql in examples:
+        example = f"Q: {question}\nSQL:\n{sql.strip()}\n"
+        if estimate_tokens("".join(lines) + example) > budget_tokens:
+            continue
+        lines.append(example)
+    if not lines:
+        return ""
+    return ("Examples of similar questions answered correctly before "
+            "(follow their patterns; adapt names, dates and filters to the current question):\n" + "\n".join(lines))
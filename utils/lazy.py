@@ -0,0 +1,38 @@
+"""Deferred imports for heavy optional dependencies.
+
+``genai = lazy_import("google.generativeai")`` binds a name at the top of a
+page without importing anything; the real module is imported on the first
+attribute access, so a page only pays for the dependency on the rerun that
+actually uses it.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+_modules = {}
+
+
+def lazy_import(name):
+    """Module proxy for ``name``; shared per process so every page reuses one import."""
+    return _modules.setdefault(name, LazyModule(name))
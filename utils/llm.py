@@ -0,0 +1,133 @@
+"""Text-to-SQL model backends for the BI Chatbot.
+
+``create_model()`` returns Gemini by default. ``SANAD_LLM_BACKEND=stub`` swaps
+in a local stand-in that answers from a question -> SQL JSON file
+(``SANAD_LLM_STUB_FILE``), so the page, the load harness and benchmarks run
+without an API key or network. ``SANAD_LLM_STUB_LATENCY`` (seconds) adds a
+fixed delay to mimic the real round trip.
+
+Backends also offer ``stream_content(prompt)``, which yields text chunks as
+they arrive, so callers can stop once the SQL block is complete. Both take a
+``timeout`` (seconds) that bounds the provider request itself.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from utils.lazy import lazy_import
+from utils.question_cache import normalize_question
+
+genai = lazy_import("google.generativeai")
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, model_name=DEFAULT_MODEL, api_key=None):
+        genai.configure(api_key=api_key or os.getenv("GOOGLE_API_KEY"))
+        self._model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _options(timeout):
+        # A request deadline on the SDK call, so a hung request ends instead of holding a gateway slot
+        return {"request_options": {"timeout": timeout}} if timeout else {}
+
+    def generate_content(self, prompt, timeout=None):
+        return self._model.generate_content(prompt, **self._options(timeout))
+
+    def stream_content(self, prompt, timeout=None):
+        for chunk in self._model.generate_content(prompt, stream=True, **self._options(timeout)):
+            try:
+                text = chunk.text
+            except ValueError:  # chunk without text parts (e.g. finish/safety metadata)
+                continue
+            if text:
+                yield text
+
+
+class TextResponse:
+    """Minimal response object (``.text``) for text assembled outside the SDK."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def extract_question(prompt):
+    """The user question a chatbot prompt ends with."""
+    match = re.findall(r'The user is asking: "(.*?)"\s*$', prompt, flags=re.MULTILINE)
+    if match:
+        return match[-1]
+    users = re.findall(r"^USER: (.*)$", prompt, flags=re.MULTILINE)
+    return users[-1] if users else ""
+
+
+class StubBackend:
+    """Deterministic local model: canned SQL per normalized question."""
+
+    name = "stub"
+    DEFAULT_SQL = (
+        "SELECT TOP 10 c.GOVERNER_NAME, ROUND(SUM(s.NetSalesValue), 0) AS Sales\n"
+        "FROM MP_Sales s JOIN MP_Customers c ON s.CustomerId = c.SITE_NUMBER\n"
+        "GROUP BY c.GOVERNER_NAME ORDER BY Sales DESC"
+    )
+    # Follow-up prompts over the previous result (utils.local_followup)
+    DEFAULT_LOCAL_SQL = "SELECT * FROM previous_result LIMIT 5"
+
+    def __init__(self, answers=None, latency=0.0):
+        self.answers = {normalize_question(q): sql for q, sql in (answers or {}).items()}
+        self.latency = latency
+        self.calls = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        answers = {}
+        path = os.getenv("SANAD_LLM_STUB_FILE")
+        if path:
+            with open(path, encoding="utf-8") as f:
+                answers = json.load(f)
+        return cls(answers, latency=float(os.getenv("SANAD_LLM_STUB_LATENCY", "0")))
+
+    def _answer(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.prompts.append(prompt)
+        default = self.DEFAULT_LOCAL_SQL if "table previous_result" in prompt else self.DEFAULT_SQL
+        sql = self.answers.get(normalize_question(extract_question(prompt)), default)
+        return f"```sql\n{sql}\n```"
+
+    def _wait(self, seconds, timeout):
+        if timeout and seconds > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Request timed out after {timeout:g} seconds.")
+        if seconds:
+            time.sleep(seconds)
+
+    def generate_content(self, prompt, timeout=None):
+        text = self._answer(prompt)
+        self._wait(self.latency, timeout)
+        return TextResponse(text)
+
+    def stream_content(self, prompt, chunks=4, timeout=None):
+        """The same answer in ``chunks`` pieces, with the latency spread between them."""
+        text = self._answer(prompt)
+        size = -(-len(text) // chunks)
+        deadline = time.monotonic() + timeout if timeout else None
+        for start in range(0, len(text), size):
+            self._wait(self.latency / chunks, deadline and max(deadline - time.monotonic(), 0.001))
+            yield text[start:start + size]
+
+
+def create_model(backend=None, **kwargs):
+    """Model for ``backend`` (default: ``SANAD_LLM_BACKEND`` or gemini)."""
+    backend = backend or os.getenv("SANAD_LLM_BACKEND", "gemini")
+    if backend == "stub":
+        return StubBackend.from_env() if not kwargs else StubBackend(**kwargs)
+    if backend == "gemini":
+        return GeminiBackend(**kwargs)
+    raise ValueError(f"Unknown LLM backend: {backend}")
@@ -0,0 +1,196 @@
+"""Process-wide gateway in front of the text-to-SQL model.
+
+Every chatbot session calls the model through one ``LLMGateway``:
+
+* identical prompts in flight at the same time share one request (single-flight);
+* at most ``max_concurrency`` requests reach the provider at once, the rest
+  queue, and past ``max_queue`` new calls fail fast instead of piling up;
+* each call waits at most ``timeout`` seconds, and the provider request gets
+  what is left of that as its own timeout, so a hung request gives its slot back.
+
+Backends that can stream (``stream_content``) are read chunk by chunk and
+the read stops as soon as the fenced SQL block closes. With ``hedge_after``
+set, a call still unanswered after that many seconds fires a second, identical
+request; whichever finishes first wins and the other is abandoned.
+``generate_async`` returns a Future so the page can prepare the next stages
+while the model writes.
+
+The backend is anything with ``generate_content(prompt, timeout=None)``, so
+``llm.create_model("stub")`` drives it in tests and benchmarks.
+"""
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import llm
+from utils.chatbot import complete_sql_block
+from utils.singleflight import SingleFlight
+
+MAX_CONCURRENCY = 4
+MAX_QUEUE = 32
+TIMEOUT_SECONDS = 60
+HEDGE_AFTER_SECONDS = 0  # 0 = no hedged requests
+MIN_REQUEST_SECONDS = 1
+
+
+class LLMBusy(RuntimeError):
+    pass
+
+
+class LLMTimeout(TimeoutError):
+    pass
+
+
+class LLMGateway:
+    def __init__(self, backend, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE, timeout=TIMEOUT_SECONDS,
+                 hedge_after=HEDGE_AFTER_SECONDS):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        # Callers waiting on generate_async; kept apart so waiting never takes a provider slot
+        self._callers = ThreadPoolExecutor(max_workers=max_queue + max_concurrency, thread_name_prefix="llm-caller")
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._latencies = deque(maxlen=200)
+        self.calls = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.early_stops = 0
+
+    def _generate(self, prompt, abandoned, timeout):
+        stream = getattr(self.backend, "stream_content", None)
+        if stream is None:
+            return self.backend.generate_content(prompt, timeout=timeout)
+        text = ""
+        for chunk in stream(prompt, timeout=timeout):
+            text += chunk
+            if abandoned.is_set():
+                return None
+            if complete_sql_block(text) is not None:
+                with self._lock:
+                    self.early_stops += 1
+                break
+        return llm.TextResponse(text)
+
+    def _run(self, prompt, abandoned, deadline):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        started = time.perf_counter()
+        try:
+            # Time spent queued counts against the caller's timeout
+            return self._generate(prompt, abandoned, max(deadline - time.monotonic(), MIN_REQUEST_SECONDS))
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._latencies.append((time.perf_counter() - started) * 1000)
+
+    def _submit(self, prompt, abandoned, deadline, required=True):
+        with self._lock:
+            if self._queued >= self.max_queue:
+                if required:
+                    self.rejected += 1
+                    raise LLMBusy("The model is busy right now; please try again in a moment.")
+                return None
+            self._queued += 1
+        return self._pool.submit(self._run, prompt, abandoned, deadline)
+
+    def _abandon(self, futures, abandoned):
+        abandoned.set()
+        for future in futures:
+            if future.cancel():  # still queued: give its slot back
+                with self._lock:
+                    self._queued -= 1
+
+    def _submit_and_wait(self, prompt, timeout):
+        abandoned = threading.Event()
+        deadline = time.monotonic() + timeout
+        primary = self._submit(prompt, abandoned, deadline)
+        pending, error = {primary}, None
+        hedge_at = time.monotonic() + self.hedge_after if self.hedge_after and self.hedge_after < timeout else None
+        while pending:
+            wait_until = min(deadline, hedge_at) if hedge_at else deadline
+            done, pending = wait(pending, timeout=max(wait_until - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._abandon(pending, abandoned)
+                    if future is not primary:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+            if hedge_at and time.monotonic() >= hedge_at and pending:
+                hedge_at = None
+                hedge = self._submit(prompt, abandoned, deadline, required=False)
+                if hedge is not None:
+                    pending.add(hedge)
+                    with self._lock:
+                        self.hedged += 1
+                continue
+            if pending and time.monotonic() >= deadline:
+                self._abandon(pending, abandoned)
+                with self._lock:
+                    self.timeouts += 1
+                raise LLMTimeout(f"The model did not answer within {timeout:g} seconds.")
+        with self._lock:
+            self.errors += 1
+        raise error
+
+    def generate_content(self, prompt, timeout=None):
+        """Backend response for ``prompt``; drop-in for ``model.generate_content``."""
+        timeout = timeout or self.timeout
+        with self._lock:
+            self.calls += 1
+        key = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        response, _ = self._flight.do(key, lambda: self._submit_and_wait(prompt, timeout), timeout=timeout)
+        return response
+
+    def generate_async(self, prompt, timeout=None):
+        """Future of ``generate_content(prompt)``."""
+        return self._callers.submit(self.generate_content, prompt, timeout)
+
+    def stats(self):
+        in_flight, waiting = self._flight.in_flight()
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "backend": getattr(self.backend, "name", type(self.backend).__name__),
+                "running": self._running,
+                "queued": self._queued,
+                "max_concurrency": self.max_concurrency,
+                "in_flight_prompts": in_flight,
+                "dedup_waiting": waiting,
+                "calls": self.calls,
+                "deduplicated": self._flight.shared,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "early_stops": self.early_stops,
+                "p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else None,
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared(backend=None, **kwargs):
+    """The process-wide gateway, created on first use over ``llm.create_model(backend)``."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LLMGateway(llm.create_model(backend), **kwargs)
+        return _shared
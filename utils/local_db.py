@@ -0,0 +1,417 @@
+"""Local SQLite stand-in for the Sanad warehouse.
+
+The pages are written against SQL Server, so queries are translated on the fly
+(TOP, N'' literals, CAST(... AS DATE), DATEADD/DATEDIFF, FORMAT, LEFT/RIGHT,
+CHARINDEX, ...) and the matching T-SQL functions are registered on every
+connection. Use ``connect`` where a page uses ``pyodbc.connect`` and
+``create_engine`` where it uses a SQLAlchemy engine.
+"""
+import calendar
+import datetime
+import os
+import re
+import sqlite3
+from functools import lru_cache
+
+from utils.sql_text import matching_paren, significant, split_args, tokenize
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2}(?:\.\d+)?)?$")
+_EPOCH = datetime.datetime(1900, 1, 1)
+
+# T-SQL function name -> registered SQLite function name
+_RENAMES = {
+    "LEFT": "tsql_left",
+    "RIGHT": "tsql_right",
+    "FORMAT": "tsql_format",
+    "ISNULL": "ifnull",
+    "COUNT_BIG": "count",
+    "SYSDATETIME": "getdate",
+}
+_DATEPART_FUNCS = ("DATEADD", "DATEDIFF", "DATEPART", "DATENAME")
+_CAST_TYPES = {
+    "DATE": "tsql_date",
+    "DATETIME": "tsql_datetime",
+    "DATETIME2": "tsql_datetime",
+    "SMALLDATETIME": "tsql_datetime",
+}
+_SQLITE_TYPES = {
+    "INT": "INTEGER", "BIGINT": "INTEGER", "SMALLINT": "INTEGER", "TINYINT": "INTEGER", "BIT": "INTEGER",
+    "FLOAT": "REAL", "REAL": "REAL", "DECIMAL": "REAL", "NUMERIC": "REAL", "MONEY": "REAL",
+    "VARCHAR": "TEXT", "NVARCHAR": "TEXT", "CHAR": "TEXT", "NCHAR": "TEXT", "TEXT": "TEXT",
+}
+
+
+# =========================
+# Query translation
+# =========================
+@lru_cache(maxsize=512)
+def translate(sql):
+    """Translate the T-SQL subset used by the pages into SQLite SQL."""
+    tokens = significant(tokenize(sql))
+    out = _translate(tokens)
+    return " ".join(t for t in out)
+
+
+def _translate(tokens):
+    out = []
+    scopes = [None]  # pending LIMIT per parenthesis depth
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        is_call = nxt is not None and nxt.text == "("
+
+        if tok.kind == "string":
+            out.append(tok.text[1:] if tok.text[0] in "Nn" else tok.text)
+        elif tok.kind == "quoted" and tok.text.startswith("["):
+            out.append('"' + tok.text[1:-1] + '"')
+        elif is_call and tok.is_keyword("CAST", "CONVERT"):
+            end = matching_paren(tokens, i + 1)
+            out.append(_translate_cast(tok.upper, tokens[i + 2:end]))
+            i = end
+        elif is_call and tok.is_keyword(*_DATEPART_FUNCS):
+            end = matching_paren(tokens, i + 1)
+            args = split_args(tokens[i + 2:end])
+            part = "'" + " ".join(t.text for t in args[0]).lower() + "'"
+            rest = [" ".join(_translate(a)) for a in args[1:]]
+            out.append(f"{tok.text.lower()}({', '.join([part] + rest)})")
+            i = end
+        elif is_call and tok.upper in _RENAMES:
+            out.append(_RENAMES[tok.upper])
+        elif tok.is_keyword("TOP") and out and out[-1].upper() in ("SELECT", "DISTINCT", "ALL"):
+            # SELECT TOP n / TOP (n) [PERCENT] -> LIMIT n at the end of this scope
+            if nxt is not None and nxt.text == "(":
+                end = matching_paren(tokens, i + 1)
+                scopes[-1] = " ".join(_translate(tokens[i + 2:end]))
+                i = end
+            else:
+                scopes[-1] = nxt.text
+                i += 1
+            if i + 1 < len(tokens) and tokens[i + 1].is_keyword("PERCENT"):
+                i += 1
+        elif tok.is_keyword("OFFSET") and _is_offset_fetch(tokens, i):
+            i, clause = _translate_offset_fetch(tokens, i)
+            out.append(clause)
+        elif tok.is_keyword("WITH") and nxt is not None and nxt.text == "(" and \
+                i + 2 < len(tokens) and tokens[i + 2].is_keyword("NOLOCK", "READUNCOMMITTED"):
+            i = matching_paren(tokens, i + 1)
+        elif tok.text == "(":
+            scopes.append(None)
+            out.append(tok.text)
+        elif tok.text == ")":
+            limit = scopes.pop() if len(scopes) > 1 else None
+            if limit is not None:
+                out.append(f"LIMIT {limit}")
+            out.append(tok.text)
+        elif tok.text == ";":
+            if scopes[0] is not None:
+                out.append(f"LIMIT {scopes[0]}")
+                scopes[0] = None
+            out.append(tok.text)
+        else:
+            out.append(tok.text)
+        i += 1
+
+    if scopes[0] is not None:
+        out.append(f"LIMIT {scopes[0]}")
+    return out
+
+
+def _translate_cast(func, inner):
+    args = split_args(inner)
+    if func == "CONVERT":
+        type_tokens, expr = args[0], args[1]
+    else:
+        as_idx = max(
+            (k for k, t in enumerate(inner) if t.is_keyword("AS")),
+            default=len(inner),
+        )
+        expr, type_tokens = inner[:as_idx], inner[as_idx + 1:]
+    expr_sql = " ".join(_translate(expr))
+    type_name = type_tokens[0].upper if type_tokens else ""
+    if type_name in _CAST_TYPES:
+        return f"{_CAST_TYPES[type_name]}({expr_sql})"
+    return f"CAST({expr_sql} AS {_SQLITE_TYPES.get(type_name, type_name or 'TEXT')})"
+
+
+def _is_offset_fetch(tokens, i):
+    return i + 2 < len(tokens) and tokens[i + 2].is_keyword("ROW", "ROWS")
+
+
+def _translate_offset_fetch(tokens, i):
+    offset = tokens[i + 1].text
+    i += 2  # at ROWS
+    if i + 5 < len(tokens) and tokens[i + 1].is_keyword("FETCH"):
+        # FETCH NEXT|FIRST n ROWS ONLY
+        fetch = tokens[i + 3].text
+        return i + 5, f"LIMIT {fetch} OFFSET {offset}"
+    return i, f"LIMIT -1 OFFSET {offset}"
+
+
+# =========================
+# T-SQL functions
+# =========================
+def _to_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    if isinstance(value, (int, float)):
+        return _EPOCH + datetime.timedelta(days=value)
+    text = str(value).strip()
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%Y%m%d"):
+        try:
+            return datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _fmt(dt):
+    if dt is None:
+        return None
+    if dt.time() == datetime.time():
+        return dt.strftime("%Y-%m-%d")
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _add_months(dt, months):
+    month_index = dt.month - 1 + months
+    year, month = dt.year + month_index // 12, month_index % 12 + 1
+    day = min(dt.day, calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
+
+
+_PARTS = {
+    "year": "year", "yy": "year", "yyyy": "year",
+    "quarter": "quarter", "qq": "quarter", "q": "quarter",
+    "month": "month", "mm": "month", "m": "month",
+    "dayofyear": "day", "dy": "day", "y": "day",
+    "day": "day", "dd": "day", "d": "day",
+    "week": "week", "wk": "week", "ww": "week",
+    "weekday": "weekday", "dw": "weekday",
+    "hour": "hour", "hh": "hour",
+    "minute": "minute", "mi": "minute", "n": "minute",
+    "second": "second", "ss": "second", "s": "second",
+}
+
+
+def getdate():
+    today = os.getenv("SANAD_LOCAL_TODAY")
+    now = datetime.datetime.now().replace(microsecond=0)
+    if today:
+        now = datetime.datetime.combine(datetime.date.fromisoformat(today), now.time())
+    return _fmt(now)
+
+
+def dateadd(part, number, value):
+    dt = _to_datetime(value)
+    if dt is None or number is None:
+        return None
+    part, number = _PARTS.get(part, part), int(number)
+    if part == "year":
+        dt = _add_months(dt, 12 * number)
+    elif part == "quarter":
+        dt = _add_months(dt, 3 * number)
+    elif part == "month":
+        dt = _add_months(dt, number)
+    elif part == "week":
+        dt += datetime.timedelta(weeks=number)
+    elif part in ("day", "weekday"):
+        dt += datetime.timedelta(days=number)
+    else:
+        dt += datetime.timedelta(**{part + "s": number})
+    return _fmt(dt)
+
+
+def datediff(part, start, end):
+    a, b = _to_datetime(start), _to_datetime(end)
+    if a is None or b is None:
+        return None
+    part = _PARTS.get(part, part)
+    if part == "year":
+        return b.year - a.year
+    if part == "quarter":
+        return (b.year - a.year) * 4 + (b.month - 1) // 3 - (a.month - 1) // 3
+    if part == "month":
+        return (b.year - a.year) * 12 + b.month - a.month
+    if part == "week":
+        return (b.date() - a.date()).days // 7
+    if part in ("day", "weekday"):
+        return (b.date() - a.date()).days
+    seconds = int((b - a).total_seconds())
+    return {"hour": seconds // 3600, "minute": seconds // 60}.get(part, seconds)
+
+
+def datepart(part, value):
+    dt = _to_datetime(value)
+    if dt is None:
+        return None
+    part = _PARTS.get(part, part)
+    if part == "quarter":
+        return (dt.month - 1) // 3 + 1
+    if part == "week":
+        return int(dt.strftime("%U")) + 1
+    if part == "weekday":
+        return dt.isoweekday() % 7 + 1
+    return getattr(dt, part)
+
+
+def datename(part, value):
+    dt = _to_datetime(value)
+    if dt is None:
+        return None
+    part = _PARTS.get(part, part)
+    if part == "month":
+        return dt.strftime("%B")
+    if part == "weekday":
+        return dt.strftime("%A")
+    return str(datepart(part, value))
+
+
+def datefromparts(year, month, day):
+    return _fmt(datetime.datetime(int(year), int(month), int(day)))
+
+
+def eomonth(value, months=0):
+    dt = _to_datetime(value)
+    if dt is None:
+        return None
+    dt = _add_months(dt.replace(day=1), int(months))
+    return _fmt(dt.replace(day=calendar.monthrange(dt.year, dt.month)[1], hour=0, minute=0, second=0))
+
+
+_NET_FORMAT_RE = re.compile(r"yyyy|yy|MMMM|MMM|MM|M|dd|d|HH|hh|mm|ss|tt")
+# One formatter per .NET field; the unpadded "M" and "d" are built by hand because
+# strftime's "%-m" / "%-d" only exist on glibc
+_NET_FIELDS = {
+    "yyyy": lambda dt: dt.strftime("%Y"), "yy": lambda dt: dt.strftime("%y"),
+    "MMMM": lambda dt: dt.strftime("%B"), "MMM": lambda dt: dt.strftime("%b"),
+    "MM": lambda dt: dt.strftime("%m"), "M": lambda dt: str(dt.month),
+    "dd": lambda dt: dt.strftime("%d"), "d": lambda dt: str(dt.day),
+    "HH": lambda dt: dt.strftime("%H"), "hh": lambda dt: dt.strftime("%I"),
+    "mm": lambda dt: dt.strftime("%M"), "ss": lambda dt: dt.strftime("%S"), "tt": lambda dt: dt.strftime("%p"),
+}
+
+
+def tsql_format(value, fmt):
+    if value is None or fmt is None:
+        return None
+    if re.fullmatch(r"[Nn]\d*", fmt):
+        decimals = int(fmt[1:] or 2)
+        return f"{float(value):,.{decimals}f}"
+    dt = _to_datetime(value)
+    if dt is None:
+        return str(value)
+    return _NET_FORMAT_RE.sub(lambda m: _NET_FIELDS[m.group()](dt), fmt)
+
+
+def tsql_left(value, n):
+    if value is None or n is None or n < 0:
+        return None
+    return str(value)[:int(n)]
+
+
+def tsql_right(value, n):
+    if value is None or n is None or n < 0:
+        return None
+    return str(value)[-int(n):] if n else ""
+
+
+def tsql_len(value):
+    return None if value is None else len(str(value).rstrip())
+
+
+def charindex(needle, haystack, start=1):
+    if needle is None or haystack is None:
+        return None
+    return str(haystack).find(str(needle), max(int(start), 1) - 1) + 1
+
+
+def _register_functions(conn):
+    for name, func, nargs in [
+        ("getdate", getdate, 0),
+        ("dateadd", dateadd, 3),
+        ("datediff", datediff, 3),
+        ("datepart", datepart, 2),
+        ("datename", datename, 2),
+        ("datefromparts", datefromparts, 3),
+        ("eomonth", eomonth, 1),
+        ("eomonth", eomonth, 2),
+        ("year", lambda v: datepart("year", v), 1),
+        ("month", lambda v: datepart("month", v), 1),
+        ("day", lambda v: datepart("day", v), 1),
+        ("tsql_date", lambda v: _fmt(_to_datetime(v).replace(hour=0, minute=0, second=0)) if _to_datetime(v) else None, 1),
+        ("tsql_datetime", lambda v: _to_datetime(v).strftime("%Y-%m-%d %H:%M:%S") if _to_datetime(v) else None, 1),
+        ("tsql_format", tsql_format, 2),
+        ("tsql_left", tsql_left, 2),
+        ("tsql_right", tsql_right, 2),
+        ("len", tsql_len, 1),
+        ("charindex", charindex, 2),
+        ("charindex", charindex, 3),
+    ]:
+        conn.create_function(name, nargs, func, deterministic=name != "getdate")
+
+
+# =========================
+# DB-API stand-in
+# =========================
+def _convert_row(row):
+    if row is None:
+        return None
+    return tuple(
+        _to_datetime(v) if isinstance(v, str) and _DATE_RE.match(v) else v
+        for v in row
+    )
+
+
+class StandInCursor(sqlite3.Cursor):
+    """Cursor that accepts T-SQL and returns dates as datetimes, like pyodbc."""
+
+    def execute(self, sql, parameters=()):
+        return super().execute(translate(sql), parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return super().executemany(translate(sql), seq_of_parameters)
+
+    def fetchone(self):
+        return _convert_row(super().fetchone())
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        return [_convert_row(r) for r in rows]
+
+    def fetchall(self):
+        return [_convert_row(r) for r in super().fetchall()]
+
+    def cancel(self):
+        self.connection.interrupt()
+
+
+class StandInConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _register_functions(self)
+        self.timeout = 0  # pyodbc-compatible query timeout attribute (unused)
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or StandInCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+
+def connect(path):
+    """Open the stand-in database; drop-in for ``pyodbc.connect``."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Local database not found: {path}")
+    return sqlite3.connect(path, factory=StandInConnection, check_same_thread=False)
+
+
+def create_engine(path, **kwargs):
+    """SQLAlchemy engine over the stand-in; drop-in for the mssql+pyodbc engine."""
+    from sqlalchemy import create_engine as sa_create_engine
+
+    return sa_create_engine(f"sqlite:///{path}", creator=lambda: connect(path), **kwargs)
@@ -0,0 +1,104 @@
+"""Answer chatbot follow-ups ("filter the previous results", "group that by area")
+in memory over the previous result instead of querying the warehouse.
+
+The previous DataFrame is loaded into an in-memory SQLite database as the
+table ``previous_result``; the model writes SQLite SQL against it. When the
+request needs data the table does not have, the model answers
+``NEEDS_WAREHOUSE`` and the caller falls back to warehouse SQL.
+"""
+import re
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+TABLE = "previous_result"
+NEEDS_WAREHOUSE = "NEEDS_WAREHOUSE"
+MAX_ROWS = 1_000_000
+
+# Wording that points at the previous result itself. Broader words ("last", "filter",
+# "group") also start new questions ("sales last month") and would answer them from old data.
+REFERENCES = re.compile(
+    r"\b(previous|above|earlier|these|those|them|same data|(this|that) (data|result|table|list)"
+    r"|(last|previous|the) results?)\b|السابق|السابقة|هذه النتائج|هذه البيانات|نفس البيانات|منها|منهم",
+    re.IGNORECASE,
+)
+
+
+def refers_to_result(question):
+    """True when ``question`` asks about the previous result rather than something new."""
+    return bool(REFERENCES.search(question or ""))
+
+
+def local_columns(df):
+    """Unique, non-empty column names for the in-memory table."""
+    names, seen = [], set()
+    for i, col in enumerate(df.columns):
+        name = str(col).strip() or f"col_{i + 1}"
+        base, n = name, 2
+        while name.lower() in seen:
+            name, n = f"{base}_{n}", n + 1
+        seen.add(name.lower())
+        names.append(name)
+    return names
+
+
+def _sqlite_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TEXT (ISO date)"
+    return "TEXT"
+
+
+def build_prompt(user_request, df, previous_question=""):
+    columns = local_columns(df)
+    column_lines = "\n".join(f'- "{name}" {_sqlite_type(dtype)}' for name, dtype in zip(columns, df.dtypes))
+    sample = df.head(3).copy()
+    sample.columns = columns
+    return f"""
+You answer follow-up questions over the result of the previous query, which is
+loaded into SQLite as the table {TABLE} ({len(df)} rows).
+
+Previous question: {previous_question}
+
+Columns of {TABLE}:
+{column_lines}
+
+Sample rows:
+{sample.to_string(index=False)}
+
+Rules:
+- Write ONE SQLite SELECT statement that reads only from {TABLE}.
+- Quote column names with double quotes; use LIMIT instead of TOP.
+- If the request needs columns, rows or tables that {TABLE} does not contain, reply with exactly {NEEDS_WAREHOUSE}.
+
+The user is asking: "{user_request}"
+
+Write ONLY the SQL query (no explanation).
+"""
+
+
+def needs_warehouse(sql):
+    return not sql or NEEDS_WAREHOUSE in sql.upper()
+
+
+def run(sql, df):
+    """Run ``sql`` over ``df`` in memory; None when it cannot be answered there."""
+    if needs_warehouse(sql) or len(df) > MAX_ROWS:
+        return None
+    # Only the previous result is loaded, so any other table name means warehouse SQL
+    tables = {t.lower() for t in re.findall(r"(?i)\b(?:from|join)\s+\"?\[?([A-Za-z_][\w]*)", sql)}
+    ctes = {t.lower() for t in re.findall(r"(?i)\b([A-Za-z_]\w*)\s+as\s*\(", sql)}
+    if tables - ctes - {TABLE}:
+        return None
+    frame = df.copy(deep=False)
+    frame.columns = local_columns(df)
+    with closing(sqlite3.connect(":memory:")) as conn:
+        frame.to_sql(TABLE, conn, index=False)
+        try:
+            return pd.read_sql(sql, conn)
+        except Exception:
+            return None
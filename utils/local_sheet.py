@@ -0,0 +1,19 @@
+"""CSV stand-in for the salesman roster Google Sheet."""
+import csv
+
+
+class CsvWorksheet:
+    """Minimal gspread worksheet look-alike backed by a CSV export of the sheet."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_all_values(self):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return [row for row in csv.reader(f)]
+
+
+def open_roster(secrets):
+    """CsvWorksheet when ``[roster] csv_path`` is configured, else None."""
+    path = secrets.get("roster", {}).get("csv_path")
+    return CsvWorksheet(path) if path else None
@@ -0,0 +1,155 @@
+"""Background query jobs for the SQL Query page.
+
+A job runs on a worker thread with a pooled connection of its own, so a long
+query neither blocks the Streamlit script thread nor holds a connection
+another session needs. The page polls ``status``, ``elapsed`` and ``rows``
+while it runs. ``JobRunner.cancel`` cancels the statement on the server, and
+so does passing the timeout (both through ``QueryStream``). The runner is
+shared by the process and keeps finished jobs, results included, for
+``keep_seconds``, so a user can leave the page (or reload it) and come back
+to a job by id. Results are bounded in total by ``max_mb``; the oldest
+finished jobs go first, and ``discard`` drops a job whose result was superseded
+(the previous page of a paged query).
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.query_stream import ConnectionBusy, QueryCancelled, QueryStream, StreamGroup
+from utils.sql_rewrite import ROW_CAP
+
+TIMEOUT_SECONDS = 600
+KEEP_SECONDS = 3600
+MAX_JOBS = 200
+MAX_MB = 256
+POLL_SECONDS = 1.0
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class QueryJob:
+    """One submitted unit of work: status, progress and, once done, its result DataFrame."""
+
+    def __init__(self, label, meta, timeout):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.meta = meta
+        self.timeout = timeout
+        self.status = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.rows = 0
+        self.result = None
+        self.error = None
+        self.info = {}
+        self.nbytes = 0
+        self._streams = StreamGroup()
+        self._future = None
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def elapsed(self):
+        """Seconds running so far (or in total once done); 0 while queued."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def read(self, conn, sql, row_cap=ROW_CAP):
+        """Run ``sql`` on ``conn`` as part of this job: cancellable, timed out, ``rows`` kept current."""
+        stream = self._streams.add(QueryStream(conn, sql, row_cap=row_cap, timeout=self.timeout))
+
+        def progress(chunk, s):
+            self.rows = s.rows
+
+        return stream.read(on_chunk=progress)
+
+
+class JobRunner:
+    """Runs ``work(conn, job)`` callables on ``pool`` connections, at most ``pool.size`` at a time."""
+
+    def __init__(self, pool, timeout=TIMEOUT_SECONDS, keep_seconds=KEEP_SECONDS, max_jobs=MAX_JOBS, max_mb=MAX_MB):
+        self.pool = pool
+        self.timeout = timeout
+        self.keep_seconds = keep_seconds
+        self.max_jobs = max_jobs
+        self.max_bytes = max_mb * 2**20
+        self._executor = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix="sql-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, work, label="", **meta):
+        """Queue ``work(conn, job)``, which returns the job's result; returns the QueryJob.
+
+        ``work`` should run its SQL through ``job.read`` so it can be cancelled.
+        """
+        job = QueryJob(label, meta, self.timeout)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job._future = self._executor.submit(self._run, job, work)
+        return job
+
+    def _run(self, job, work):
+        if job._streams.cancelled:
+            job.finished, job.status = time.time(), CANCELLED
+            return
+        job.status, job.started = RUNNING, time.time()
+        status = FAILED
+        try:
+            with self.pool.connection() as conn:
+                job.result = work(conn, job)
+            if job.result is not None:
+                job.nbytes = int(job.result.memory_usage(deep=True).sum())
+            status = DONE
+        except QueryCancelled:
+            status = CANCELLED
+        except ConnectionBusy as e:
+            # The pool closed the connection; a cancel the server was slow to honour is still a cancel
+            if job._streams.cancelled:
+                status = CANCELLED
+            else:
+                job.error = str(e)
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            # ``finished`` first: a job that reads as done always has it
+            job.finished = time.time()
+            job.status = status
+            with self._lock:
+                self._prune()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; finished jobs are left alone."""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return
+        job._streams.cancel()
+        if job._future is not None and job._future.cancel():
+            job.finished, job.status = time.time(), CANCELLED
+
+    def discard(self, job_id):
+        """Cancel the job if it is still going and forget it, result included."""
+        self.cancel(job_id)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        """Drop finished jobs older than ``keep_seconds``, then the oldest finished ones beyond ``max_jobs`` or ``max_mb``."""
+        cutoff = time.time() - self.keep_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.done and job.finished < cutoff:
+                del self._jobs[job_id]
+        total = sum(job.nbytes for job in self._jobs.values())
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done]:
+            if len(self._jobs) <= self.max_jobs and total <= self.max_bytes:
+                break
+            total -= self._jobs.pop(job_id).nbytes
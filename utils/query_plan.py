@@ -0,0 +1,178 @@
+"""Planning mode: compound chatbot questions answered by several simple queries.
+
+"Sales and active customers per governorate this month vs last month" tends
+to become one large query full of conditional aggregates. Instead, the model
+is asked (``PLANNING_RULES``) to write independent queries that share their
+grouping columns, in one SQL block::
+
+    -- keys: GOVERNER_NAME
+    -- part: Sales this month
+    SELECT c.GOVERNER_NAME, SUM(s.Netsalesvalue) AS Sales FROM ...;
+    -- part: Sales last month
+    SELECT c.GOVERNER_NAME, SUM(s.Netsalesvalue) AS Sales FROM ...;
+
+``parse_plan`` splits and checks the parts, ``execute`` runs them at the
+same time (each on its own connection), and ``combine`` outer-joins the
+results on the keys in memory. Measure columns that several parts share are
+renamed after the part label ("Sales last month").
+"""
+import re
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from utils.sql_rewrite import UnsafeSQL, check_select
+
+MAX_PARTS = 6
+MAX_PARALLEL = 4
+POLL_SECONDS = 0.25
+
+# Questions that compare periods or ask for measures side by side; only these get the planning
+# rules. A bare "and" / "و" is not enough: it joins filters and dimensions in most questions.
+COMPOUND = re.compile(
+    r"\b(vs\.?|versus|compared?|comparing|comparison|against|as well as|along with|side by side)\b"
+    r"|مقارنة|مقابل|بالمقارنة|بالإضافة إلى|إلى جانب|وكمان",
+    re.IGNORECASE,
+)
+
+PLANNING_RULES = """
+Planning: if the question asks for several measures or periods (e.g. sales AND active customers,
+this month VS last month) that would need one long query with many conditional aggregates, split it
+into independent simple SELECT queries instead. Every query must return the same grouping columns
+with the same aliases, plus its own measure columns. Write them all in the one ```sql block as:
+-- keys: <grouping column aliases, comma separated>
+-- part: <short label>
+SELECT ...;
+-- part: <short label>
+SELECT ...;
+Use at most {max_parts} parts. If one simple query answers the question, write just that query without these comments.
+""".format(max_parts=MAX_PARTS)
+
+_PART = re.compile(r"^[ \t]*--[ \t]*part[ \t]*:(.*)$", re.IGNORECASE | re.MULTILINE)
+_KEYS = re.compile(r"^[ \t]*--[ \t]*keys[ \t]*:(.*)$", re.IGNORECASE | re.MULTILINE)
+
+
+def is_compound(question):
+    return bool(COMPOUND.search(question or ""))
+
+
+def parse_plan(sql):
+    """``{"keys": [...], "parts": [(label, sql), ...]}`` for a planned answer, None for a single query.
+
+    Every part must pass the SELECT-only check (UnsafeSQL otherwise).
+    """
+    markers = list(_PART.finditer(sql or ""))
+    if len(markers) < 2:
+        return None
+    if len(markers) > MAX_PARTS:
+        raise UnsafeSQL(f"The plan has {len(markers)} sub-queries; at most {MAX_PARTS} are allowed.")
+    keys_line = _KEYS.search(sql)
+    keys = [k.strip().strip('[]"`') for k in keys_line.group(1).split(",")] if keys_line else []
+    parts = []
+    for n, marker in enumerate(markers):
+        end = markers[n + 1].start() if n + 1 < len(markers) else len(sql)
+        body = _KEYS.sub("", sql[marker.end():end]).strip().rstrip(";").strip()
+        check_select(body)
+        parts.append((marker.group(1).strip() or f"Part {n + 1}", body))
+    return {"keys": [k for k in keys if k], "parts": parts}
+
+
+def plan_sql(plan):
+    """The plan written back as one block (for display and the chat history)."""
+    lines = [f"-- keys: {', '.join(plan['keys'])}"] if plan["keys"] else []
+    for label, sql in plan["parts"]:
+        lines += [f"-- part: {label}", f"{sql};"]
+    return "\n".join(lines)
+
+
+def execute(parts, run_part, max_workers=MAX_PARALLEL, on_wait=None, cancel=None):
+    """``run_part(sql)`` for every part at the same time; ``[(df, ms), ...]`` in plan order.
+
+    ``on_wait(done, total)`` runs on the calling thread between polls, so a
+    Streamlit rerun can interrupt the wait. The first failure, or leaving
+    early, calls ``cancel()`` for the parts still running and is re-raised.
+    """
+
+    def timed(sql):
+        started = time.perf_counter()
+        df = run_part(sql)
+        return df, (time.perf_counter() - started) * 1000
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(parts))), thread_name_prefix="plan")
+    futures = [pool.submit(timed, sql) for _, sql in parts]
+    finished = False
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_EXCEPTION)
+            failed = next((f for f in done if f.exception() is not None), None)
+            if failed is not None:
+                raise failed.exception()
+            if pending and on_wait is not None:
+                on_wait(len(futures) - len(pending), len(futures))
+        finished = True
+        return [f.result() for f in futures]
+    finally:
+        if not finished and cancel is not None:
+            cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _match(columns, name):
+    lowered = {str(c).lower(): c for c in columns}
+    return lowered.get(name.lower())
+
+
+def combine(keys, parts, frames):
+    """Outer join of the part results on ``keys``; side by side when there are no keys.
+
+    Without a keys line, the non-numeric columns every part returns are used.
+    Every part must return one row per key (ValueError otherwise): repeated
+    keys would multiply the rows of the join.
+    """
+    if not keys:
+        shared = [c for c in frames[0].columns
+                  if all(_match(f.columns, str(c)) is not None and not pd.api.types.is_numeric_dtype(f[_match(f.columns, str(c))])
+                         for f in frames)]
+        keys = [str(c) for c in shared]
+    counts = {}
+    for df in frames:
+        for c in df.columns:
+            if keys and _match(keys, str(c)) is not None:
+                continue
+            counts[str(c).lower()] = counts.get(str(c).lower(), 0) + 1
+
+    prepared = []
+    for (label, _), df in zip(parts, frames):
+        renames = {}
+        for key in keys:
+            column = _match(df.columns, key)
+            if column is None:
+                raise ValueError(f'Sub-query "{label}" did not return the join column {key}.')
+            renames[column] = key
+        if keys and df.duplicated(list(renames)).any():
+            raise ValueError(
+                f'Sub-query "{label}" returned more than one row for the same {", ".join(keys)}; '
+                "each part must return one row per key."
+            )
+        for c in df.columns:
+            if c not in renames and counts.get(str(c).lower(), 0) > 1:
+                renames[c] = label if str(c).lower() in label.lower() else f"{c} ({label})"
+        prepared.append(df.rename(columns=renames))
+
+    if not keys:
+        combined = pd.concat([df.reset_index(drop=True) for df in prepared], axis=1)
+    else:
+        combined = prepared[0]
+        for df in prepared[1:]:
+            try:
+                combined = combined.merge(df, on=keys, how="outer", sort=False)
+            except (TypeError, ValueError):
+                # Same key written with different types (e.g. month as int and text)
+                combined = combined.astype({k: str for k in keys}).merge(
+                    df.astype({k: str for k in keys}), on=keys, how="outer", sort=False)
+    truncated = [df for df in frames if df.attrs.get("truncated")]
+    combined.attrs["truncated"] = bool(truncated)
+    combined.attrs["row_cap"] = truncated[0].attrs.get("row_cap") if truncated else None
+    return combined
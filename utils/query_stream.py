@@ -0,0 +1,187 @@
+"""Chunked, row-capped, cancellable query execution for the chatbot.
+
+The query runs on a worker thread that fetches ``chunk_rows`` rows at a time
+into a queue. The page thread drains the queue, so it can render the first
+chunk while the rest stream in and it keeps reaching Streamlit yield points
+(a Cancel click reruns the script) while the warehouse is still working.
+Cancelling, or passing the timeout, calls ``cursor.cancel()`` and waits up
+to ``JOIN_SECONDS`` for the worker to let go of the connection; if it has
+not, ``ConnectionBusy`` (or ``busy``, when a Streamlit rerun is already
+unwinding the script) tells the caller not to reuse that connection.
+"""
+import queue
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from utils.singleflight import Interrupted
+from utils.sql_rewrite import ROW_CAP
+
+CHUNK_ROWS = 5_000
+TIMEOUT_SECONDS = 120
+POLL_SECONDS = 0.25
+JOIN_SECONDS = 5
+
+
+class QueryCancelled(Interrupted):
+    """Raised to the caller that cancelled; anyone sharing its execution runs the query again."""
+
+
+class QueryTimeout(TimeoutError):
+    pass
+
+
+class ConnectionBusy(Interrupted):
+    """The worker still holds the connection after the query was stopped; close the connection."""
+
+
+class QueryStream:
+    """One query execution; iterate ``chunks()`` for DataFrames of up to ``chunk_rows`` rows."""
+
+    def __init__(self, conn, sql, row_cap=ROW_CAP, chunk_rows=CHUNK_ROWS, timeout=TIMEOUT_SECONDS):
+        self.conn = conn
+        self.sql = sql
+        self.row_cap = row_cap
+        self.chunk_rows = chunk_rows
+        self.timeout = timeout
+        self.columns = None
+        self.rows = 0
+        self.truncated = False
+        self.cancelled = False
+        self.started_at = None
+        self._queue = queue.Queue()
+        self._cursor = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        """True while the worker thread still uses the connection."""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at if self.started_at else 0.0
+
+    def _worker(self):
+        try:
+            cursor = self.conn.cursor()
+            with self._lock:
+                self._cursor = cursor
+            try:
+                cursor.execute(self.sql)
+                self.columns = [d[0] for d in cursor.description or []]
+                while not self._stop.is_set():
+                    batch = cursor.fetchmany(min(self.chunk_rows, self.row_cap - self.rows))
+                    if not batch:
+                        break
+                    self.rows += len(batch)
+                    self._queue.put(("rows", batch))
+                    if self.rows >= self.row_cap:
+                        # One more row tells a capped result from one that fits exactly
+                        self.truncated = cursor.fetchone() is not None
+                        break
+            finally:
+                with self._lock:
+                    self._cursor = None
+                cursor.close()
+            self._queue.put(("done", None))
+        except Exception as e:
+            self._queue.put(("error", e))
+
+    def cancel(self):
+        """Stop fetching and cancel the statement on the server; safe from any thread."""
+        self.cancelled = True
+        self._stop.set()
+        with self._lock:
+            cursor = self._cursor
+        if cursor is not None:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+
+    def chunks(self, on_wait=None):
+        """Yield DataFrame chunks; ``on_wait(self)`` is called every poll while waiting.
+
+        Raises QueryTimeout past ``timeout`` and QueryCancelled after ``cancel()``;
+        leaving the loop early (including a Streamlit rerun) cancels the query.
+        Each of these waits for the worker thread, and raises ConnectionBusy
+        instead when it is still using the connection after ``JOIN_SECONDS``
+        (unless a BaseException such as a Streamlit rerun is propagating).
+        """
+        if self.cancelled:
+            raise QueryCancelled("Query cancelled.")
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+        finished = False
+        try:
+            while True:
+                try:
+                    kind, payload = self._queue.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    if self.cancelled:
+                        raise QueryCancelled("Query cancelled.")
+                    if self.timeout and self.elapsed > self.timeout:
+                        raise QueryTimeout(f"Query stopped after {self.timeout:g} seconds.")
+                    if on_wait is not None:
+                        on_wait(self)
+                    continue
+                if kind == "rows":
+                    yield pd.DataFrame.from_records(payload, columns=self.columns, coerce_float=True)
+                elif kind == "error":
+                    if self.cancelled:
+                        raise QueryCancelled("Query cancelled.")
+                    raise payload
+                else:
+                    finished = True
+                    if self.cancelled:
+                        raise QueryCancelled("Query cancelled.")
+                    return
+        finally:
+            if not finished:
+                self.cancel()
+                self._thread.join(JOIN_SECONDS)
+                unwinding = sys.exc_info()[1]
+                if self.busy and (unwinding is None or isinstance(unwinding, Exception)):
+                    raise ConnectionBusy(f"The query did not stop within {JOIN_SECONDS} seconds of being cancelled.")
+
+    def read(self, on_chunk=None, on_wait=None):
+        """Whole (capped) result; ``df.attrs["truncated"]`` is set when the cap was hit."""
+        frames = []
+        for chunk in self.chunks(on_wait):
+            frames.append(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk, self)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=self.columns or [])
+        df.attrs["truncated"] = self.truncated
+        df.attrs["row_cap"] = self.row_cap
+        return df
+
+
+class StreamGroup:
+    """Streams running together (planned sub-queries); ``cancel()`` stops them all, including ones added later."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._streams = []
+        self._lock = threading.Lock()
+
+    def add(self, stream):
+        with self._lock:
+            self._streams.append(stream)
+            cancelled = self.cancelled
+        if cancelled:
+            stream.cancel()
+        return stream
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            streams = list(self._streams)
+        for stream in streams:
+            stream.cancel()
@@ -0,0 +1,82 @@
+"""Cache of validated question -> SQL pairs for the BI Chatbot.
+
+Questions are keyed by a normalized form so that "Sales by governorate this
+month", "sales  by Governorate this month?" and the same question typed with
+Arabic-Indic digits or a different alef/yeh spelling share one entry. Keys
+also carry the access level and the schema prompt version, so a new schema
+prompt never serves SQL written against the old one.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Tashkeel (harakat, shadda, sukun, superscript alef) and tatweel.
+_ARABIC_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_LETTERS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+})
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+
+
+def normalize_question(text):
+    """Case-, spelling-, digit- and whitespace-folded form of a question."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _ARABIC_DIACRITICS.sub("", text)
+    text = text.translate(_ARABIC_LETTERS).translate(_DIGITS)
+    text = _PUNCTUATION.sub(" ", text)
+    return " ".join(text.split())
+
+
+class QuestionCache:
+    """Thread-safe LRU of question -> SQL shared by every chatbot session."""
+
+    def __init__(self, max_entries=1000, ttl_seconds=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (sql, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(question, access_level, schema_version):
+        return (access_level, schema_version, normalize_question(question))
+
+    def get(self, question, access_level, schema_version):
+        key = self.key(question, access_level, schema_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, question, access_level, schema_version, sql):
+        key = self.key(question, access_level, schema_version)
+        if not key[2]:
+            return
+        with self._lock:
+            # Entries written against an older schema prompt can never hit again.
+            for stale in [k for k in self._entries if k[1] != schema_version]:
+                del self._entries[stale]
+            self._entries[key] = (sql, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
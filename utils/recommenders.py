@@ -0,0 +1,102 @@
+"""Recommendation functions shared by the recommender pages and the benchmarks."""
+import pandas as pd
+
+CONTENT_COLUMNS = ["ITEM_CODE", "DESCRIPTION", "brand", "category"]
+
+
+# =========================
+# Content-based (salesman_dashboard)
+# =========================
+def recommend_similar_items(model_data, item_code, num_recommendations=5):
+    """Recommend items similar to the given item_code using cosine similarity."""
+    indices = model_data["indices"]
+    if item_code not in indices:
+        return pd.DataFrame(columns=CONTENT_COLUMNS)
+
+    idx = indices[item_code]
+    sim_scores = list(enumerate(model_data["cosine_sim"][idx]))
+    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+    sim_scores = sim_scores[1:num_recommendations+1]  # skip self
+
+    item_indices = [i[0] for i in sim_scores]
+    recs = model_data["items_df"].iloc[item_indices][CONTENT_COLUMNS].copy()
+    recs["similarity_score"] = [round(i[1], 3) for i in sim_scores]
+    return recs
+
+
+def recommend_for_customer_content(model_data, purchased_item_codes, num_recommendations=5,
+                                   similar_items=None):
+    """Content-based recommendations from the items a customer already bought.
+
+    ``similar_items(item_code, num_recommendations)`` can be passed to reuse a
+    caller-side cache of ``recommend_similar_items``.
+    """
+    purchased = pd.unique(pd.Series(purchased_item_codes))
+    if len(purchased) == 0:
+        return pd.DataFrame(columns=CONTENT_COLUMNS)
+    if similar_items is None:
+        similar_items = lambda code, n: recommend_similar_items(model_data, code, n)
+
+    recs = pd.DataFrame()
+    for item_code in purchased:
+        recs = pd.concat([recs, similar_items(item_code, 10)])
+
+    recs = recs[~recs["ITEM_CODE"].isin(purchased)]
+    recs = recs.drop_duplicates(subset=["ITEM_CODE"])
+
+    # Diversification
+    diverse_list = []
+    seen_categories = set()
+    for _, row in recs.iterrows():
+        if row["category"] not in seen_categories:
+            diverse_list.append(row.to_dict())
+            seen_categories.add(row["category"])
+        if len(diverse_list) >= num_recommendations:
+            break
+
+    if len(diverse_list) < num_recommendations:
+        remaining = recs[~recs["ITEM_CODE"].isin([r["ITEM_CODE"] for r in diverse_list])]
+        extra_needed = num_recommendations - len(diverse_list)
+        diverse_list.extend(remaining.head(extra_needed).to_dict("records"))
+
+    return pd.DataFrame(diverse_list)
+
+
+# =========================
+# Item-item similarity (2_Product_Recommendation)
+# =========================
+def get_recommendations(item_id, sim_df, name_map, top_n=5):
+    if item_id not in sim_df.columns:
+        return []
+    similar_items = sim_df[item_id].sort_values(ascending=False).drop(item_id, errors='ignore')
+    return [(i, name_map.get(i, "Unknown Name")) for i in similar_items.head(top_n).index]
+
+
+# =========================
+# Collaborative filtering (user_recommendation)
+# =========================
+def recommend_for_customer(customer_id, user_item, item_sim_df, top_n=5, item_metadata=None):
+    if customer_id not in user_item.index:
+        return []
+    customer_purchases = user_item.loc[customer_id]
+    purchased_items = customer_purchases[customer_purchases > 0].index.tolist()
+    scores = pd.Series(dtype=float)
+
+    for item in purchased_items:
+        similar_items = item_sim_df[item].drop(index=purchased_items)
+        if item_metadata is not None:
+            item_info = item_metadata.set_index('ItemId')
+            if item in item_info.index:
+                item_row = item_info.loc[item]
+                mask = (item_info['Brand'] == item_row['Brand']) | (item_info['Category'] == item_row['Category'])
+                boost_ids = item_info[mask].index
+                similar_items[similar_items.index.isin(boost_ids)] *= 1.2
+        scores = scores.add(similar_items, fill_value=0)
+
+    if item_metadata is not None:
+        purchased_info = item_metadata[item_metadata['ItemId'].isin(purchased_items)]
+        target_values = purchased_info[['Brand', 'Category']].drop_duplicates()
+        valid_items = item_metadata.merge(target_values, on=['Brand', 'Category'])['ItemId']
+        scores = scores[scores.index.isin(valid_items)]
+
+    return scores.sort_values(ascending=False).head(top_n).index.tolist()
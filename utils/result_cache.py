@@ -0,0 +1,152 @@
+"""Process-wide cache of query results shared by the chatbot and SQL Query pages.
+
+Entries are keyed by the SQL fingerprint (case, whitespace and comments
+ignored) plus the MP_Sales data version, so a warehouse load invalidates
+everything at once. Eviction is LRU within a memory budget. Concurrent misses
+for the same key run the query once; the other callers share its result.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from utils.singleflight import SingleFlight
+from utils.sql_text import fingerprint
+
+MAX_MB = 512
+MAX_ENTRY_MB = 64
+VERSION_TTL = 60
+
+# Tried in order; the first one the connection accepts is kept.
+DATA_VERSION_QUERIES = [
+    # SQL Server: last load date plus the row count from metadata (no table scan)
+    "SELECT CONVERT(varchar(30), MAX(s.Date), 126) + '|' + CAST((SELECT SUM(p.rows) FROM sys.partitions p "
+    "WHERE p.object_id = OBJECT_ID('MP_Sales') AND p.index_id IN (0, 1)) AS varchar(30)) FROM MP_Sales s",
+    "SELECT MAX(Date) FROM MP_Sales",
+]
+
+
+class DataVersion:
+    """MP_Sales data version, re-read at most every ``ttl`` seconds."""
+
+    def __init__(self, ttl=VERSION_TTL):
+        self.ttl = ttl
+        self._value = None
+        self._read_at = 0.0
+        self._query = None
+        self._lock = threading.Lock()
+
+    def _fetch(self, conn):
+        """The version string, or None (nothing is cached) when no query gives one."""
+        start = DATA_VERSION_QUERIES.index(self._query) if self._query else 0
+        for query in DATA_VERSION_QUERIES[start:]:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query)
+                row = cursor.fetchone()
+            except Exception:
+                continue
+            finally:
+                cursor.close()
+            if not row or row[0] is None:
+                # NULL: no VIEW DEFINITION on sys.partitions, or no rows yet; a constant would never invalidate
+                continue
+            self._query = query
+            return str(row[0])
+        return None
+
+    def get(self, conn):
+        with self._lock:
+            if self._value is None or time.monotonic() - self._read_at > self.ttl:
+                self._value = self._fetch(conn)
+                self._read_at = time.monotonic()
+            return self._value
+
+
+class ResultCache:
+    """Thread-safe LRU of DataFrames bounded by total memory."""
+
+    def __init__(self, max_mb=MAX_MB, max_entry_mb=MAX_ENTRY_MB):
+        self.max_bytes = max_mb * 2**20
+        self.max_entry_bytes = max_entry_mb * 2**20
+        self._entries = OrderedDict()  # (fingerprint, version) -> (df, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sql, version):
+        key = (fingerprint(sql), version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Shallow copy: callers may add or drop columns without touching the cached frame
+        return entry[0].copy(deep=False)
+
+    def put(self, sql, version, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if version is None or nbytes > self.max_entry_bytes:
+            return
+        key = (fingerprint(sql), version)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            # Rows from an older data version can never be served again
+            for stale in [k for k in self._entries if k[1] != version]:
+                self._bytes -= self._entries.pop(stale)[1]
+            self._entries[key] = (df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+
+    def get_or_run(self, sql, version, run):
+        """Cached result for ``sql`` at ``version``, else ``run()``; empty results are not cached."""
+        df = self.get(sql, version)
+        if df is not None:
+            return df, True
+
+        def run_and_store():
+            result = run()
+            if result is not None and not result.empty:
+                self.put(sql, version, result)
+            return result
+
+        df, shared = self._flight.do((fingerprint(sql), version), run_and_store)
+        if shared:
+            return (df.copy(deep=False) if df is not None else df), True
+        return df, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "mb": round(self._bytes / 2**20, 2),
+                    "hits": self.hits, "misses": self.misses, "coalesced": self._flight.shared}
+
+
+_shared = None
+_shared_version = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+    """``(ResultCache, DataVersion)`` shared by every page in the process."""
+    global _shared, _shared_version
+    with _shared_lock:
+        if _shared is None:
+            _shared, _shared_version = ResultCache(), DataVersion()
+        return _shared, _shared_version
+
+
+def run_cached(conn, sql, run):
+    """``(df, from_cache)`` for ``sql`` through the shared cache."""
+    cache, version = shared()
+    return cache.get_or_run(sql, version.get(conn), run)
@@ -0,0 +1,139 @@
+"""Per-session store for chatbot result DataFrames.
+
+Only the most recent results stay in memory; older ones are written to
+zstd-compressed Parquet files and read back on demand. Chat history keeps a
+small handle instead of the DataFrame::
+
+    {"id": "r3", "rows": 1520, "columns": [...], "dtypes": [...], "preview": <first rows>,
+     "truncated": False, "row_cap": None}
+
+With ``persist=True`` every result is also written to Parquet as soon as it is
+stored, so a later process can reopen the same ``directory`` and ``adopt`` the
+handles saved with the chat.
+"""
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+MEMORY_WINDOW = 3
+PREVIEW_ROWS = 20
+
+
+class ResultStore:
+    """LRU window of DataFrames in memory; everything else spilled to Parquet."""
+
+    def __init__(self, directory, memory_window=MEMORY_WINDOW, preview_rows=PREVIEW_ROWS, persist=False):
+        self.directory = directory
+        self.persist = persist
+        self.memory_window = memory_window
+        self.preview_rows = preview_rows
+        self._frames = OrderedDict()  # id -> DataFrame, most recent last
+        self._spilled = {}  # id -> (parquet path, original column labels)
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def put(self, df):
+        """Store ``df``; return its history handle."""
+        with self._lock:
+            self._counter += 1
+            result_id = f"r{self._counter}"
+        if self.persist:
+            self._write(result_id, df)
+        with self._lock:
+            self._frames[result_id] = df
+            self._evict()
+        return {
+            "id": result_id,
+            "rows": len(df),
+            "columns": [str(c) for c in df.columns],
+            "dtypes": [str(t) for t in df.dtypes],
+            "preview": df.head(self.preview_rows),
+            "truncated": bool(df.attrs.get("truncated")),
+            "row_cap": df.attrs.get("row_cap"),
+        }
+
+    def get(self, result_id, keep=True):
+        """Full DataFrame for a handle id, read back from disk if spilled.
+
+        ``keep=False`` reads a spilled result without moving it into the memory window.
+        """
+        with self._lock:
+            if result_id in self._frames:
+                self._frames.move_to_end(result_id)
+                return self._frames[result_id]
+            spilled = self._spilled.get(result_id)
+        if spilled is None:
+            raise KeyError(result_id)
+        path, columns = spilled
+        df = pd.read_parquet(path)
+        df.columns = columns
+        if not keep:
+            return df
+        with self._lock:
+            self._frames[result_id] = df
+            self._evict()
+        return df
+
+    def adopt(self, handle):
+        """Register a handle persisted by an earlier process; False if its file is gone.
+
+        The preview is read back from the file's first rows.
+        """
+        result_id = handle["id"]
+        path = os.path.join(self.directory, f"{result_id}.parquet")
+        if not os.path.exists(path):
+            return False
+        with self._lock:
+            self._spilled[result_id] = (path, list(handle["columns"]))
+            self._counter = max(self._counter, int(result_id[1:]))
+        if handle.get("preview") is None:
+            import pyarrow.parquet as pq
+
+            batches = pq.ParquetFile(path).iter_batches(batch_size=self.preview_rows)
+            preview = next(batches, None)
+            preview = preview.to_pandas() if preview is not None else pd.DataFrame(columns=range(len(handle["columns"])))
+            preview.columns = list(handle["columns"])
+            handle["preview"] = preview
+        return True
+
+    def in_memory(self, result_id):
+        return result_id in self._frames
+
+    def _write(self, result_id, df):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{result_id}.parquet")
+        # Parquet needs unique string column names (unaliased SQL expressions
+        # come back as duplicate ""), and object columns may mix types
+        frame = df.copy()
+        frame.columns = [f"c{i}" for i in range(len(df.columns))]
+        try:
+            frame.to_parquet(path, compression="zstd", index=False)
+        except (TypeError, ValueError):
+            frame.astype({c: str for c in frame.columns if frame[c].dtype == object}).to_parquet(
+                path, compression="zstd", index=False)
+        self._spilled[result_id] = (path, list(df.columns))
+
+    def _evict(self):
+        while len(self._frames) > self.memory_window:
+            result_id, df = self._frames.popitem(last=False)
+            if result_id not in self._spilled:
+                self._write(result_id, df)
+
+    def stats(self):
+        with self._lock:
+            disk = sum(os.path.getsize(p) for p, _ in self._spilled.values() if os.path.exists(p))
+            return {
+                "in_memory": len(self._frames),
+                "spilled": len(self._spilled),
+                "memory_mb": round(float(sum(df.memory_usage(deep=True).sum() for df in self._frames.values())) / 2**20, 2),
+                "disk_mb": round(disk / 2**20, 2),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._spilled.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,150 @@
+"""Relevance-filtered schema prompt for the BI Chatbot.
+
+``Schema_description()`` lists every MASTER_BRAND, MG2 and MG3 value. The
+index splits it into the core table rules and those three code lists, then
+matches a question against the list names (Arabic and English, fuzzy) so
+the prompt only carries the rules plus the codes the question mentions.
+"""
+import difflib
+import re
+from collections import defaultdict
+
+from utils.question_cache import normalize_question
+
+_ENTRY = re.compile(r"^\s*(\d+)\|(.+?)\s*$")
+_NULL = re.compile(r"^\s*NULL\s*$")
+
+SECTION_TITLES = {
+    "brands": "Brands mentioned in the question (MASTER_BRAND code|name):",
+    "categories": "MG2 categories (code|category):",
+    "subcategories": "MG3 subcategories mentioned in the question (code|subcategory):",
+}
+
+# Lists this short go into every prompt in full.
+ALWAYS_INCLUDE_MAX = 20
+
+# Common Arabic spellings of brand names that are stored in English.
+ALIASES = {
+    "شيبسي": "Chipsy",
+    "كوكا كولا": "Coca Cola",
+    "كوكاكولا": "Coca Cola",
+    "ليبتون": "lipton",
+    "بسكو مصر": "Bisco Misr",
+    "حلواني": "Halwani Brothers",
+}
+
+
+def estimate_tokens(text):
+    """Rough LLM token count: ~4 chars per token for Latin text, ~2 for Arabic."""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return max(1, round((len(text) - non_ascii) / 4 + non_ascii / 2))
+
+
+def _match_form(text):
+    """Normalized words with the Arabic definite article dropped."""
+    words = normalize_question(text).split()
+    return " ".join(w[2:] if w.startswith("ال") and len(w) > 3 else w for w in words)
+
+
+def parse_schema_prompt(prompt):
+    """Split the schema prompt into core text and its code|name lists."""
+    core, lists = [], defaultdict(list)
+    current, pending = None, "brands"
+    for line in prompt.splitlines():
+        entry = _ENTRY.match(line)
+        if entry:
+            current = current or pending
+            code, name = entry.group(1), entry.group(2)
+            if name.strip().lower() != "default":
+                lists[current].append((code, name.strip()))
+            continue
+        if _NULL.match(line):
+            continue
+        if "MG2 (Category)" in line:
+            current, pending = None, "categories"
+            continue
+        if "listed MG3" in line:
+            current, pending = None, "subcategories"
+            continue
+        if "This is all companies name in" in line:
+            current = None
+            continue
+        if line.strip():
+            current = None
+        if line.strip() or (core and core[-1].strip()):
+            core.append(line)
+    return "\n".join(core).strip(), dict(lists)
+
+
+class SchemaIndex:
+    """Fuzzy name index over the brand, category and subcategory lists."""
+
+    def __init__(self, prompt, cutoff=0.85):
+        self.full_prompt = prompt
+        self.core, self.lists = parse_schema_prompt(prompt)
+        self.cutoff = cutoff
+        # section -> {match form without spaces: [(code, name), ...]}
+        self._names = {}
+        for section, entries in self.lists.items():
+            forms = defaultdict(list)
+            for code, name in entries:
+                form = _match_form(name).replace(" ", "")
+                if form:
+                    forms[form].append((code, name))
+            self._names[section] = forms
+        self._codes = {code: (section, code, name)
+                       for section, entries in self.lists.items() for code, name in entries}
+        self._aliases = {_match_form(alias): _match_form(name) for alias, name in ALIASES.items()}
+
+    @staticmethod
+    def _ngrams(words, max_size=4):
+        """Word n-grams with the spaces removed, so "coca cola" and "cocacola" meet."""
+        for size in range(1, max_size + 1):
+            for i in range(len(words) - size + 1):
+                yield "".join(words[i:i + size])
+
+    def match(self, question):
+        """``{section: [(code, name), ...]}`` for names and codes found in ``question``."""
+        words = _match_form(question).split()
+        for alias, name in self._aliases.items():
+            if alias in " ".join(words):
+                words += name.split()
+        found = defaultdict(dict)
+        for word in words:
+            if word in self._codes:
+                section, code, name = self._codes[word]
+                found[section][code] = name
+        grams = set(self._ngrams(words))
+        for section, forms in self._names.items():
+            for gram in grams:
+                if gram in forms:
+                    hits = [gram]
+                elif len(gram) >= 5:
+                    hits = difflib.get_close_matches(gram, forms.keys(), n=3, cutoff=self.cutoff)
+                else:
+                    hits = []  # short names ("RC", "Fay") only match exactly
+                for hit in hits:
+                    for code, name in forms[hit]:
+                        found[section][code] = name
+        return {section: sorted(entries.items()) for section, entries in found.items()}
+
+    def prompt_for(self, question):
+        """Core rules plus the matched codes (short lists are always included)."""
+        matched = self.match(question)
+        parts = [self.core]
+        for section in ("brands", "categories", "subcategories"):
+            entries = self.lists.get(section, [])
+            if len(entries) <= ALWAYS_INCLUDE_MAX:
+                chosen = entries
+            else:
+                chosen = matched.get(section, [])
+            if chosen:
+                parts.append(SECTION_TITLES[section] + "\n" + "\n".join(f"{code}|{name}" for code, name in chosen))
+        if not matched.get("brands"):
+            parts.append(
+                "No listed brand was recognized in the question. If the user names a brand or company, "
+                "filter on the brand name: RIGHT(MASTER_BRAND, LEN(MASTER_BRAND) - CHARINDEX('|', MASTER_BRAND)) LIKE N'%name%'."
+            )
+        return "\n\n".join(parts)
@@ -0,0 +1,76 @@
+"""Collapse concurrent calls with the same key into one execution.
+
+The first caller for a key runs the function; callers that arrive while it
+is in flight wait for it and get the same result (or exception). Nothing is
+cached afterwards: the next call after completion runs again. If the first
+caller is interrupted rather than failing (a Streamlit rerun/stop is a
+BaseException, a cancelled query raises ``Interrupted``), the waiters run
+the function themselves: one caller giving up must not fail the others.
+"""
+import threading
+
+
+class Interrupted(Exception):
+    """The caller gave up its own execution (e.g. cancelled it); not a failure to share with waiters."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "interrupted", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.interrupted = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn, timeout=None):
+        """``(result, shared)``; ``shared`` is True when another caller's execution was reused.
+
+        ``timeout`` bounds how long a waiter waits (TimeoutError); the execution itself goes on.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for an identical in-flight call.")
+            if call.interrupted:
+                return self.do(key, fn, timeout)
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except Interrupted:
+            call.interrupted = True
+            raise
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.interrupted = True
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls), sum(c.waiters for c in self._calls.values())
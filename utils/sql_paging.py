@@ -0,0 +1,193 @@
+"""Server-side paging for ad-hoc SELECTs on the SQL Query page.
+
+``PagedQuery`` checks the SELECT and appends ``OFFSET ... FETCH NEXT ...``
+to it, so the warehouse sends one page at a time. Appending (rather than
+wrapping the query) keeps CTEs valid. The query's own ORDER BY is kept;
+without one, pages are ordered by every output column, so rows cannot move
+between pages. With ``SELECT *`` the columns are unknown and pages are ordered
+by the first one only (``stable`` is False; the page says so). A plain
+``TOP n`` on the outer SELECT, which SQL Server does not allow next to OFFSET,
+is removed and becomes a limit on the pages instead. A trailing ``OPTION (...)``
+would have to follow OFFSET, so such queries are not paged.
+
+``estimate_rows`` reads the optimizer's row estimate from the SQL Server
+plan (``SET SHOWPLAN_XML``, so nothing is executed) and falls back to an
+exact COUNT where there is no plan (the SQLite stand-in, no SHOWPLAN
+permission). It changes session settings, so give it a connection nobody
+else is using.
+"""
+import re
+
+from utils.sql_rewrite import check_select
+from utils.sql_text import render, tokenize
+
+PAGE_SIZES = (100, 500, 1000, 5000)
+PAGE_SIZE = 500
+
+_EST_ROWS = re.compile(r'StatementEstRows="([0-9.eE+-]+)"')
+
+
+class PagingUnsupported(ValueError):
+    pass
+
+
+def _significant_at(tokens, start):
+    return [i for i in range(start, len(tokens)) if tokens[i].kind not in ("ws", "comment")]
+
+
+def _outer_top(tokens, select_at):
+    """``(start, end, n)`` token span of a plain ``TOP n`` / ``TOP (n)`` after the outer SELECT, or None."""
+    sig = _significant_at(tokens, select_at + 1)
+    if sig and tokens[sig[0]].is_keyword("DISTINCT", "ALL"):
+        sig = sig[1:]
+    if not sig or not tokens[sig[0]].is_keyword("TOP"):
+        return None
+    words = [tokens[i] for i in sig[1:4]]
+    if words and words[0].kind == "number":
+        count, last = words[0], 1
+    elif len(words) == 3 and words[0].text == "(" and words[1].kind == "number" and words[2].text == ")":
+        count, last = words[1], 3
+    else:
+        raise PagingUnsupported("TOP with an expression cannot be paged; use a number or remove it.")
+    if last + 1 < len(sig) and tokens[sig[last + 1]].is_keyword("PERCENT", "WITH"):
+        raise PagingUnsupported("TOP ... PERCENT / WITH TIES cannot be paged; remove it to page through the rows.")
+    return sig[0], sig[last] + 1, int(float(count.text))
+
+
+def _column_count(tokens, select_at):
+    """Number of columns in the outer SELECT list, or None when it uses ``*``."""
+    sig = [tokens[i] for i in _significant_at(tokens, select_at + 1)]
+    i = 0
+    if i < len(sig) and sig[i].is_keyword("DISTINCT", "ALL"):
+        i += 1
+    if i < len(sig) and sig[i].is_keyword("TOP"):
+        # Still there on the first SELECT of a UNION
+        i += 1
+        depth = 0
+        while i < len(sig):
+            depth += (sig[i].text == "(") - (sig[i].text == ")")
+            i += 1
+            if depth == 0:
+                break
+        while i < len(sig) and sig[i].is_keyword("PERCENT", "WITH", "TIES"):
+            i += 1
+    count, depth, prev = 1, 0, None
+    for tok in sig[i:]:
+        if tok.text == "(":
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+        elif depth == 0:
+            if tok.is_keyword("FROM", "INTO", "WHERE", "GROUP", "HAVING", "ORDER", "UNION", "INTERSECT", "EXCEPT"):
+                break
+            if tok.text == ",":
+                count += 1
+            elif tok.text == "*" and (prev is None or prev.text in (",", ".")):
+                return None
+        prev = tok
+    return count
+
+
+class PagedQuery:
+    """A checked SELECT that can be fetched one page at a time."""
+
+    def __init__(self, sql):
+        check_select(sql)
+        tokens = tokenize(sql.strip())
+        # A trailing ";" or "-- comment" would swallow the appended clause
+        while tokens and (tokens[-1].kind in ("ws", "comment") or tokens[-1].text == ";"):
+            tokens.pop()
+        self.original = render(tokens)
+
+        depth, select_at, order_at, compound = 0, None, None, False
+        for idx, tok in enumerate(tokens):
+            if tok.text == "(":
+                depth += 1
+            elif tok.text == ")":
+                depth -= 1
+            elif depth == 0 and tok.kind == "ident":
+                if tok.is_keyword("OFFSET", "FETCH"):
+                    raise PagingUnsupported("The query already uses OFFSET/FETCH; run it without paging.")
+                if tok.is_keyword("OPTION"):
+                    raise PagingUnsupported("Queries with an OPTION (...) hint cannot be paged.")
+                if tok.is_keyword("UNION", "INTERSECT", "EXCEPT"):
+                    compound = True
+                elif tok.is_keyword("ORDER") and order_at is None:
+                    order_at = idx
+                elif tok.is_keyword("SELECT") and select_at is None:
+                    select_at = idx
+
+        self.limit = None
+        top = _outer_top(tokens, select_at) if not compound else None
+        if top is not None:
+            start, end, self.limit = top
+            tokens = tokens[:start] + tokens[end:]
+            if order_at is not None:
+                order_at -= end - start
+        self.sql = render(tokens)
+        self.ordered = order_at is not None
+        self.columns = _column_count(tokens, select_at)
+        self.stable = self.ordered or self.columns is not None
+        # COUNT over the outer SELECT without its ORDER BY, as one more CTE after the query's own.
+        # Naming the columns keeps unnamed (SUM(x)) and duplicate ones valid.
+        body = render(tokens[select_at:order_at]).rstrip()
+        head = render(tokens[:select_at]).rstrip()
+        names = f"({', '.join(f'c{n}' for n in range(1, self.columns + 1))})" if self.columns else ""
+        counted = f"counted{names} AS (\n{body}\n)"
+        self._count_sql = (f"{head},\n{counted}" if head else f"WITH {counted}") + "\nSELECT COUNT_BIG(*) FROM counted"
+
+    def page_sql(self, page, size=PAGE_SIZE):
+        """SQL for page ``page`` (0-based) of ``size`` rows; None past the query's own TOP limit."""
+        offset = page * size
+        if self.limit is not None:
+            if offset >= self.limit:
+                return None
+            size = min(size, self.limit - offset)
+        if self.ordered:
+            order = ""
+        else:
+            order = "\nORDER BY " + (", ".join(str(n) for n in range(1, self.columns + 1)) if self.columns else "1")
+        return f"{self.sql}{order}\nOFFSET {offset} ROWS FETCH NEXT {size} ROWS ONLY"
+
+    def count_sql(self):
+        return self._count_sql
+
+    def clamp(self, rows):
+        return min(rows, self.limit) if self.limit is not None else rows
+
+
+def _plan_estimate(conn, sql):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(sql)
+            row = cursor.fetchone()
+        finally:
+            cursor.execute("SET SHOWPLAN_XML OFF")
+    finally:
+        cursor.close()
+    match = _EST_ROWS.search(str(row[0])) if row else None
+    return float(match.group(1)) if match else None
+
+
+def estimate_rows(conn, paged, errors=(Exception,)):
+    """``(rows, exact)`` for ``paged``: the plan's estimate, else an exact COUNT; ``(None, False)`` if neither works.
+
+    ``errors`` are the driver errors to fall back on (``db.driver_errors()``).
+    """
+    try:
+        estimate = _plan_estimate(conn, paged.original)
+        if estimate is not None:
+            return paged.clamp(int(round(estimate))), False
+    except errors:
+        pass
+    cursor = conn.cursor()
+    try:
+        cursor.execute(paged.count_sql())
+        return paged.clamp(int(cursor.fetchone()[0])), True
+    except errors:
+        return None, False
+    finally:
+        cursor.close()
+
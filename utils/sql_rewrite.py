@@ -0,0 +1,313 @@
+"""Parse, check and rewrite model-written SQL before it reaches the warehouse.
+
+* ``check_select`` - one SELECT (or WITH ... SELECT) statement, no DML/DDL,
+  decided on tokens so keywords inside strings and comments do not count.
+* Brand/category predicates written the way the schema prompt teaches,
+  ``RIGHT(i.MASTER_BRAND, LEN(i.MASTER_BRAND) - CHARINDEX('|', i.MASTER_BRAND)) = N'name'``,
+  wrap the column in functions and force a scan. They become plain column
+  filters, ``i.MASTER_BRAND IN (N'code|name', ...)``, using the full values
+  from the item dimension; ``LEFT(col, CHARINDEX('|', col) - 1) = 'code'``
+  becomes ``col LIKE 'code|%'``. Only whole predicates are rewritten; an
+  extraction that is part of a longer expression (``+ ...``, ``COLLATE ...``)
+  is left alone.
+* A ``TOP (n + 1)`` row cap is added to the outer SELECT when it has none;
+  the extra row lets the reader tell that the result was truncated.
+  UNION/INTERSECT/EXCEPT queries are not capped in SQL (a TOP on one branch
+  changes the result); the notes say so, and the reader still stops at the cap.
+"""
+import re
+
+from utils.sql_text import Token, matching_paren, significant, split_args, tokenize
+
+ROW_CAP = 100_000
+
+CODED_COLUMNS = ("MASTER_BRAND", "MG2", "MG3")
+
+# Tokens around a comparison that make it a predicate of its own
+_PREDICATE_START = {"WHERE", "AND", "OR", "ON", "WHEN", "HAVING", "NOT"}
+_PREDICATE_END = {
+    "AND", "OR", "THEN", "GROUP", "ORDER", "HAVING", "UNION", "INTERSECT", "EXCEPT", "OPTION",
+    "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER",
+}
+
+FORBIDDEN = {
+    "INSERT", "UPDATE", "DELETE", "MERGE", "ALTER", "DROP", "CREATE", "TRUNCATE", "GRANT", "REVOKE",
+    "DENY", "EXEC", "EXECUTE", "BULK", "INTO", "OPENROWSET", "OPENQUERY", "OPENDATASOURCE", "DBCC",
+    "SHUTDOWN", "WAITFOR", "BACKUP", "RESTORE", "KILL", "RECONFIGURE", "USE",
+}
+
+
+class UnsafeSQL(ValueError):
+    pass
+
+
+# =========================
+# Parse / safety check
+# =========================
+def check_select(sql):
+    """Significant tokens of ``sql`` if it is a single read-only SELECT; raise UnsafeSQL otherwise."""
+    tokens = significant(tokenize(sql))
+    while tokens and tokens[-1].text == ";":
+        tokens.pop()
+    if not tokens:
+        raise UnsafeSQL("Empty SQL.")
+    if not tokens[0].is_keyword("SELECT", "WITH"):
+        raise UnsafeSQL("Only SELECT statements are allowed.")
+    depth = 0
+    for tok in tokens:
+        if tok.text == "(":
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+            if depth < 0:
+                raise UnsafeSQL("Unbalanced parentheses.")
+        elif tok.text == ";":
+            raise UnsafeSQL("Only one statement is allowed.")
+        elif tok.kind == "ident" and (tok.upper in FORBIDDEN or tok.upper.startswith(("SP_", "XP_"))):
+            raise UnsafeSQL(f"Generated SQL failed safety check (SELECT-only policy): {tok.text}.")
+    if depth != 0:
+        raise UnsafeSQL("Unbalanced parentheses.")
+    if not any(t.is_keyword("SELECT") for t in tokens):
+        raise UnsafeSQL("Only SELECT statements are allowed.")
+    return tokens
+
+
+# =========================
+# Item dimension
+# =========================
+class ItemDimension:
+    """Full ``code|name`` values of MASTER_BRAND, MG2 and MG3 by lower-cased name and code."""
+
+    def __init__(self, by_name, by_code):
+        self.by_name = by_name  # column -> {name.casefold(): [full values]}
+        self.by_code = by_code  # column -> {code: [full values]}
+
+    @classmethod
+    def from_frame(cls, df):
+        by_name, by_code = {}, {}
+        for column in CODED_COLUMNS:
+            names, codes = {}, {}
+            if column in df.columns:
+                for value in df[column].dropna().unique():
+                    value = str(value)
+                    code, sep, name = value.partition("|")
+                    if not sep:
+                        continue
+                    names.setdefault(name.strip().casefold(), []).append(value)
+                    codes.setdefault(code.strip(), []).append(value)
+            by_name[column], by_code[column] = names, codes
+        return cls(by_name, by_code)
+
+    def values_for_names(self, column, names):
+        values = []
+        for name in names:
+            found = self.by_name.get(column, {}).get(name.strip().casefold())
+            if not found:
+                return None  # unknown name: leave the predicate alone
+            values += found
+        return sorted(set(values))
+
+
+# =========================
+# Predicate rewrite
+# =========================
+def _compact(tokens):
+    """Canonical text of a token run: no spaces, upper-case identifiers, brackets dropped."""
+    out = []
+    for t in significant(tokens):
+        if t.kind == "ident":
+            out.append(t.upper)
+        elif t.kind == "quoted":
+            out.append(t.text[1:-1].upper())
+        else:
+            out.append(t.text)
+    return "".join(out)
+
+
+def _literal(tok):
+    if tok.kind != "string":
+        return None
+    text = tok.text[1:] if tok.text[:1] in "Nn" else tok.text
+    return text[1:-1].replace("''", "'")
+
+
+def _quote(value):
+    return "N'" + value.replace("'", "''") + "'"
+
+
+def _coded_column(arg_tokens):
+    """(original text, canonical, column name) when the argument is [alias.]MASTER_BRAND/MG2/MG3."""
+    sig = significant(arg_tokens)
+    canon = _compact(sig)
+    column = canon.rsplit(".", 1)[-1]
+    if column not in CODED_COLUMNS or not re.fullmatch(r"(\w+\.)*\w+", canon):
+        return None
+    return "".join(t.text for t in sig), canon, column
+
+
+def _extract_call(tokens, start):
+    """Recognize a name/code extraction call at ``tokens[start]``.
+
+    Returns ``(kind, column text, column name, end index)`` with kind "name" or
+    "code", or None.
+    """
+    tok = tokens[start]
+    if not tok.is_keyword("RIGHT", "SUBSTRING", "LEFT"):
+        return None
+    open_idx = start + 1
+    while open_idx < len(tokens) and tokens[open_idx].kind == "ws":
+        open_idx += 1
+    if open_idx >= len(tokens) or tokens[open_idx].text != "(":
+        return None
+    close_idx = matching_paren(tokens, open_idx)
+    if close_idx < 0:
+        return None
+    args = split_args(tokens[open_idx + 1:close_idx])
+    col = _coded_column(args[0])
+    if col is None:
+        return None
+    text, c, column = col
+    rest = [_compact(a) for a in args[1:]]
+    charindex = f"CHARINDEX('|',{c})"
+    if tok.is_keyword("RIGHT") and rest == [f"LEN({c})-{charindex}"]:
+        return "name", text, column, close_idx
+    if tok.is_keyword("SUBSTRING") and len(rest) == 2 and rest[0] == f"{charindex}+1":
+        return "name", text, column, close_idx
+    if tok.is_keyword("LEFT") and rest == [f"{charindex}-1"]:
+        return "code", text, column, close_idx
+    return None
+
+
+def _next_significant(tokens, idx):
+    idx += 1
+    while idx < len(tokens) and tokens[idx].kind in ("ws", "comment"):
+        idx += 1
+    return idx
+
+
+def _previous_significant(tokens, idx):
+    idx -= 1
+    while idx >= 0 and tokens[idx].kind in ("ws", "comment"):
+        idx -= 1
+    return idx
+
+
+def _whole_predicate(tokens, start, end):
+    """True when ``tokens[start:end + 1]`` is not part of a longer expression."""
+    before = _previous_significant(tokens, start)
+    after = _next_significant(tokens, end)
+    starts = before < 0 or tokens[before].text == "(" or tokens[before].is_keyword(*_PREDICATE_START)
+    ends = after >= len(tokens) or tokens[after].text in (")", ";") or tokens[after].is_keyword(*_PREDICATE_END)
+    return starts and ends
+
+
+def _comparison(tokens, idx):
+    """``(literal values, end index)`` for ``= 'x'`` or ``IN ('x', ...)`` after ``idx``."""
+    op = _next_significant(tokens, idx)
+    if op >= len(tokens):
+        return None
+    if tokens[op].text == "=":
+        lit = _next_significant(tokens, op)
+        value = _literal(tokens[lit]) if lit < len(tokens) else None
+        return ([value], lit) if value is not None else None
+    if tokens[op].is_keyword("IN"):
+        open_idx = _next_significant(tokens, op)
+        if open_idx >= len(tokens) or tokens[open_idx].text != "(":
+            return None
+        close_idx = matching_paren(tokens, open_idx)
+        if close_idx < 0:
+            return None
+        values = []
+        for arg in split_args(tokens[open_idx + 1:close_idx]):
+            sig = significant(arg)
+            value = _literal(sig[0]) if len(sig) == 1 else None
+            if value is None:
+                return None
+            values.append(value)
+        return values, close_idx
+    return None
+
+
+def rewrite_coded_filters(sql, dimension):
+    """Rewrite name/code extraction predicates into column filters; return (sql, notes)."""
+    tokens = tokenize(sql)
+    out, notes, i = [], [], 0
+    while i < len(tokens):
+        call = _extract_call(tokens, i)
+        cmp = _comparison(tokens, call[3]) if call else None
+        if call and cmp and _whole_predicate(tokens, i, cmp[1]):
+            kind, column_text, column, _ = call
+            values, end = cmp
+            replacement = None
+            if kind == "name" and dimension is not None:
+                full = dimension.values_for_names(column, values)
+                if full:
+                    replacement = f"{column_text} IN ({', '.join(_quote(v) for v in full)})"
+                    notes.append(f"{column} name filter -> {column_text} IN ({len(full)} values)")
+            elif kind == "code" and all(re.fullmatch(r"\w+", v) for v in values):
+                likes = [f"{column_text} LIKE '{v}|%'" for v in values]
+                replacement = likes[0] if len(likes) == 1 else "(" + " OR ".join(likes) + ")"
+                notes.append(f"{column} code filter -> LIKE 'code|%'")
+            if replacement:
+                out.append(Token("op", replacement))
+                i = end + 1
+                continue
+        out.append(tokens[i])
+        i += 1
+    return "".join(t.text for t in out), notes
+
+
+# =========================
+# Row cap
+# =========================
+def _is_compound(sql):
+    depth = 0
+    for tok in tokenize(sql):
+        if tok.text == "(":
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+        elif depth == 0 and tok.is_keyword("UNION", "INTERSECT", "EXCEPT"):
+            return True
+    return False
+
+
+def add_row_cap(sql, cap):
+    """Insert ``TOP (cap)`` into the outer SELECT unless it already limits rows or is a UNION/INTERSECT/EXCEPT."""
+    tokens = tokenize(sql)
+    depth, outer_select = 0, None
+    for idx, tok in enumerate(tokens):
+        if tok.text == "(":
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+        elif depth == 0 and tok.kind == "ident":
+            if tok.is_keyword("UNION", "INTERSECT", "EXCEPT", "OFFSET", "FETCH"):
+                return sql, False
+            if tok.is_keyword("SELECT") and outer_select is None:
+                outer_select = idx
+    if outer_select is None:
+        return sql, False
+    insert_at = _next_significant(tokens, outer_select)
+    if insert_at < len(tokens) and tokens[insert_at].is_keyword("DISTINCT", "ALL"):
+        insert_at = _next_significant(tokens, insert_at)
+    if insert_at < len(tokens) and tokens[insert_at].is_keyword("TOP"):
+        return sql, False
+    head = "".join(t.text for t in tokens[:insert_at])
+    tail = "".join(t.text for t in tokens[insert_at:])
+    return f"{head}TOP ({int(cap)}) {tail}", True
+
+
+def prepare(sql, dimension=None, row_cap=ROW_CAP):
+    """Checked and rewritten SQL plus notes on what changed; raises UnsafeSQL."""
+    check_select(sql)
+    sql = sql.strip().rstrip(";").strip()
+    sql, notes = rewrite_coded_filters(sql, dimension)
+    if row_cap:
+        sql, capped = add_row_cap(sql, int(row_cap) + 1)
+        if capped:
+            notes.append(f"row cap of {int(row_cap):,} added")
+        elif _is_compound(sql):
+            notes.append(f"no row cap in SQL for UNION/INTERSECT/EXCEPT; only the first {int(row_cap):,} rows are read")
+    check_select(sql)
+    return sql, notes
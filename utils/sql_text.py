@@ -0,0 +1,101 @@
+"""Lightweight T-SQL tokenizer shared by the local stand-in and SQL helpers."""
+import hashlib
+import re
+
+# Token kinds: "ws", "comment", "string", "ident", "quoted", "number", "op"
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*[\s\S]*?\*/)
+  | (?P<string>[Nn]?'(?:[^']|'')*')
+  | (?P<quoted>\[[^\]]*\]|"[^"]*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<ident>[A-Za-z_@#][A-Za-z0-9_@#$]*)
+  | (?P<op><>|!=|>=|<=|\|\||::|.)
+    """,
+    re.VERBOSE,
+)
+
+
+class Token:
+    __slots__ = ("kind", "text")
+
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+
+    @property
+    def upper(self):
+        return self.text.upper()
+
+    def is_keyword(self, *words):
+        return self.kind == "ident" and self.text.upper() in words
+
+    def __repr__(self):
+        return f"Token({self.kind!r}, {self.text!r})"
+
+
+def tokenize(sql):
+    """Split SQL into tokens, keeping whitespace and comments so text can be rebuilt."""
+    return [Token(m.lastgroup, m.group()) for m in _TOKEN_RE.finditer(sql)]
+
+
+def significant(tokens):
+    """Drop whitespace and comments."""
+    return [t for t in tokens if t.kind not in ("ws", "comment")]
+
+
+def render(tokens, sep=""):
+    return sep.join(t.text for t in tokens)
+
+
+def matching_paren(tokens, open_idx):
+    """Index of the ")" closing the "(" at ``open_idx`` (or -1)."""
+    depth = 0
+    for i in range(open_idx, len(tokens)):
+        text = tokens[i].text
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def split_args(tokens):
+    """Split the tokens between a call's parentheses on top-level commas."""
+    args, current, depth = [], [], 0
+    for t in tokens:
+        if t.text == "(":
+            depth += 1
+        elif t.text == ")":
+            depth -= 1
+        if t.text == "," and depth == 0:
+            args.append(current)
+            current = []
+        else:
+            current.append(t)
+    args.append(current)
+    return args
+
+
+def canonical(sql):
+    """One-line form of a statement that ignores case, whitespace, comments,
+    identifier brackets and a trailing semicolon; literals stay as written."""
+    parts = []
+    for t in significant(tokenize(sql)):
+        if t.kind == "ident":
+            parts.append(t.upper)
+        elif t.kind == "quoted":
+            parts.append(t.text[1:-1].upper())
+        else:
+            parts.append(t.text)
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return " ".join(parts)
+
+
+def fingerprint(sql):
+    """Stable hash of ``canonical(sql)``."""
+    return hashlib.sha1(canonical(sql).encode("utf-8")).hexdigest()
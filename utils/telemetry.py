@@ -0,0 +1,147 @@
+"""Per-stage latency telemetry for chatbot turns.
+
+A ``TurnTimer`` splits one turn into consecutive stages: ``lap("llm")``
+charges the time since the previous lap to ``llm``. It also carries
+counters such as prompt tokens, rows and cache hits. ``MetricsStore.record``
+appends the turn to a local SQLite file; ``MetricsStore.percentiles`` reads
+recent turns back for the BI latency panel.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "sanad_metrics.sqlite")
+MAX_TURNS = 20_000
+PANEL_TURNS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    page TEXT,
+    access_level TEXT,
+    total_ms REAL,
+    prompt_tokens INTEGER,
+    rows INTEGER,
+    question_cache TEXT,
+    result_cache TEXT,
+    answered_locally INTEGER,
+    ok INTEGER,
+    error TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS stages (
+    turn_id INTEGER NOT NULL REFERENCES turns(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    ms REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stages_turn ON stages(turn_id);
+"""
+
+# Chatbot pipeline order, used to sort the panel; other stage names follow
+STAGES = ("keywords", "context", "local_followup", "question_cache", "llm", "sql_check", "execute", "render")
+COUNTERS = ("access_level", "prompt_tokens", "rows", "question_cache", "result_cache", "answered_locally")
+
+
+class TurnTimer:
+    """Stage timings and counters for one chat turn."""
+
+    def __init__(self, page="BI_Chatbot"):
+        self.page = page
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.stages = {}  # stage -> ms, in first-lap order
+        self.counters = {}
+        self.error = None
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def set(self, **counters):
+        self.counters.update(counters)
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+class MetricsStore:
+    """Append-only SQLite log of chat turns, trimmed to the latest ``max_turns``."""
+
+    def __init__(self, path=DEFAULT_PATH, max_turns=MAX_TURNS):
+        self.path = path
+        self.max_turns = max_turns
+        self._lock = threading.Lock()
+        self._writes = 0
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def record(self, timer):
+        """Store a finished turn; telemetry never breaks the page, so errors are swallowed."""
+        counters = dict(timer.counters)
+        row = [time.time(), timer.page, *(counters.pop(k, None) for k in COUNTERS)]
+        try:
+            with self._lock, closing(self._connect()) as conn, conn:
+                cur = conn.execute(
+                    "INSERT INTO turns (ts, page, access_level, prompt_tokens, rows, question_cache, result_cache, "
+                    "answered_locally, total_ms, ok, error, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row + [timer.total_ms, timer.error is None, timer.error, json.dumps(counters, default=str) if counters else None],
+                )
+                conn.executemany(
+                    "INSERT INTO stages (turn_id, stage, ms) VALUES (?, ?, ?)",
+                    [(cur.lastrowid, stage, ms) for stage, ms in timer.stages.items()],
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    conn.execute("DELETE FROM turns WHERE id <= (SELECT MAX(id) FROM turns) - ?", (self.max_turns,))
+        except sqlite3.Error:
+            pass
+
+    def recent(self, limit=PANEL_TURNS):
+        """``(turns, stages)`` DataFrames for the latest ``limit`` turns."""
+        with closing(self._connect()) as conn:
+            turns = pd.read_sql("SELECT * FROM turns ORDER BY id DESC LIMIT ?", conn, params=(limit,))
+            stages = pd.read_sql(
+                "SELECT s.turn_id, s.stage, s.ms FROM stages s WHERE s.turn_id IN "
+                "(SELECT id FROM turns ORDER BY id DESC LIMIT ?)", conn, params=(limit,))
+        return turns, stages
+
+    def percentiles(self, limit=PANEL_TURNS):
+        """Per-stage p50/p90/p95/max in ms over recent turns, with a ``total`` row last."""
+        turns, stages = self.recent(limit)
+        if turns.empty:
+            return pd.DataFrame(columns=["stage", "turns", "p50", "p90", "p95", "max"])
+        rows = [(name, group["ms"]) for name, group in stages.groupby("stage", sort=False)]
+        rows.sort(key=lambda r: STAGES.index(r[0]) if r[0] in STAGES else len(STAGES))
+        rows.append(("total", turns["total_ms"]))
+        return pd.DataFrame(
+            [(name, len(ms), ms.quantile(0.5), ms.quantile(0.9), ms.quantile(0.95), ms.max()) for name, ms in rows],
+            columns=["stage", "turns", "p50", "p90", "p95", "max"],
+        ).round(1)
+
+    def rates(self, limit=PANEL_TURNS):
+        """Hit rates and error share over recent turns."""
+        turns, _ = self.recent(limit)
+        if turns.empty:
+            return {}
+        return {
+            "turns": len(turns),
+            "question_cache_hit": round(float((turns["question_cache"] == "hit").mean()), 3),
+            "result_cache_hit": round(float((turns["result_cache"] == "hit").mean()), 3),
+            "answered_locally": round(float(turns["answered_locally"].fillna(0).astype(bool).mean()), 3),
+            "errors": round(float((turns["ok"] == 0).mean()), 3),
+            "median_rows": float(turns["rows"].median()) if turns["rows"].notna().any() else 0.0,
+        }
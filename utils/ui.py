@@ -0,0 +1,19 @@
+"""Shared page helpers."""
+import os
+
+import streamlit as st
+
+
+@st.cache_resource(show_spinner=False)
+def _read_css(file_name, mtime):
+    with open(file_name) as f:
+        return f.read()
+
+
+def load_css(file_name):
+    """Inject a stylesheet; the file is read once per process (and again when it changes)."""
+    try:
+        css = _read_css(file_name, os.path.getmtime(file_name))
+    except FileNotFoundError:
+        return  # Ignore if CSS file doesn't exist
+    st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)